@@ -1,62 +1,78 @@
 import os
 import csv
 import io
+import asyncio
 import fitz  # PyMuPDF (for reading PDF metadata)
-import boto3
-from dotenv import load_dotenv
-from azure.core.credentials import AzureKeyCredential
-from azure.ai.documentintelligence import DocumentIntelligenceClient
 from azure.ai.documentintelligence.models import AnalyzeResult
 from fastapi import HTTPException
-
-def extract_and_upload_pdf(pdf_path):
-    """Extracts text, images, tables, and metadata from a PDF and uploads them directly to S3."""
-    
-    # Load environment variables
-    load_dotenv()
-
-    # AWS S3 Configuration
-    session = boto3.Session(
-        aws_access_key_id=os.getenv('AWS_SERVER_PUBLIC_KEY'),
-        aws_secret_access_key=os.getenv('AWS_SERVER_SECRET_KEY'),
-    )
-    s3 = session.client('s3')
-    bucket_name = os.getenv('AWS_BUCKET_NAME')
-
-    # Define base S3 path for structured storage
-    s3_base_dir = "pdf_processing_pipeline/pdf_enterprise_pipeline"
-
-    # Azure Credentials
-    endpoint = os.getenv("AZURE_FORM_RECOGNIZER_ENDPOINT")
-    key = os.getenv("AZURE_FORM_RECOGNIZER_KEY")
-
-
-    # Initialize Azure Document Intelligence Client
-    document_intelligence_client = DocumentIntelligenceClient(endpoint=endpoint, credential=AzureKeyCredential(key))
+from clients import get_document_intelligence_client, run_async
+from artifact_store import ArtifactStore, JobManifest
+
+# Default S3 folder for enterprise pipeline artifacts
+S3_BASE_DIR = "pdf_processing_pipeline/pdf_enterprise_pipeline"
+
+# ✅ Figures downloaded from Azure at the same time (override via environment)
+AZURE_FIGURE_CONCURRENCY = int(os.getenv("AZURE_FIGURE_CONCURRENCY", 8))
+
+async def fetch_figure(client, model_id, operation_id, figure_id, semaphore):
+    """Download one figure image, with at most `semaphore` downloads in flight."""
+    async with semaphore:
+        response = await client.get_analyze_result_figure(
+            model_id=model_id, result_id=operation_id, figure_id=figure_id
+        )
+        # Convert the async byte stream to bytes
+        return b"".join([chunk async for chunk in response])
+
+async def upload_figures(client, result, operation_id, manifest, max_concurrency, progress=None):
+    """
+    Fetch every figure concurrently and hand each one to the job manifest as soon as it arrives.
+    """
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def fetch_and_upload(figure_id):
+        image_bytes = await fetch_figure(client, result.model_id, operation_id, figure_id, semaphore)
+        # Upload runs on the uploader's threads while other figures are still downloading
+        manifest.add_bytes(f"images/{figure_id}.png", image_bytes, "image/png")
+        if progress:
+            progress("figure_fetched", f"Figure {figure_id} fetched ({len(image_bytes) // 1024} KB)", advance=1)
+
+    await asyncio.gather(*(fetch_and_upload(figure.id) for figure in result.figures if figure.id))
+
+async def extract_and_upload_pdf_async(pdf_path, s3_base_dir=S3_BASE_DIR, client=None, uploader=None,
+                                       max_concurrency=AZURE_FIGURE_CONCURRENCY, progress=None):
+    """
+    Extracts text, images, tables, and metadata from a PDF and uploads them directly to S3.
+
+    Artifacts are stored under content-addressed keys (identical figures
+    are uploaded once across documents) and listed by name in
+    `{s3_base_dir}/manifest.json`. `client` and `uploader` default to the
+    shared Azure client and S3 uploader; benchmarks pass local stand-ins.
+    """
+    # AWS S3 Configuration (shared artifact store unless a stand-in uploader is given)
+    store = ArtifactStore(uploader=uploader) if uploader else None
+    manifest = JobManifest(f"{s3_base_dir}/manifest.json", store=store,
+                           metadata={"source": os.path.basename(pdf_path)})
+    bucket_name = manifest.store.uploader.bucket
+
+    # Shared Azure Document Intelligence Client (connections stay open between requests)
+    client = client or get_document_intelligence_client()
 
     # Analyze Document
+    if progress:
+        progress("started", "Analyzing document with Azure Document Intelligence")
     with open(pdf_path, "rb") as f:
-        poller = document_intelligence_client.begin_analyze_document("prebuilt-layout", body=f, output=["figures"])
-
-    result: AnalyzeResult = poller.result()
+        poller = await client.begin_analyze_document("prebuilt-layout", body=f, output=["figures"])
+        result: AnalyzeResult = await poller.result()
     operation_id = poller.details["operation_id"]
+    if progress:
+        figure_count = len(result.figures) if result.figures else 0
+        table_count = len(result.tables) if result.tables else 0
+        progress("analyzed", f"{len(result.pages)} pages analyzed: {figure_count} figures, {table_count} tables found",
+                 total=figure_count)
 
     # -------- Upload Images Directly to S3 --------
     if result.figures:
-        for figure in result.figures:
-            if figure.id:
-                s3_path = f"{s3_base_dir}/images/{figure.id}.png"
-
-                response = document_intelligence_client.get_analyze_result_figure(
-                    model_id=result.model_id, result_id=operation_id, figure_id=figure.id
-                )
-
-                # Convert generator response to bytes
-                image_bytes = b"".join(response)
-
-                # Upload image directly to S3
-                s3.put_object(Bucket=bucket_name, Key=s3_path, Body=image_bytes)
-                print(f"✅ Uploaded Image: s3://{bucket_name}/{s3_path}")
+        await upload_figures(client, result, operation_id, manifest, max_concurrency, progress)
     else:
         print("❌ No figures found.")
 
@@ -77,9 +93,7 @@ def extract_and_upload_pdf(pdf_path):
                 text_content.write(f"... Line #{line_idx}: '{line.content}'\n")
 
     # Upload text content to S3
-    s3_path_text = f"{s3_base_dir}/text/extracted_text.txt"
-    s3.put_object(Bucket=bucket_name, Key=s3_path_text, Body=text_content.getvalue())
-    print(f"✅ Uploaded Extracted Text: s3://{bucket_name}/{s3_path_text}")
+    manifest.add_bytes("text/extracted_text.txt", text_content.getvalue(), "text/plain", primary=True)
 
     # -------- Upload Tables Directly to S3 (CSV Format) --------
     if result.tables:
@@ -102,12 +116,8 @@ def extract_and_upload_pdf(pdf_path):
             # Write table to CSV format in-memory
             writer.writerows(table_matrix)
 
-            # Define S3 Path Before Uploading
-            s3_path_table = f"{s3_base_dir}/tables/table_{table_idx}.csv"
-
             # Upload CSV file directly to S3
-            s3.put_object(Bucket=bucket_name, Key=s3_path_table, Body=table_buffer.getvalue())
-            print(f"✅ Uploaded Table {table_idx}: s3://{bucket_name}/{s3_path_table}")
+            manifest.add_bytes(f"tables/table_{table_idx}.csv", table_buffer.getvalue(), "text/csv")
 
     # -------- Upload Metadata Directly to S3 --------
     metadata_buffer = io.StringIO()
@@ -118,14 +128,28 @@ def extract_and_upload_pdf(pdf_path):
     metadata_buffer.write(f"Total Tables: {len(result.tables) if result.tables else 0}\n")
     metadata_buffer.write(f"Total Paragraphs: {len(result.paragraphs) if result.paragraphs else 0}\n")
 
-    # Define S3 Path Before Uploading
-    s3_path_metadata = f"{s3_base_dir}/others/metadata.txt"
-
     # Upload metadata directly to S3
-    s3.put_object(Bucket=bucket_name, Key=s3_path_metadata, Body=metadata_buffer.getvalue())
-    print(f"✅ Uploaded Metadata: s3://{bucket_name}/{s3_path_metadata}")
+    manifest.add_bytes("others/metadata.txt", metadata_buffer.getvalue(), "text/plain")
+
+    # -------- Wait for all uploads, then write the manifest --------
+    failed = 0
+    for name, s3_path, error in manifest.write():
+        if error:
+            failed += 1
+            print(f"❌ Error uploading {name} to s3://{bucket_name}/{s3_path}: {error}")
+        else:
+            print(f"✅ Uploaded {name}: s3://{bucket_name}/{s3_path}")
+    if progress:
+        progress("uploaded", f"Artifacts uploaded to S3, {failed} failed")
+    if failed:
+        raise RuntimeError(f"{failed} artifacts failed to upload to S3")
 
     print("\n✅✅✅ Extraction & Upload Completed Successfully! ✅✅✅")
+    return s3_base_dir
+
+def extract_and_upload_pdf(pdf_path, s3_base_dir=S3_BASE_DIR, progress=None):
+    """Blocking entry point for worker threads: runs the async pipeline on the shared client loop."""
+    return run_async(extract_and_upload_pdf_async(pdf_path, s3_base_dir, progress=progress))
 
 
 # # Example Usage:
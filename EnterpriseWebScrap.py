@@ -1,28 +1,54 @@
 import os
-import requests
-import boto3
-from apify_client import ApifyClient
+import time
+import uuid
 from dotenv import load_dotenv
 from fastapi import FastAPI, HTTPException
 from pydantic import BaseModel
 from OSWebScrap import upload_file_to_s3
+from s3_uploader import get_uploader
+from clients import get_apify_client
+from image_fetcher import get_image_fetcher
+from artifact_store import ArtifactStore, JobManifest, latest_manifest_key
+from markdown_writer import MarkdownWriter
 
 # ✅ Load environment variables
 load_dotenv()
 
 # ✅ AWS Configuration (Consistent with PDF Processing)
-session = boto3.Session(
-    aws_access_key_id=os.getenv('AWS_SERVER_PUBLIC_KEY'),
-    aws_secret_access_key=os.getenv('AWS_SERVER_SECRET_KEY'),
-)
-s3 = session.client('s3')
 bucket_name = os.getenv('AWS_BUCKET_NAME')
 aws_region = os.getenv('AWS_REGION')  # e.g., 'us-east-1'
 
-# ✅ Replace with your Apify API token
+# ✅ Apify API token (checked when a scrape runs, so importing this module never fails)
 APIFY_TOKEN = os.getenv('APIFY_TOKEN')
-if not APIFY_TOKEN:
-    raise ValueError("Apify API token is missing. Please set the APIFY_TOKEN environment variable.")
+
+# ✅ Apify actor configuration
+APIFY_ACTOR_ID = "apify/puppeteer-scraper"
+APIFY_MAX_PAGES = int(os.getenv("APIFY_MAX_PAGES", 5))
+APIFY_PAGE_FUNCTION = """async ({ page, request }) => {
+    try {
+        await page.waitForSelector('img');
+        const images = await page.$$eval('img', imgs => imgs.map(img => img.src || img.getAttribute('ng-src')));
+        const validImages = [...new Set(images)].filter(url => url && url.startsWith('http'));
+        const textContent = await page.evaluate(() => document.body.innerText);
+        return { url: request.url, title: await page.title(), images: validImages, text: textContent };
+    } catch (error) {
+        return { url: request.url, error: error.message };
+    }
+}"""
+
+# ✅ S3 folder of the enterprise scraper; artifacts are content-addressed, each run writes a manifest
+EN_SCRAPE_PREFIX = "scraped_data/scraped_en_data"
+EN_MANIFESTS_PREFIX = f"{EN_SCRAPE_PREFIX}/manifests"
+
+# ✅ Streaming run mode: how often to poll a running actor and how many dataset items to read per request
+APIFY_POLL_SECONDS = float(os.getenv("APIFY_POLL_SECONDS", 2))
+APIFY_PAGE_SIZE = int(os.getenv("APIFY_PAGE_SIZE", 50))
+APIFY_TERMINAL_STATUSES = ("SUCCEEDED", "FAILED", "ABORTED", "TIMED-OUT")
+APIFY_FAILED_STATUSES = ("FAILED", "ABORTED", "TIMED-OUT")
+APIFY_MAX_WAIT_SECONDS = float(os.getenv("APIFY_MAX_WAIT_SECONDS", 1800))  # A longer run is aborted
+
+class ApifyRunError(Exception):
+    pass
 
 # ✅ List of disallowed file extensions
 DISALLOWED_EXTENSIONS = [".pdf", ".xls", ".xlsx", ".doc", ".docx", ".ppt", ".pptx", ".zip", ".rar"]
@@ -45,12 +71,7 @@ def is_valid_url(url):
 # ✅ S3 Upload Function (Consistent with PDF Processing)
 def upload_file_to_s3(file_content, s3_path, content_type="text/plain"):
     try:
-        s3.put_object(
-            Bucket=bucket_name,
-            Key=s3_path,
-            Body=file_content,
-            ContentType=content_type,
-        )
+        get_uploader().upload_bytes(file_content, s3_path, content_type)
         s3_url = f"https://{bucket_name}.s3.{aws_region}.amazonaws.com/{s3_path}"
         print(f"✅ Uploaded to S3: {s3_url}")
         return s3_url
@@ -58,80 +79,221 @@ def upload_file_to_s3(file_content, s3_path, content_type="text/plain"):
         print(f"❌ Error uploading to S3: {e}")
         return None
 
+def new_run_manifest(url, run_id=None, uploader=None):
+    """Manifest for one scrape run; `uploader` (e.g. a benchmark stub) gets its own artifact store."""
+    run_id = run_id or uuid.uuid4().hex
+    store = ArtifactStore(uploader=uploader) if uploader else None
+    return JobManifest(f"{EN_MANIFESTS_PREFIX}/{run_id}.json", store=store, metadata={"url": url, "run_id": run_id},
+                       latest_key=latest_manifest_key(EN_MANIFESTS_PREFIX))
+
 # ✅ Download & Upload Images to S3
-def save_and_upload_images(image_urls):
-    s3_image_urls = []
-    for idx, url in enumerate(image_urls):
-        try:
-            response = requests.get(url)
-            response.raise_for_status()
-            file_name = f"image_{idx + 1}.jpg"
-            s3_path = f"scraped_data/scraped_en_data/images/{file_name}"
-            upload_url = upload_file_to_s3(response.content, s3_path, "image/jpeg")
-            if upload_url:
-                s3_image_urls.append(upload_url)
-        except Exception as e:
-            print(f"❌ Failed to download/upload image {url}: {e}")
-    return s3_image_urls
-
-# ✅ Generate Markdown Content & Upload to S3
-def generate_and_upload_markdown(text_content, image_urls):
-    markdown_content = "# Extracted Webpage Data\n\n## Page Content\n\n" + text_content + "\n\n"
-    if image_urls:
-        markdown_content += "## Extracted Images\n\n"
-        for idx, url in enumerate(image_urls):
-            markdown_content += f"![Image {idx + 1}]({url})\n\n"
-
-    # ✅ Upload to S3
-    markdown_s3_path = "scraped_data/scraped_en_data/extracted_content.md"
-    upload_file_to_s3(markdown_content.encode("utf-8"), markdown_s3_path, "text/markdown")
-    
-    return markdown_s3_path
+def upload_images(image_urls, manifest, fetcher=None, first_index=1):
+    """
+    Fetch each distinct image URL once and add it to the run's manifest.
 
-# ✅ FastAPI Endpoint for Enterprise Web Scraping
-@app.post("/enscrape")
-def scrape_webpage(request: ScrapeRequest):
-    """Scrape a webpage using Apify and upload the results to S3."""
-    if not is_valid_url(request.url):
-        raise HTTPException(status_code=400, detail="Invalid URL or unsupported file type.")
+    Returns {image URL: S3 URL} for the ones that made it. Concurrency is
+    bounded by the image fetcher's worker pool and per-host limit; images
+    already in S3 from earlier runs are not uploaded again.
+    """
+    unique_urls = list(dict.fromkeys(image_urls))
+    fetcher = fetcher or get_image_fetcher()
+    s3_urls = {}
+    for url, s3_key, error in fetcher.fetch_to_manifest(unique_urls, manifest, first_index=first_index):
+        if error:
+            print(f"❌ Failed to download image {url}: {error}")
+        else:
+            s3_urls[url] = f"https://{bucket_name}.s3.{aws_region}.amazonaws.com/{s3_key}"
+    print(f"✅ Fetched {len(s3_urls)} of {len(unique_urls)} distinct images ({len(image_urls)} referenced)")
+    return s3_urls
+
+def write_run_manifest(manifest):
+    """Wait for the run's uploads and store its manifest; return the number of failed uploads."""
+    failed = 0
+    for name, s3_key, error in manifest.write():
+        if error:
+            failed += 1
+            print(f"❌ Error uploading {name} to S3: {error}")
+    print(f"✅ Manifest written: {manifest.manifest_key}")
+    return failed
+
+def write_items_markdown(md, items, s3_image_urls, start=1):
+    """Write a section per crawled page, numbered from `start`, to a MarkdownWriter."""
+    for idx, item in enumerate(items, start=start):
+        md.heading(f"Page {idx}: {item.get('title') or item.get('url', '')}", 2)
+        if item.get("url"):
+            md.paragraph(f"Source: {item['url']}")
+        if item.get("error"):
+            md.paragraph(f"_Scrape failed: {item['error']}_")
+            continue
+        md.paragraph(item.get("text") or "")
+        page_images = [s3_image_urls[url] for url in dict.fromkeys(item.get("images") or []) if url in s3_image_urls]
+        if page_images:
+            md.heading("Extracted Images", 3)
+            for image_idx, url in enumerate(page_images):
+                md.image(url, f"Image {image_idx + 1}")
+
+def stream_items_markdown(manifest, items, s3_image_urls):
+    """Stream the run's combined markdown document into its manifest; return the document's key."""
+    markdown_stream = manifest.open("extracted_content.md", "text/markdown", primary=True)
+    with MarkdownWriter(markdown_stream) as md:
+        md.heading("Extracted Webpage Data")
+        write_items_markdown(md, items, s3_image_urls)
+    return markdown_stream.key
 
-    # ✅ Apify actor configuration
-    actor_id = "apify/puppeteer-scraper"
-    input_data = {
-        "startUrls": [{"url": request.url}],
+def actor_client(client=None):
+    if client is not None:
+        return client
+    if not APIFY_TOKEN:
+        raise ValueError("Apify API token is missing. Please set the APIFY_TOKEN environment variable.")
+    # ✅ Shared Apify client
+    return get_apify_client()
+
+def actor_input(url):
+    return {
+        "startUrls": [{"url": url}],
         "maxConcurrency": 10,
-        "maxPagesPerCrawl": 5,
-        "pageFunction": """async ({ page, request }) => {
-            try {
-                await page.waitForSelector('img');
-                const images = await page.$$eval('img', imgs => imgs.map(img => img.src || img.getAttribute('ng-src')));
-                const validImages = [...new Set(images)].filter(url => url && url.startsWith('http'));
-                const textContent = await page.evaluate(() => document.body.innerText);
-                return { url: request.url, title: await page.title(), images: validImages, text: textContent };
-            } catch (error) {
-                return { url: request.url, error: error.message };
-            }
-        }""",
+        "maxPagesPerCrawl": APIFY_MAX_PAGES,
+        "pageFunction": APIFY_PAGE_FUNCTION,
     }
 
-    try:
-        # ✅ Initialize Apify client
-        client = ApifyClient(APIFY_TOKEN)
+def run_actor(url, client=None):
+    """Run the Apify actor on `url`, wait for the whole crawl and return its dataset items."""
+    client = actor_client(client)
+    run = client.actor(APIFY_ACTOR_ID).call(run_input=actor_input(url))
+    return client.dataset(run["defaultDatasetId"]).list_items().items
+
+def iter_run_items(client, run, page_size=APIFY_PAGE_SIZE, poll_seconds=APIFY_POLL_SECONDS,
+                   max_wait_seconds=APIFY_MAX_WAIT_SECONDS):
+    """
+    Yield lists of dataset items as a started run writes them, paging with offset/limit.
+
+    Stops once the run has finished and every item it wrote has been read.
+    Raises ApifyRunError if the run failed, was aborted or timed out, and
+    aborts the run itself if it has not finished after `max_wait_seconds`.
+    """
+    dataset = client.dataset(run["defaultDatasetId"])
+    run_client = client.run(run["id"])
+    deadline = time.time() + max_wait_seconds
+    offset = 0
+    while True:
+        # Read the status first: items written before a final status are all drained below
+        status = run_client.get()["status"]
+        while True:
+            items = dataset.list_items(offset=offset, limit=page_size).items
+            if not items:
+                break
+            offset += len(items)
+            yield items
+            if len(items) < page_size:
+                break
+        if status in APIFY_FAILED_STATUSES:
+            raise ApifyRunError(f"Apify run {run['id']} finished with status {status}")
+        if status in APIFY_TERMINAL_STATUSES:
+            return
+        if time.time() >= deadline:
+            run_client.abort()
+            raise ApifyRunError(f"Apify run {run['id']} did not finish within {max_wait_seconds:.0f}s "
+                                f"(status {status}) and was aborted")
+        time.sleep(poll_seconds)
 
-        # ✅ Run the Apify actor
-        run = client.actor(actor_id).call(run_input=input_data)
+def stream_apify_scrape(url, client=None, fetcher=None, uploader=None, progress=None,
+                        page_size=APIFY_PAGE_SIZE, poll_seconds=APIFY_POLL_SECONDS):
+    """
+    Start the Apify actor on `url` and process pages while the crawl is still running.
 
-        # ✅ Fetch the results
-        dataset_id = run["defaultDatasetId"]
-        items = client.dataset(dataset_id).list_items().items
+    Each batch of new dataset items gets its new images fetched (once per
+    distinct URL across the run) and one markdown file per page uploaded
+    right away; a combined document is written when the run has finished.
+    """
+    start_time = time.time()
+    client = actor_client(client)
+    run = client.actor(APIFY_ACTOR_ID).start(run_input=actor_input(url))
+    manifest = new_run_manifest(url, run["id"], uploader)
+    if progress:
+        progress("started", f"Apify run {run['id']} started")
 
-        # ✅ Process the results
-        for item in items:
-            images = item.get("images", [])
-            text = item.get("text", "")
-            s3_image_urls = save_and_upload_images(images)
-            md_s3_url = generate_and_upload_markdown(text, s3_image_urls)
-            return {"markdown_s3_url": md_s3_url}
+    items = []
+    attempted_images = set()
+    s3_image_urls = {}
+    first_result_seconds = None
+    for new_items in iter_run_items(client, run, page_size, poll_seconds):
+        new_images = [image_url for item in new_items for image_url in (item.get("images") or [])
+                      if image_url not in attempted_images]
+        new_images = list(dict.fromkeys(new_images))
+        s3_image_urls.update(upload_images(new_images, manifest, fetcher=fetcher,
+                                           first_index=len(attempted_images) + 1))
+        attempted_images.update(new_images)
 
+        # ✅ One markdown file per page, uploaded as soon as the page is ready
+        for item in new_items:
+            items.append(item)
+            page_markdown = MarkdownWriter()
+            write_items_markdown(page_markdown, [item], s3_image_urls, start=len(items))
+            manifest.add_bytes(f"pages/page_{len(items):04d}.md", page_markdown.getvalue(), "text/markdown")
+        if first_result_seconds is None:
+            first_result_seconds = time.time() - start_time
+        if progress:
+            progress("pages", f"{len(items)} pages processed, {len(s3_image_urls)} images uploaded",
+                     advance=len(new_items))
+
+    status = client.run(run["id"]).get()["status"]
+    if not items:
+        raise ValueError(f"Apify run {run['id']} finished with status {status} and returned no pages for {url}")
+
+    markdown_s3_key = stream_items_markdown(manifest, items, s3_image_urls)
+    failed_uploads = write_run_manifest(manifest)
+    if progress:
+        progress("uploaded", f"{len(items)} pages written to S3, {failed_uploads} uploads failed")
+
+    return {
+        "run_id": run["id"],
+        "status": status,
+        "markdown_s3_url": markdown_s3_key,
+        "manifest_s3_key": manifest.manifest_key,
+        "pages": len(items),
+        "failed_pages": sum(1 for item in items if item.get("error")),
+        "images": len(s3_image_urls),
+        "failed_uploads": failed_uploads,
+        "first_result_seconds": round(first_result_seconds, 3),
+        "total_seconds": round(time.time() - start_time, 3),
+    }
+
+def scrape_with_apify(url, client=None, fetcher=None, uploader=None):
+    """
+    Scrape `url` with Apify and upload one markdown document covering every crawled page.
+
+    Images from all pages go through a single bounded-concurrency fetch
+    stage, and an image URL shared by several pages is fetched once.
+    `client`, `fetcher` and `uploader` default to the shared ones; pass
+    stubs to run offline.
+    """
+    items = run_actor(url, client)
+    if not items:
+        raise ValueError(f"Apify returned no pages for {url}")
+
+    manifest = new_run_manifest(url, uploader=uploader)
+    image_urls = [image_url for item in items for image_url in (item.get("images") or [])]
+    s3_image_urls = upload_images(image_urls, manifest, fetcher=fetcher)
+
+    markdown_s3_key = stream_items_markdown(manifest, items, s3_image_urls)
+    failed_uploads = write_run_manifest(manifest)
+    return {
+        "markdown_s3_url": markdown_s3_key,
+        "manifest_s3_key": manifest.manifest_key,
+        "pages": len(items),
+        "failed_pages": sum(1 for item in items if item.get("error")),
+        "images": len(s3_image_urls),
+        "failed_uploads": failed_uploads,
+    }
+
+# ✅ FastAPI Endpoint for Enterprise Web Scraping
+@app.post("/enscrape")
+def scrape_webpage(request: ScrapeRequest):
+    """Scrape a webpage using Apify and upload the results to S3."""
+    if not is_valid_url(request.url):
+        raise HTTPException(status_code=400, detail="Invalid URL or unsupported file type.")
+
+    try:
+        return scrape_with_apify(request.url)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"❌ An error occurred: {str(e)}")
@@ -0,0 +1,280 @@
+import os
+import math
+import time
+import uuid
+import asyncio
+import hashlib
+import threading
+import requests
+from urllib.parse import urldefrag, urlsplit
+from urllib.robotparser import RobotFileParser
+from requests.adapters import HTTPAdapter
+from OSWebScrap import ScrapeSession, build_text_markdown, DISALLOWED_EXTENSIONS
+from s3_uploader import get_uploader
+
+# ✅ Crawl limits and politeness (override via environment)
+CRAWL_MAX_PAGES = int(os.getenv("CRAWL_MAX_PAGES", 200))
+CRAWL_MAX_DEPTH = int(os.getenv("CRAWL_MAX_DEPTH", 3))
+CRAWL_CONCURRENCY = int(os.getenv("CRAWL_CONCURRENCY", 8))
+CRAWL_HOST_DELAY = float(os.getenv("CRAWL_HOST_DELAY", 0.5))  # Seconds between requests to one host
+CRAWL_TIMEOUT = float(os.getenv("CRAWL_TIMEOUT", 15))
+CRAWL_USER_AGENT = os.getenv("CRAWL_USER_AGENT", "AI-Information-Extractor-Crawler")
+
+# Crawls up to this many pages track seen URLs exactly; larger ones use a Bloom filter
+EXACT_SEEN_LIMIT = 100_000
+
+# Base S3 folder for crawl output
+CRAWL_S3_PREFIX = "scraped_data/scraped_os_data/crawls"
+
+
+class BloomFilter:
+    """
+    Fixed-size probabilistic set: no false negatives, about `error_rate` false positives.
+
+    Memory stays at a few bits per URL however large the crawl gets.
+    """
+
+    def __init__(self, capacity, error_rate=0.001):
+        # Standard sizing: m = -n ln(p) / ln(2)^2 bits, k = m/n ln(2) hashes
+        self.size = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item):
+        digest = hashlib.blake2b(item.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hashes))
+
+    def add(self, item):
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, item):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+
+def make_seen_set(max_pages):
+    """Exact set for normal crawls, Bloom filter for very large ones."""
+    # Every fetched page can discover many more URLs than it fetches
+    expected_urls = max_pages * 50
+    return set() if expected_urls <= EXACT_SEEN_LIMIT else BloomFilter(expected_urls)
+
+
+def normalize_url(url):
+    """Drop the fragment and lowercase scheme and host so one page has one key."""
+    url, _ = urldefrag(url)
+    parts = urlsplit(url)
+    path = parts.path or "/"
+    query = f"?{parts.query}" if parts.query else ""
+    return f"{parts.scheme.lower()}://{parts.netloc.lower()}{path}{query}"
+
+
+class HostScheduler:
+    """
+    Per-host politeness: robots.txt rules (fetched once per host) and a
+    minimum delay between requests to the same host.
+    """
+
+    def __init__(self, fetch, user_agent=CRAWL_USER_AGENT, delay=CRAWL_HOST_DELAY):
+        self._fetch = fetch
+        self.user_agent = user_agent
+        self.delay = delay
+        self._robots = {}
+        self._locks = {}
+        self._next_slot = {}
+
+    async def robots(self, url):
+        parts = urlsplit(url)
+        host = f"{parts.scheme}://{parts.netloc}"
+        if host not in self._robots:
+            parser = RobotFileParser(f"{host}/robots.txt")
+            try:
+                status, _, text = await asyncio.to_thread(self._fetch, f"{host}/robots.txt")
+                if status >= 400:
+                    parser.allow_all = True
+                else:
+                    parser.parse(text.splitlines())
+            except Exception:
+                parser.allow_all = True  # unreachable robots.txt: crawl as allowed
+            self._robots[host] = parser
+        return self._robots[host]
+
+    async def allowed(self, url):
+        return (await self.robots(url)).can_fetch(self.user_agent, url)
+
+    async def wait_turn(self, url):
+        """Sleep until this host may be hit again, honouring robots.txt Crawl-delay."""
+        host = urlsplit(url).netloc
+        lock = self._locks.setdefault(host, asyncio.Lock())
+        delay = max(self.delay, (await self.robots(url)).crawl_delay(self.user_agent) or 0)
+        async with lock:
+            now = time.monotonic()
+            slot = self._next_slot.get(host, now)
+            if slot > now:
+                await asyncio.sleep(slot - now)
+            self._next_slot[host] = max(slot, now) + delay
+
+
+class Crawler:
+    """
+    Crawls a site from `start_url` and writes one markdown file per page to S3.
+
+    Breadth-first frontier with same-domain, depth and page-count limits.
+    Pages are fetched concurrently over pooled sessions, politely per host,
+    and each page's markdown is uploaded as soon as it is built. Parsing
+    runs in threads, off the crawl's event loop. `progress`, if given, is a
+    job ProgressReporter told about every page.
+    """
+
+    def __init__(self, start_url, max_pages=CRAWL_MAX_PAGES, max_depth=CRAWL_MAX_DEPTH,
+                 concurrency=CRAWL_CONCURRENCY, host_delay=CRAWL_HOST_DELAY, same_domain=True,
+                 s3_prefix=None, uploader=None, user_agent=CRAWL_USER_AGENT, progress=None):
+        self.start_url = normalize_url(start_url)
+        self.domain = urlsplit(self.start_url).netloc
+        self.max_pages = max_pages
+        self.max_depth = max_depth
+        self.concurrency = concurrency
+        self.same_domain = same_domain
+        self.s3_prefix = s3_prefix or f"{CRAWL_S3_PREFIX}/{uuid.uuid4().hex[:12]}"
+        self.uploader = uploader or get_uploader()
+        self.user_agent = user_agent
+        self.progress = progress
+        self.scheduler = HostScheduler(self._fetch, user_agent, host_delay)
+        self._local = threading.local()
+        self._seen = make_seen_set(max_pages)
+        self._scheduled = 0
+        self._batch = None
+        self.pages = []  # (url, markdown S3 key) in crawl order
+        self.failed = []  # (url, error)
+        self.skipped_by_robots = 0
+
+    def _session(self):
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=self.concurrency, pool_maxsize=self.concurrency)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            session.headers["User-Agent"] = self.user_agent
+            self._local.session = session
+        return session
+
+    def _fetch(self, url):
+        """Blocking GET; returns (status, content type, text)."""
+        response = self._session().get(url, timeout=CRAWL_TIMEOUT)
+        return response.status_code, response.headers.get("Content-Type", ""), response.text
+
+    def _enqueue(self, frontier, url, depth):
+        if self._scheduled >= self.max_pages or url in self._seen:
+            return
+        self._seen.add(url)
+        self._scheduled += 1
+        frontier.put_nowait((url, depth))
+
+    def _links(self, page):
+        for anchor in page.soup.find_all("a", href=True):
+            url = normalize_url(requests.compat.urljoin(page.url, anchor["href"]))
+            if not url.startswith(("http://", "https://")):
+                continue
+            if urlsplit(url).path.lower().endswith(tuple(DISALLOWED_EXTENSIONS)):
+                continue
+            if self.same_domain and urlsplit(url).netloc != self.domain:
+                continue
+            yield url
+
+    def _parse(self, url, html):
+        """Blocking: parse once, the same DOM gives the markdown and the outgoing links."""
+        page = ScrapeSession(url, html=html)
+        markdown_content = f"<!-- Source: {url} -->\n\n" + build_text_markdown(page)
+        return markdown_content, list(self._links(page))
+
+    async def _crawl_page(self, frontier, url, depth):
+        if not await self.scheduler.allowed(url):
+            self.skipped_by_robots += 1
+            self._scheduled -= 1  # give the page budget back to allowed URLs
+            return
+        await self.scheduler.wait_turn(url)
+
+        status, content_type, html = await asyncio.to_thread(self._fetch, url)
+        if status >= 400:
+            raise RuntimeError(f"HTTP {status}")
+        if "html" not in content_type:
+            raise RuntimeError(f"Not an HTML page ({content_type})")
+
+        markdown_content, links = await asyncio.to_thread(self._parse, url, html)
+
+        # ✅ Incremental output: each page is uploaded as soon as it is built
+        s3_path = f"{self.s3_prefix}/pages/page_{len(self.pages) + 1:05d}.md"
+        self.pages.append((url, s3_path))
+        self._batch.add_bytes(markdown_content, s3_path, "text/markdown")
+        if self.progress:
+            self.progress("page", f"Crawled {url}", advance=1)
+
+        if depth < self.max_depth:
+            for link in links:
+                self._enqueue(frontier, link, depth + 1)
+
+    async def _worker(self, frontier):
+        while True:
+            url, depth = await frontier.get()
+            try:
+                await self._crawl_page(frontier, url, depth)
+            except Exception as e:
+                self.failed.append((url, str(e)))
+                print(f"❌ Failed to crawl {url}: {e}")
+            finally:
+                frontier.task_done()
+
+    async def run(self):
+        """Crawl until the frontier is empty or the page limit is hit; return crawl stats."""
+        start_time = time.time()
+        if self.progress:
+            self.progress("started", f"Crawling {self.start_url} (up to {self.max_pages} pages)")
+        frontier = asyncio.Queue()
+        self._batch = self.uploader.batch()
+        self._enqueue(frontier, self.start_url, 0)
+        workers = [asyncio.create_task(self._worker(frontier)) for _ in range(self.concurrency)]
+        await frontier.join()
+        for worker in workers:
+            worker.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+
+        # Drop pages whose markdown never reached S3
+        upload_errors = {s3_path: error for _, s3_path, error in await asyncio.to_thread(self._batch.wait) if error}
+        for url, s3_path in self.pages:
+            if s3_path in upload_errors:
+                self.failed.append((url, str(upload_errors[s3_path])))
+        self.pages = [(url, s3_path) for url, s3_path in self.pages if s3_path not in upload_errors]
+
+        # ✅ Crawl index linking every page's markdown
+        index = "# Crawl Index\n\n" + "".join(f"- [{url}]({s3_path})\n" for url, s3_path in self.pages)
+        index_s3_path = f"{self.s3_prefix}/index.md"
+        await asyncio.to_thread(self.uploader.upload_bytes, index, index_s3_path, "text/markdown")
+        if self.progress:
+            self.progress("uploaded", f"{len(self.pages)} pages written to S3, {len(self.failed)} failed")
+
+        seconds = time.time() - start_time
+        return {
+            "start_url": self.start_url,
+            "s3_prefix": self.s3_prefix,
+            "index_s3_path": index_s3_path,
+            "pages": len(self.pages),
+            "failed": len(self.failed),
+            "skipped_by_robots": self.skipped_by_robots,
+            "seconds": round(seconds, 3),
+            "pages_per_second": round(len(self.pages) / seconds, 2) if seconds else None,
+        }
+
+
+def run_crawl(start_url, max_pages=CRAWL_MAX_PAGES, max_depth=CRAWL_MAX_DEPTH, progress=None):
+    """
+    Blocking crawl for a job queue thread: run the Crawler on its own event loop.
+
+    Returns the crawl stats with every page's markdown key; fails if no page could be crawled.
+    """
+    crawler = Crawler(start_url, max_pages=max_pages, max_depth=max_depth, progress=progress)
+    stats = asyncio.run(crawler.run())
+    if not stats["pages"]:
+        raise RuntimeError(f"No pages could be crawled from {start_url}")
+    return {**stats, "markdown_s3_paths": [s3_path for _, s3_path in crawler.pages]}
@@ -1,34 +1,114 @@
 import os
+import uuid
+import codecs
 import requests
-import boto3
 from bs4 import BeautifulSoup
 from io import BytesIO
 from dotenv import load_dotenv
+from s3_uploader import get_uploader, MB
+from image_fetcher import get_image_fetcher
+from http_cache import get_http_cache
+from artifact_store import JobManifest, latest_manifest_key
+from markdown_writer import MarkdownWriter
+from html_stream import iter_page_events, TEXT, IMAGE, TABLE
 
 # ✅ Load environment variables
 load_dotenv()
 
 # ✅ AWS Configuration (Consistent with PDF Processing)
-session = boto3.Session(
-    aws_access_key_id=os.getenv('AWS_SERVER_PUBLIC_KEY'),
-    aws_secret_access_key=os.getenv('AWS_SERVER_SECRET_KEY'),
-)
-s3 = session.client('s3')
 bucket_name = os.getenv('AWS_BUCKET_NAME')
 aws_region = os.getenv('AWS_REGION')  # e.g., 'us-east-1'
 
+# ✅ S3 folder of the open-source scraper; artifacts are content-addressed, each scrape writes a manifest
+OS_SCRAPE_PREFIX = "scraped_data/scraped_os_data"
+OS_MANIFESTS_PREFIX = f"{OS_SCRAPE_PREFIX}/manifests"
+
 # ✅ List of disallowed file extensions
 DISALLOWED_EXTENSIONS = [".pdf", ".xls", ".xlsx", ".doc", ".docx", ".ppt", ".pptx", ".zip", ".rar"]
 
+# ✅ HTML parser: lxml when installed (several times faster), the built-in parser otherwise
+try:
+    import lxml  # noqa: F401
+    HTML_PARSER = "lxml"
+except ImportError:
+    HTML_PARSER = "html.parser"
+
+# ✅ Streaming parse of very large pages: largest body accepted and download chunk size
+OS_STREAMING_MAX_MB = int(os.getenv("OS_STREAMING_MAX_MB", 200))
+PAGE_CHUNK_SIZE = 256 * 1024
+
+class PageTooLargeError(Exception):
+    pass
+
+class ScrapeSession:
+    """
+    One page, fetched once and parsed at most once.
+
+    The text, image and table extractors all read the same DOM. Script and
+    style elements are dropped at parse time since no extractor uses them.
+    Pages are fetched through the HTTP cache; when the page is unchanged,
+    extractors reuse their cached results and the DOM is never built.
+    """
+
+    def __init__(self, url, timeout=30, html=None):
+        # `html` lets a caller that already fetched the page (e.g. the crawler) skip the request
+        self.url = url
+        if html is None:
+            response = get_http_cache().get(url, timeout)
+            html = response.text
+            self.fingerprint = response.fingerprint
+            self.unchanged = response.unchanged
+        else:
+            self.fingerprint = None  # not from the HTTP cache, so results are not cached either
+            self.unchanged = False
+        self.html = html
+        self._soup = None
+        self._images = None
+
+    @property
+    def soup(self):
+        if self._soup is None:
+            self._soup = BeautifulSoup(self.html, HTML_PARSER)
+            for script_or_style in self._soup(["script", "style"]):
+                script_or_style.decompose()
+        return self._soup
+
+    @property
+    def images(self):
+        # (absolute URL, alt text) of every <img> with a src, in page order
+        if self._images is None:
+            self._images = self.cached("images", self._find_images)
+        return self._images
+
+    def _find_images(self):
+        images = []
+        for idx, img_tag in enumerate(self.soup.find_all("img")):
+            img_url = img_tag.get("src")
+            if img_url:
+                images.append((requests.compat.urljoin(self.url, img_url), img_tag.get("alt", f"Image {idx + 1}")))
+        return images
+
+    def cached(self, name, build):
+        """Result of `build()` for this page body, reused from the HTTP cache when the page is unchanged."""
+        if self.fingerprint is None:
+            return build()
+        cache = get_http_cache()
+        value = cache.derived(self.url, name, self.fingerprint)
+        if value is None:
+            value = build()
+            cache.store_derived(self.url, name, self.fingerprint, value)
+        return value
+
+def as_scrape_session(url_or_session):
+    """Accept a URL (fetched and parsed now) or an existing ScrapeSession."""
+    if isinstance(url_or_session, ScrapeSession):
+        return url_or_session
+    return ScrapeSession(url_or_session)
+
 # ✅ S3 Upload Function (Consistent with PDF Processing)
 def upload_file_to_s3(file_content, s3_path, content_type="text/plain"):
     try:
-        s3.put_object(
-            Bucket=bucket_name,
-            Key=s3_path,
-            Body=file_content,
-            ContentType=content_type,
-        )
+        get_uploader().upload_bytes(file_content, s3_path, content_type)
         s3_url = f"https://{bucket_name}.s3.{aws_region}.amazonaws.com/{s3_path}"
         print(f"Uploaded to S3: {s3_url}")
         return s3_url
@@ -36,6 +116,20 @@ def upload_file_to_s3(file_content, s3_path, content_type="text/plain"):
         print(f"Error uploading to S3: {e}")
         return None
 
+def new_scrape_manifest(url=None):
+    """Manifest for one scrape, written to its own key so concurrent scrapes never collide."""
+    return JobManifest(f"{OS_MANIFESTS_PREFIX}/{uuid.uuid4().hex}.json", metadata={"url": url},
+                       latest_key=latest_manifest_key(OS_MANIFESTS_PREFIX))
+
+def write_manifest(manifest):
+    """Wait for the scrape's uploads, then store its manifest; return the manifest key."""
+    for name, s3_key, error in manifest.write():
+        if error:
+            print(f"Error uploading {name} to S3: {error}")
+        else:
+            print(f"Uploaded {name} to S3: {s3_key}")
+    return manifest.manifest_key
+
 # ✅ URL Validation
 def is_valid_url(url):
     if not url.startswith(("http://", "https://")):
@@ -48,71 +142,68 @@ def is_valid_url(url):
 
     return True
 
-# ✅ Scrape Visual Data (Images & Tables)
-def scrape_visual_data(url):
-    response = requests.get(url)
-    response.raise_for_status()
-    soup = BeautifulSoup(response.text, "html.parser")
-
-    # ✅ Scrape & Upload Images
-    img_tags = soup.find_all("img")
-    images = []
-    for idx, img_tag in enumerate(img_tags):
-        img_url = img_tag.get("src")
-        if not img_url:
-            continue
-        img_url = requests.compat.urljoin(url, img_url)
-
-        try:
-            img_data = requests.get(img_url).content
-            s3_path = f"scraped_data/scraped_os_data/images/image_{idx + 1}.jpg"
-            upload_url = upload_file_to_s3(img_data, s3_path, "image/jpeg")
-            if upload_url:
-                images.append(upload_url)
-        except Exception as e:
-            print(f"Failed to download image {img_url}: {e}")
-
-    # ✅ Scrape & Upload Tables
+def extract_tables(soup):
+    """Cell text of every <table>, as a list of rows per table."""
     tables = []
-    table_text = ""
-    for table_idx, table in enumerate(soup.find_all("table"), start=1):
+    for table in soup.find_all("table"):
         table_data = []
         for row in table.find_all("tr"):
             row_data = [cell.get_text(strip=True) for cell in row.find_all(["td", "th"])]
             table_data.append(row_data)
         tables.append(table_data)
+    return tables
 
-        # Convert table to string format
-        table_text += f"Table {table_idx}:\n"
-        for row in table_data:
-            table_text += " | ".join(row) + "\n"
-        table_text += "\n"
+def upload_images(img_urls, manifest):
+    """Fetch images into the manifest, each distinct URL once; return the S3 URLs of those stored."""
+    images = []
+    img_urls = list(dict.fromkeys(img_urls))
+    for img_url, s3_path, error in get_image_fetcher().fetch_to_manifest(img_urls, manifest):
+        if error:
+            print(f"Failed to download/upload image {img_url}: {error}")
+        else:
+            images.append(f"https://{bucket_name}.s3.{aws_region}.amazonaws.com/{s3_path}")
+    return images
+
+def write_tables(tables, manifest):
+    """Stream table data to S3 in text format; return its S3 key."""
+    table_stream = manifest.open("tables.txt", "text/plain")
+    with MarkdownWriter(table_stream) as table_text:
+        for table_idx, table_data in enumerate(tables, start=1):
+            table_text.line(f"Table {table_idx}:")
+            for row in table_data:
+                table_text.line(" | ".join(row))
+            table_text.line()
+    return table_stream.key
+
+# ✅ Scrape Visual Data (Images & Tables)
+def scrape_visual_data(url, manifest=None):
+    page = as_scrape_session(url)
+    own_manifest = manifest is None
+    manifest = manifest or new_scrape_manifest(page.url)
+
+    # ✅ Scrape & Upload Images (concurrent downloads, each uploaded as soon as it arrives)
+    images = upload_images([img_url for img_url, _ in page.images], manifest)
 
-    # ✅ Upload table data to S3
-    table_s3_path = "scraped_data/scraped_os_data/tables.txt"
-    upload_file_to_s3(table_text.encode("utf-8"), table_s3_path, "text/plain")
+    # ✅ Scrape & Upload Tables (parsed again only when the page changed)
+    tables = page.cached("tables", lambda: extract_tables(page.soup))
+    table_s3_path = write_tables(tables, manifest)
+    if own_manifest:
+        write_manifest(manifest)
 
     return {"images": images, "tables": tables, "tables_s3_url": table_s3_path}
 
 # ✅ Scrape Text Data & Images, Store as Markdown
-def scrape_text_data_with_images(url):
-    response = requests.get(url)
-    response.raise_for_status()
-    soup = BeautifulSoup(response.text, "html.parser")
+def build_text_markdown(url):
+    """Markdown of a page's visible text followed by its image references."""
+    page = as_scrape_session(url)
+    return page.cached("text_markdown", lambda: text_markdown(page))
 
-    # ✅ Remove script and style elements
-    for script_or_style in soup(["script", "style"]):
-        script_or_style.extract()
+def text_markdown(page):
+    # ✅ Script and style elements are already removed by the scrape session
+    soup = page.soup
 
     # ✅ Extract all image references for Markdown
-    img_tags = soup.find_all("img")
-    image_markdown = []
-    for idx, img_tag in enumerate(img_tags):
-        img_url = img_tag.get("src")
-        alt_text = img_tag.get("alt", f"Image {idx + 1}")
-        if img_url:
-            img_url = requests.compat.urljoin(url, img_url)
-            image_markdown.append(f"![{alt_text}]({img_url})")
+    image_markdown = [f"![{alt_text}]({img_url})" for img_url, alt_text in page.images]
 
     # ✅ Get visible text
     text = soup.get_text()
@@ -121,33 +212,104 @@ def scrape_text_data_with_images(url):
     cleaned_text = "\n".join(chunk for chunk in chunks if chunk)
 
     # ✅ Append image references to text
-    markdown_content = f"{cleaned_text}\n\n## Images\n\n" + "\n\n".join(image_markdown)
+    return f"{cleaned_text}\n\n## Images\n\n" + "\n\n".join(image_markdown)
+
+def scrape_text_data_with_images(url, manifest=None):
+    page = as_scrape_session(url)
+    markdown_content = build_text_markdown(page)
 
     # ✅ Upload Markdown to S3
-    markdown_s3_path = "scraped_data/scraped_os_data/scraped_content.md"
-    upload_file_to_s3(markdown_content.encode("utf-8"), markdown_s3_path, "text/markdown")
+    own_manifest = manifest is None
+    manifest = manifest or new_scrape_manifest(page.url)
+    markdown_s3_path = manifest.add_bytes("scraped_content.md", markdown_content, "text/markdown")
+    if own_manifest:
+        write_manifest(manifest)
 
     return markdown_s3_path
 
+# ✅ Streaming mode for very large pages
+def iter_page_chunks(url, timeout=30, max_bytes=OS_STREAMING_MAX_MB * MB):
+    """Decoded text of a page, chunk by chunk as it downloads; the body is never held whole."""
+    with requests.get(url, stream=True, timeout=timeout) as response:
+        response.raise_for_status()
+        content_length = response.headers.get("Content-Length")
+        if content_length and int(content_length) > max_bytes:
+            raise PageTooLargeError(f"Page too large ({int(content_length) // MB} MB)")
+        try:
+            decoder = codecs.getincrementaldecoder(response.encoding or "utf-8")(errors="replace")
+        except LookupError:
+            decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+
+        size = 0
+        for chunk in response.iter_content(PAGE_CHUNK_SIZE):
+            size += len(chunk)
+            if size > max_bytes:
+                raise PageTooLargeError(f"Page larger than {max_bytes // MB} MB")
+            text = decoder.decode(chunk)
+            if text:
+                yield text
+        yield decoder.decode(b"", final=True)
+
+def scrape_page_streaming(url, manifest=None):
+    """
+    scrape_text_data_with_images() and scrape_visual_data() in one pass, for pages too large for a DOM.
+
+    The page is parsed as it downloads: text blocks go straight into
+    scraped_content.md, image references and table rows are collected on
+    the way. Peak memory follows the tables and image list, not the page.
+    Returns (markdown S3 key, visual data as from scrape_visual_data()).
+    """
+    own_manifest = manifest is None
+    manifest = manifest or new_scrape_manifest(url)
+
+    image_refs = []
+    tables = []
+    markdown_stream = manifest.open("scraped_content.md", "text/markdown")
+    with MarkdownWriter(markdown_stream) as md:
+        for kind, value in iter_page_events(iter_page_chunks(url), url):
+            if kind == TEXT:
+                md.line(value)
+            elif kind == IMAGE:
+                image_refs.append(value)
+            elif kind == TABLE:
+                tables.append([])
+            else:
+                table_number, row = value
+                tables[table_number - 1].append(row)
+
+        # ✅ Append image references to text
+        md.write("\n## Images\n\n" + "\n\n".join(f"![{alt_text}]({img_url})" for img_url, alt_text in image_refs))
+    markdown_s3_path = markdown_stream.key
+
+    images = upload_images([img_url for img_url, _ in image_refs], manifest)
+    table_s3_path = write_tables(tables, manifest)
+    if own_manifest:
+        write_manifest(manifest)
+
+    return markdown_s3_path, {"images": images, "tables": tables, "tables_s3_url": table_s3_path}
+
 # ✅ Convert Scraped Data to Final Markdown
-def convert_to_markdown(data):
-    markdown_content = "# Extracted Web Content\n\n"
-
-    # ✅ Add Images
-    markdown_content += "## Images\n\n"
-    for idx, image in enumerate(data["images"], start=1):
-        markdown_content += f"![Image {idx}]({image})\n\n"
-
-    # ✅ Add Tables
-    markdown_content += "## Tables\n\n"
-    for idx, table in enumerate(data["tables"], start=1):
-        markdown_content += f"### Table {idx}\n\n"
-        for row in table:
-            markdown_content += "| " + " | ".join(row) + " |\n"
-        markdown_content += "\n"
-
-    # ✅ Upload Final Markdown
-    markdown_s3_path = "scraped_data/scraped_os_data/final_scraped_content.md"
-    upload_file_to_s3(markdown_content.encode("utf-8"), markdown_s3_path, "text/markdown")
+def convert_to_markdown(data, manifest=None):
+    # ✅ Final Markdown is streamed to S3 as it is written
+    own_manifest = manifest is None
+    manifest = manifest or new_scrape_manifest()
+    markdown_stream = manifest.open("final_scraped_content.md", "text/markdown", primary=True)
+    with MarkdownWriter(markdown_stream) as md:
+        md.heading("Extracted Web Content")
+
+        # ✅ Add Images
+        md.heading("Images", 2)
+        for idx, image in enumerate(data["images"], start=1):
+            md.image(image, f"Image {idx}")
+
+        # ✅ Add Tables (first row as header, cells escaped)
+        md.heading("Tables", 2)
+        for idx, table in enumerate(data["tables"], start=1):
+            md.heading(f"Table {idx}", 3)
+            md.table(table)
+
+    markdown_s3_path = markdown_stream.key
+    if own_manifest:
+        write_manifest(manifest)
     
     return markdown_s3_path
@@ -1,50 +1,63 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException
+from fastapi import FastAPI, UploadFile, File, Form, Header, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from typing import Dict
+from typing import Dict, List, Optional
 from pydantic import BaseModel
 import os
 import sys
-import boto3
-import fitz
+import asyncio
+import contextlib
+import json
 import requests
-from apify_client import ApifyClient
+import fitz
 from botocore.exceptions import NoCredentialsError
 from dotenv import load_dotenv
 from fastapi import Query
-MAX_FILE_SIZE_MB = 5  # Max allowed file size in MB
-MAX_PAGE_COUNT = 5  # Max allowed pages
+from fastapi.responses import JSONResponse, StreamingResponse
+MAX_FILE_SIZE_MB = int(os.getenv("MAX_FILE_SIZE_MB", 5))  # Max allowed file size in MB
+MAX_PAGE_COUNT = int(os.getenv("MAX_PAGE_COUNT", 5))  # Max allowed pages
+BATCH_MAX_DOCUMENTS = int(os.getenv("BATCH_MAX_DOCUMENTS", 500))  # Max documents per /batch request
+BATCH_TENANT_CONCURRENCY = int(os.getenv("BATCH_TENANT_CONCURRENCY", 4))  # Documents of one tenant processed at once
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", 16))  # Documents of all tenants processed at once
+BATCH_MAX_REQUEST_MB = int(os.getenv("BATCH_MAX_REQUEST_MB", 200))  # Max /batch request body in MB
+JOB_QUEUE_RETRY_SECONDS = 0.5  # How often a batch document waiting for queue capacity tries again
+JOB_EVENTS_POLL_SECONDS = 0.25  # How often /jobs/{id}/events checks for new progress
+JOB_EVENTS_KEEPALIVE_SECONDS = 15  # Idle time after which /jobs/{id}/events sends a keep-alive comment
+UPLOAD_CHUNK_SIZE = 1024 * 1024  # Uploads are read, hashed and forwarded 1 MB at a time
+MULTIPART_FORM_OVERHEAD = 64 * 1024  # Room for multipart boundaries and headers
 
 import time
 
 # Add the root directory to the Python path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from Azure_Document_Intelligence import extract_and_upload_pdf
-from EnterpriseWebScrap import is_valid_url, save_and_upload_images, generate_and_upload_markdown
-from OSWebScrap import scrape_text_data_with_images, scrape_visual_data, convert_to_markdown
-from open_source_parsing import extract_all_from_pdf
-from docklingextraction import main
+from Azure_Document_Intelligence import extract_and_upload_pdf, S3_BASE_DIR as AZURE_S3_BASE_DIR
+from EnterpriseWebScrap import is_valid_url, scrape_with_apify, stream_apify_scrape
+from OSWebScrap import (ScrapeSession, scrape_text_data_with_images, scrape_visual_data, convert_to_markdown,
+                        scrape_page_streaming, new_scrape_manifest, write_manifest, OS_MANIFESTS_PREFIX,
+                        PageTooLargeError)
+from EnterpriseWebScrap import EN_MANIFESTS_PREFIX
+from artifact_store import load_latest_manifest
+from OSWebCrawl import run_crawl, CRAWL_MAX_PAGES, CRAWL_MAX_DEPTH
+from open_source_parsing import extract_all_from_pdf_parallel, failed_uploads, S3_OUTPUT_PREFIX as OS_S3_OUTPUT_PREFIX
+from docklingextraction import main, warm_up_converter
+from s3_uploader import get_uploader
+from clients import get_s3_client, warm_up as warm_up_clients
+from job_queue import JobQueue, QueueFullError, JOB_SUCCEEDED, JOB_FAILED
+from result_cache import ResultCache
+from document_cache import DocumentCache
+from markdown_index import MarkdownIndex
+from document_registry import DocumentRegistry, STAGE_DOWNLOADED, STAGE_PARSED, STAGE_MARKDOWN
 #  Now import the parsing functions
 #  Call the Docling conversion function
 # Load environment variables from .env file
-import tempfile
+import hashlib
 load_dotenv()
 
 # AWS S3 Configuration
 S3_BUCKET = os.getenv("AWS_BUCKET_NAME")
-AWS_ACCESS_KEY_ID = os.getenv("AWS_SERVER_PUBLIC_KEY")
-AWS_SECRET_ACCESS_KEY = os.getenv("AWS_SERVER_SECRET_KEY")
-AWS_REGION = "us-east-2"
 
 # Apify Configuration
 APIFY_TOKEN = os.getenv("APIFY_TOKEN")
 
-s3_client = boto3.client(
-    "s3",
-    region_name=AWS_REGION,
-    aws_access_key_id=AWS_ACCESS_KEY_ID,
-    aws_secret_access_key=AWS_SECRET_ACCESS_KEY
-)
-
 # Create FastAPI instance
 app = FastAPI(
     title="Lab Demo API",
@@ -54,6 +67,148 @@ app = FastAPI(
 class ScrapeRequest(BaseModel):
     url: str
 
+class OSScrapeRequest(ScrapeRequest):
+    streaming: bool = False  # parse the page as it downloads, without a DOM (for very large pages)
+
+class CrawlRequest(BaseModel):
+    url: str
+    max_pages: int = CRAWL_MAX_PAGES
+    max_depth: int = CRAWL_MAX_DEPTH
+
+# PDF engines runnable as background jobs
+PDF_ENGINES = ("open_source", "azure", "docling")
+
+# Background job queue (created on startup)
+job_queue = None
+
+# Per-tenant limits on documents in flight through /batch: tenant -> [semaphore, documents using it].
+# Entries are dropped once a tenant has nothing in flight; the global limit is created on first use.
+tenant_semaphores = {}
+batch_semaphore = None
+
+# Per-document state, keyed by document id
+document_registry = DocumentRegistry()
+
+# Parse results keyed by (PDF sha256, engine, options)
+result_cache = ResultCache()
+
+# Local copies of uploaded PDFs, one subfolder per document
+document_cache = DocumentCache()
+
+# Docling markdown outputs by job folder, newest job last
+markdown_index = MarkdownIndex()
+
+# Docling conversion timings, split by cold vs warm converter
+docling_metrics = {
+    "cold": {"count": 0, "total_seconds": 0.0, "last_seconds": None},
+    "warm": {"count": 0, "total_seconds": 0.0, "last_seconds": None},
+}
+
+@app.on_event("startup")
+def start_job_queue():
+    global job_queue
+    # Every worker process loads the Docling models once, up front
+    job_queue = JobQueue(process_initializer=warm_up_converter)
+    job_queue.warm_up()
+
+@app.on_event("startup")
+def warm_up_shared_clients():
+    # Open S3/Azure/Apify clients before the first request needs them
+    try:
+        warm_up_clients()
+    except Exception as e:
+        print(f"❌ Failed to warm up clients: {e}")
+
+@app.on_event("startup")
+def load_markdown_index():
+    try:
+        markdown_index.load()
+    except Exception as e:
+        print(f"❌ Failed to load markdown index, will retry on first use: {e}")
+
+@app.on_event("shutdown")
+def stop_job_queue():
+    if job_queue is not None:
+        job_queue.shutdown()
+
+
+class UploadSizeLimitMiddleware:
+    """
+    Rejects oversized uploads with 413 while they are still being received.
+
+    `limits` maps a path to (max body bytes, 413 message). Requests
+    announcing a larger Content-Length are refused before any body is read;
+    chunked requests are cut off as soon as the limit is crossed: the 413 is
+    sent from here and the app only sees the client disconnect.
+    """
+
+    def __init__(self, app, limits):
+        self.app = app
+        self.limits = limits
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] not in self.limits:
+            await self.app(scope, receive, send)
+            return
+
+        max_bytes, message = self.limits[scope["path"]]
+        too_large = JSONResponse(status_code=413, content={"detail": message})
+        content_length = dict(scope["headers"]).get(b"content-length")
+        if content_length:
+            try:
+                content_length = int(content_length)
+            except ValueError:
+                await JSONResponse(status_code=400, content={"detail": "Invalid Content-Length header"})(
+                    scope, receive, send)
+                return
+            if content_length > max_bytes:
+                await too_large(scope, receive, send)
+                return
+
+        received = 0
+        cut_off = False  # limit crossed: the app is told the client went away
+        responded = False  # the 413 went out, so whatever the app answers is dropped
+        response_started = False
+
+        async def limited_send(message):
+            nonlocal response_started
+            if responded:
+                return
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        async def limited_receive():
+            nonlocal received, cut_off, responded
+            if cut_off:
+                return {"type": "http.disconnect"}
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > max_bytes:
+                    cut_off = True
+                    if not response_started:
+                        await too_large(scope, receive, send)
+                        responded = True
+                    return {"type": "http.disconnect"}
+            return message
+
+        try:
+            await self.app(scope, limited_receive, limited_send)
+        except Exception:
+            # The app failing on the cut-off body is expected; the client already has its 413
+            if not responded:
+                raise
+
+app.add_middleware(
+    UploadSizeLimitMiddleware,
+    limits={
+        "/upload-pdf": (MAX_FILE_SIZE_MB * 1024 * 1024 + MULTIPART_FORM_OVERHEAD,
+                        f"❌ File too large (Limit: {MAX_FILE_SIZE_MB}MB). Process stopped."),
+        "/batch": (BATCH_MAX_REQUEST_MB * 1024 * 1024,
+                   f"❌ Batch too large (Limit: {BATCH_MAX_REQUEST_MB}MB per request). Process stopped."),
+    },
+)
 
 # Configure CORS
 app.add_middleware(
@@ -64,30 +219,57 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Global storage for file details
-latest_file_details = {}
 # def generate_presigned_url(bucket, key, expiration=3600):
 #     return s3_client.generate_presigned_url(
 #         "get_object",
 #         Params={"Bucket": bucket, "Key": key},
 #         ExpiresIn=expiration
 #     )
-def check_pdf_constraints(pdf_path):
+class FileTooLargeError(Exception):
+    pass
+
+def spool_upload(upload, spool, s3_stream, max_bytes):
+    """
+    Copy an upload in fixed-size chunks to the local spool and the S3 stream (if any).
+
+    Hashes as it goes and stops as soon as `max_bytes` is exceeded, so memory
+    use does not depend on the file size. Returns (sha256, size in bytes).
+    """
+    hasher = hashlib.sha256()
+    size = 0
+    while True:
+        chunk = upload.read(UPLOAD_CHUNK_SIZE)
+        if not chunk:
+            break
+        size += len(chunk)
+        if size > max_bytes:
+            raise FileTooLargeError(f"❌ File too large: more than {MAX_FILE_SIZE_MB}MB (Limit: {MAX_FILE_SIZE_MB}MB). Process stopped.")
+        hasher.update(chunk)
+        spool.write(chunk)
+        if s3_stream is not None:
+            s3_stream.write(chunk)
+    return hasher.hexdigest(), size
+
+def check_pdf_constraints(document_id):
     """
-    Check if the PDF meets the file size and page count constraints.
+    Check if a cached PDF meets the page count constraint.
+
+    MuPDF only parses the trailer, xref table and page-tree root to get the
+    page count; no page objects are loaded. The size limit is enforced while
+    the upload is streamed in.
     """
     try:
-        # Get file size
-        pdf_size_mb = os.path.getsize(pdf_path) / (1024 * 1024)  # Convert bytes to MB
+        pdf_path = document_cache.get(document_id)
+
+        # Cheap magic-number check on the mapped file before handing it to MuPDF
+        with document_cache.open_mmap(document_id) as pdf_map:
+            if pdf_map[:5] != b"%PDF-":
+                return {"error": "❌ Uploaded file is not a valid PDF. Process stopped."}
 
         # Get page count
         with fitz.open(pdf_path) as pdf_doc:
-            pdf_page_count = len(pdf_doc)
-
-        if pdf_size_mb > MAX_FILE_SIZE_MB:
-            error_message = f"❌ File too large: {pdf_size_mb:.2f}MB (Limit: {MAX_FILE_SIZE_MB}MB). Process stopped."
-            print(error_message)
-            return {"error": error_message}  # Return error instead of raising
+            pdf_page_count = pdf_doc.page_count
+        pdf_size_mb = os.path.getsize(pdf_path) / (1024 * 1024)  # Convert bytes to MB
 
         if pdf_page_count > MAX_PAGE_COUNT:
             error_message = f"❌ Too many pages: {pdf_page_count} pages (Limit: {MAX_PAGE_COUNT} pages). Process stopped."
@@ -98,7 +280,186 @@ def check_pdf_constraints(pdf_path):
         return {"success": True}
 
     except Exception as e:
-        return {"error": f"Failed to check PDF constraints: {str(e)}"}@app.get("/")
+        return {"error": f"Failed to check PDF constraints: {str(e)}"}
+
+def get_document(document_id):
+    """
+    Look up a registered document or fail with 404.
+    """
+    document = document_registry.get(document_id)
+    if document is None:
+        raise HTTPException(status_code=404, detail=f"Document {document_id} not found. Please upload the file first.")
+    return document
+
+def ensure_local_copy(document):
+    """
+    Local path of a document's PDF, streamed from S3 into the cache on a miss.
+    """
+    if not document.get("s3_key"):
+        raise HTTPException(status_code=404, detail="Upload of this document has not finished.")
+    return document_cache.fetch(document["document_id"], document["filename"], document["s3_key"])
+
+def discard_document(document_id):
+    """
+    Forget a rejected document: its cached copy and its registry record.
+    """
+    document_cache.remove(document_id)
+    document_registry.delete(document_id)
+
+def finish_pdf_job(job):
+    """
+    Job completion hook: release the cached PDF and record the outcome.
+    """
+    document_cache.unpin(job["metadata"]["document_id"])
+    record_pdf_job(job)
+
+def job_upload_failures(job):
+    """
+    Artifacts a finished PDF job failed to upload (the Azure pipeline fails the job instead).
+    """
+    engine = job["metadata"]["engine"]
+    if engine == "open_source":
+        return failed_uploads(job["result"])
+    if engine == "docling":
+        return job["result"].get("failed_uploads", 0)
+    return 0
+
+def record_pdf_job(job):
+    """
+    Job completion hook: move the document to its next stage in the registry.
+    """
+    metadata = job["metadata"]
+    document_id = metadata["document_id"]
+    if job["status"] == JOB_FAILED:
+        document_registry.update(document_id, error=job["error"])
+        return
+    stage = STAGE_MARKDOWN if metadata["engine"] == "docling" else STAGE_PARSED
+    # A partial result (some artifacts missing from S3) is never cached, so the next upload parses again
+    if not metadata.get("cache_hit") and metadata.get("sha256") and not job_upload_failures(job):
+        result_cache.put(metadata["sha256"], metadata["engine"], metadata["options"],
+                         {"result": job["result"], "s3_output": metadata["s3_output"]})
+    if metadata["engine"] == "docling" and job["result"].get("markdown_files"):
+        markdown_index.record(job["result"]["s3_folder"], job["result"]["markdown_files"])
+    if metadata["engine"] == "docling" and not metadata.get("cache_hit"):
+        result = job["result"]
+        seconds = result["conversion_seconds"]
+        cold = not result["converter_warm"]
+        if result.get("converter_build_seconds") is not None and not cold:
+            # First job on a converter built at worker warm-up: cold would have cost the build as well
+            seconds += result["converter_build_seconds"]
+            cold = True
+        bucket = docling_metrics["cold" if cold else "warm"]
+        bucket["count"] += 1
+        bucket["total_seconds"] += seconds
+        bucket["last_seconds"] = seconds
+    document_registry.record_stage(
+        document_id,
+        stage,
+        seconds=job["finished_at"] - job["started_at"],
+        job_id=job["job_id"],
+        s3_output=metadata["s3_output"],
+    )
+
+def engine_options(engine, service_type):
+    """
+    Options that change an engine's output, part of the result cache key.
+    """
+    if engine == "docling":
+        return {"service_type": service_type}
+    return {}
+
+def queue_pdf_job(engine, local_path, service_type, metadata):
+    """
+    Put one PDF job on the job queue and return its id; raises QueueFullError.
+    """
+    if engine == "open_source":
+        metadata["s3_output"] = f"{OS_S3_OUTPUT_PREFIX}/{metadata['document_id']}"
+        # A thread fans page ranges out over the worker processes and merges the results
+        return job_queue.submit(engine, extract_all_from_pdf_parallel, local_path, job_queue.process_pool,
+                                job_queue.process_workers, s3_prefix=metadata["s3_output"],
+                                cpu_bound=False, metadata=metadata, on_done=finish_pdf_job, progress=True)
+    if engine == "azure":
+        # Azure is network-bound, a thread is enough
+        metadata["s3_output"] = f"{AZURE_S3_BASE_DIR}/{metadata['document_id']}"
+        return job_queue.submit(engine, extract_and_upload_pdf, local_path, metadata["s3_output"],
+                                cpu_bound=False, metadata=metadata, on_done=finish_pdf_job, progress=True)
+    job_folder = f"{os.path.splitext(metadata['filename'])[0]}-{service_type}-{metadata['document_id']}"
+    metadata["s3_output"] = f"pdf_processing_pipeline/markdown_outputs/{job_folder}/"
+    return job_queue.submit(engine, main, local_path, service_type, job_folder,
+                            metadata=metadata, on_done=finish_pdf_job, progress=True)
+
+async def submit_pdf_job(document_id, engine, service_type="Open Source", wait_for_capacity=False):
+    """
+    Submit a downloaded PDF to the job queue and return the job id.
+
+    PDFs already parsed with the same engine and options are answered from
+    the result cache without running the parser again. A full queue is a
+    503, unless `wait_for_capacity` is set: the job is then retried until
+    the queue has room.
+    """
+    if engine not in PDF_ENGINES:
+        raise HTTPException(status_code=400, detail=f"Invalid engine! Choose one of: {', '.join(PDF_ENGINES)}.")
+
+    document = await asyncio.to_thread(get_document, document_id)
+    filename = document.get("filename")
+    sha256 = document.get("sha256")
+    options = engine_options(engine, service_type)
+
+    metadata = {"engine": engine, "document_id": document_id, "filename": filename, "local_path": document.get("local_path"),
+                "sha256": sha256, "options": options}
+    if engine == "docling":
+        metadata["service_type"] = service_type
+
+    # ✅ Re-uploaded PDF: return the existing artifacts
+    if sha256:
+        try:
+            cached = await asyncio.to_thread(result_cache.get, sha256, engine, options)
+        except Exception as e:
+            # An unreadable cache entry is a miss: the PDF is parsed again
+            print(f"❌ Result cache lookup failed for {sha256}/{engine}: {e}")
+            cached = None
+        if cached is not None:
+            metadata.update(cache_hit=True, s3_output=cached["s3_output"])
+            # The completion hook writes the registry, so it runs off the event loop
+            return await asyncio.to_thread(job_queue.complete, engine, cached["result"], metadata=metadata,
+                                           on_done=record_pdf_job)
+
+    # ✅ Parsers read the locally cached PDF; S3 is only hit on a cache miss
+    try:
+        local_path = await asyncio.to_thread(ensure_local_copy, document)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to download PDF: {str(e)}")
+    metadata["local_path"] = local_path
+    await asyncio.to_thread(document_registry.update, document_id, local_path=local_path)
+
+    # Keep the cached copy from being evicted until the job is done
+    await asyncio.to_thread(document_cache.pin, document_id)
+    try:
+        while True:
+            try:
+                return queue_pdf_job(engine, local_path, service_type, metadata)
+            except QueueFullError as e:
+                if not wait_for_capacity:
+                    raise HTTPException(status_code=503, detail=str(e))
+            await asyncio.sleep(JOB_QUEUE_RETRY_SECONDS)
+    except BaseException:
+        # Not queued (full, failed or cancelled while waiting): release the cached copy
+        await asyncio.to_thread(document_cache.unpin, document_id)
+        raise
+
+async def run_pdf_job(document_id, engine, service_type="Open Source"):
+    """
+    Run a PDF job on the worker pool and wait for it without blocking the event loop.
+    """
+    job_id = await submit_pdf_job(document_id, engine, service_type)
+    job = await job_queue.wait(job_id)
+    if job["status"] == JOB_FAILED:
+        raise RuntimeError(job["error"])
+    return job
+
+@app.get("/")
 async def root() -> Dict[str, str]:
     """
     Root endpoint with basic service information
@@ -109,8 +470,110 @@ async def root() -> Dict[str, str]:
         "documentation": "/docs"
     }
 
+@app.get("/health")
+async def health() -> Dict[str, str]:
+    """
+    Health check endpoint
+    """
+    return {"status": "ok"}
+
+@app.get("/metrics/docling")
+async def get_docling_metrics():
+    """
+    Cold versus warm Docling conversion times across finished jobs.
+    """
+    return {
+        state: {
+            "count": stats["count"],
+            "avg_seconds": round(stats["total_seconds"] / stats["count"], 3) if stats["count"] else None,
+            "last_seconds": stats["last_seconds"],
+        }
+        for state, stats in docling_metrics.items()
+    }
+
+@app.post("/jobs")
+async def submit_job(document_id: str = Query(...), engine: str = Query(...), service_type: str = Query("Open Source")):
+    """
+    Submit a downloaded PDF for processing and return a job id right away.
+    """
+    job_id = await submit_pdf_job(document_id, engine, service_type)
+    job = job_queue.get(job_id)
+    return {"job_id": job_id, "status": job["status"], "cached": job["metadata"].get("cache_hit", False)}
+
+@app.get("/jobs/{job_id}")
+async def get_job_status(job_id: str):
+    """
+    Return the status of a submitted job.
+    """
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    job.pop("result", None)
+    return job
+
+def sse_event(event, data):
+    """
+    Format one server-sent event.
+    """
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.get("/jobs/{job_id}/events")
+async def stream_job_events(job_id: str):
+    """
+    Stream a job's progress as server-sent events.
+
+    Sends one "progress" event per pipeline update (stage, message and
+    optional total/advance work units), then a final "done" event with
+    the job status. While a job reports nothing, a comment line is sent
+    every JOB_EVENTS_KEEPALIVE_SECONDS so clients and proxies keep reading.
+    """
+    if job_queue.get(job_id) is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+
+    async def events():
+        last_seq = 0
+        finished = False
+        last_sent = time.time()
+        while True:
+            job = job_queue.get(job_id)
+            finished = job is None or job["status"] in (JOB_SUCCEEDED, JOB_FAILED)
+            if finished:
+                # Let events reported just before the job returned reach the buffer
+                await asyncio.sleep(JOB_EVENTS_POLL_SECONDS)
+            for event in job_queue.events(job_id, last_seq):
+                last_seq = event["seq"]
+                last_sent = time.time()
+                yield sse_event("progress", event)
+            if not finished and time.time() - last_sent >= JOB_EVENTS_KEEPALIVE_SECONDS:
+                last_sent = time.time()
+                yield ": keep-alive\n\n"
+            if finished:
+                yield sse_event("done", {
+                    "job_id": job_id,
+                    "status": job["status"] if job else None,
+                    "error": job["error"] if job else "Job expired",
+                })
+                return
+            await asyncio.sleep(JOB_EVENTS_POLL_SECONDS)
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+@app.get("/jobs/{job_id}/result")
+async def get_job_result(job_id: str):
+    """
+    Return the result of a finished job.
+    """
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    if job["status"] == JOB_FAILED:
+        raise HTTPException(status_code=500, detail=f"Job failed: {job['error']}")
+    if job["status"] != JOB_SUCCEEDED:
+        raise HTTPException(status_code=409, detail=f"Job is still {job['status']}")
+    return {"job_id": job_id, "status": job["status"], "result": job["result"]}
+
 @app.post("/upload-pdf")
-async def upload_pdf(file: UploadFile = File(...)) -> Dict[str, str]:
+async def upload_pdf(file: UploadFile = File(...)):
     """
     Uploads a PDF file to AWS S3 after checking constraints.
     """
@@ -124,228 +587,380 @@ async def upload_pdf(file: UploadFile = File(...)) -> Dict[str, str]:
         raise HTTPException(status_code=500, detail="S3_BUCKET environment variable is missing")
     
     temp_pdf_path = None  # Define temp path for cleanup
+    document_id = None
+    s3_stream = None
+    accepted = False
 
     try:
-        # ✅ Save the uploaded file temporarily
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as temp_pdf:
-            temp_pdf.write(file.file.read())
+        # ✅ Register the document so the S3 key is known before the first byte arrives
+        document_id = (await asyncio.to_thread(document_registry.create, file.filename))["document_id"]
+        s3_key = f"RawInputs/{document_id}/{file.filename}"
+        s3_stream = get_uploader().stream(s3_key, "application/pdf")
+
+        # ✅ Stream the upload to a spool file and to S3 at the same time, hashing as it goes
+        with document_cache.spool_file() as temp_pdf:
             temp_pdf_path = temp_pdf.name
+            sha256, _ = await asyncio.to_thread(
+                spool_upload, file.file, temp_pdf, s3_stream, MAX_FILE_SIZE_MB * 1024 * 1024
+            )
+
+        # ✅ Keep the bytes in the local document cache so parsers never download them again
+        local_path = await asyncio.to_thread(document_cache.put_file, document_id, file.filename, temp_pdf_path)
+        temp_pdf_path = None
 
         # ✅ Check PDF constraints
-        constraint_check = check_pdf_constraints(temp_pdf_path)
+        constraint_check = await asyncio.to_thread(check_pdf_constraints, document_id)
 
         if "error" in constraint_check:
-            os.remove(temp_pdf_path)  # Cleanup temp file
             raise HTTPException(status_code=400, detail=constraint_check["error"])
 
-        # ✅ Upload file to S3 (only if constraints are met)
-        s3_key = f"RawInputs/{file.filename}"
-        s3_client.upload_file(temp_pdf_path, S3_BUCKET, s3_key)
+        # ✅ Finish the S3 upload (only if constraints are met)
+        await asyncio.to_thread(s3_stream.complete)
+        s3_stream = None
 
         # ✅ Generate pre-signed URL
-        file_url = s3_client.generate_presigned_url(
+        file_url = get_s3_client().generate_presigned_url(
             'get_object',
             Params={'Bucket': S3_BUCKET, 'Key': s3_key},
             ExpiresIn=3600  # 1 hour validity
         )
 
-        # ✅ Cleanup: Delete the temp file after successful upload
-        os.remove(temp_pdf_path)
+        # ✅ Save the file details under the document id
+        await asyncio.to_thread(document_registry.update, document_id, s3_key=s3_key, file_url=file_url,
+                                sha256=sha256, local_path=local_path)
+        accepted = True
 
-        # ✅ Save the file details globally
-        global latest_file_details
-        latest_file_details = {
+        return {
+            "document_id": document_id,
             "filename": file.filename,
+            "message": "✅ PDF uploaded successfully!",
             "file_url": file_url,
-            "s3_key": s3_key,
+            "sha256": sha256,
+            "cached_engines": result_cache.engines_for(sha256),
         }
 
-        return {"filename": file.filename, "message": "✅ PDF uploaded successfully!", "file_url": file_url}
-
+    except FileTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except HTTPException:
+        raise
     except NoCredentialsError:
-        if temp_pdf_path:
-            os.remove(temp_pdf_path)  # Cleanup on error
         raise HTTPException(status_code=500, detail="AWS credentials not found")
     except Exception as e:
-        if temp_pdf_path:
-            os.remove(temp_pdf_path)  # Cleanup on error
         raise HTTPException(status_code=500, detail=f"❌ Upload failed: {str(e)}")
+    finally:
+        # ✅ Cleanup: spool file always; S3 upload, cached copy and registry record if the upload was rejected
+        if temp_pdf_path and os.path.exists(temp_pdf_path):
+            os.remove(temp_pdf_path)
+        if s3_stream is not None:
+            await asyncio.to_thread(s3_stream.abort)
+        if document_id is not None and not accepted:
+            await asyncio.to_thread(discard_document, document_id)
 @app.get("/get-latest-file-url")
-async def get_latest_file_url() -> Dict[str, str]:
+async def get_latest_file_url(document_id: str = Query(...)):
     """
-    Retrieve the most recently uploaded file's URL, download it locally, and save the details.
-    """
-    if not latest_file_details:
-        raise HTTPException(status_code=404, detail="No files have been uploaded yet")
+    Retrieve an uploaded file's URL and make sure a local copy is available.
 
-    # Define local download path
-    project_root = os.getcwd()
-    downloaded_pdf_path = os.path.join(project_root, latest_file_details["filename"])
+    The copy kept at upload time is used when present; only a cache miss
+    streams the PDF down from S3.
+    """
+    document = await asyncio.to_thread(get_document, document_id)
 
-    # Download the file
     try:
-        response = requests.get(latest_file_details["file_url"])
-        response.raise_for_status()
-        with open(downloaded_pdf_path, "wb") as pdf_file:
-            pdf_file.write(response.content)
-        print(f"[INFO] PDF downloaded successfully: {downloaded_pdf_path}")
+        start_time = time.time()
+        local_path = await asyncio.to_thread(ensure_local_copy, document)
 
-        # Update the local path in the global file details
-        latest_file_details["local_path"] = downloaded_pdf_path
+        # Update the local path in the registry
+        await asyncio.to_thread(document_registry.update, document_id, local_path=local_path)
+        document = await asyncio.to_thread(document_registry.record_stage, document_id, STAGE_DOWNLOADED,
+                                           seconds=time.time() - start_time)
 
-    except requests.exceptions.RequestException as e:
+    except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to download PDF: {str(e)}")
 
-    return latest_file_details
+    if document is None:
+        raise HTTPException(status_code=404, detail=f"Document {document_id} was deleted during the download.")
+    return document
+
+@app.get("/documents/{document_id}")
+async def get_document_details(document_id: str):
+    """
+    Return the registry record of a document (stage, S3 keys, timings, jobs).
+    """
+    return await asyncio.to_thread(get_document, document_id)
 
 
 @app.get("/parse-pdf")
-async def parse_uploaded_pdf():
+async def parse_uploaded_pdf(document_id: str = Query(...)):
     """
-    Uses the saved latest file details to extract content and upload results to S3.
+    Uses the saved file details of a document to extract content and upload results to S3.
     """
     try:
-        # Check if the latest file details are available
-        if not latest_file_details:
-            raise HTTPException(status_code=404, detail="No file has been downloaded yet. Please fetch the latest file first.")
-
-        # Extract the details from the saved data
-        local_path = latest_file_details.get("local_path")
-        filename = latest_file_details.get("filename")
-
-        if not local_path or not filename:
-            raise HTTPException(status_code=404, detail="Incomplete file details. Please fetch the latest file again.")
-
-        # Define output directory for extraction
-        output_dir = os.path.join(os.getcwd(), "output_data")
-
-        # Extract data from the locally downloaded PDF
-        extract_all_from_pdf(local_path, output_dir)
+        # Extract data from the locally downloaded PDF on the worker pool
+        job = await run_pdf_job(document_id, "open_source")
 
         return {
-            "filename": filename,
+            "filename": job["metadata"]["filename"],
             "message": "PDF parsed successfully and extracted data uploaded to S3",
-            "local_path": local_path,
+            "local_path": job["metadata"]["local_path"],
+            "document_id": document_id,
+            "job_id": job["job_id"],
+            "cached": job["metadata"].get("cache_hit", False),
         }
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Parsing failed: {str(e)}")
 
 @app.get("/parse-pdf-azure")
-async def parse_uploaded_pdf_azure():
+async def parse_uploaded_pdf_azure(document_id: str = Query(...)):
     """
-    Uses the saved latest file details to extract content using Azure Document Intelligence.
+    Uses the saved file details of a document to extract content using Azure Document Intelligence.
     """
     try:
-        if not latest_file_details:
-            raise HTTPException(status_code=404, detail="No file has been downloaded yet. Please fetch the latest file first.")
-
-        local_path = latest_file_details.get("local_path")
-        filename = latest_file_details.get("filename")
-
-        if not local_path or not filename:
-            raise HTTPException(status_code=404, detail="Incomplete file details. Please fetch the latest file again.")
-
         # Extract data from the locally downloaded PDF using Azure Document Intelligence
-        extract_and_upload_pdf(local_path)
+        job = await run_pdf_job(document_id, "azure")
 
         return {
-            "filename": filename,
+            "filename": job["metadata"]["filename"],
             "message": "PDF parsed successfully using Azure Document Intelligence, data uploaded to S3",
-            "local_path": local_path,
+            "local_path": job["metadata"]["local_path"],
+            "document_id": document_id,
+            "job_id": job["job_id"],
+            "cached": job["metadata"].get("cache_hit", False),
         }
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Azure PDF Processing failed: {str(e)}")
     
 @app.get("/convert-pdf-markdown")
-async def convert_pdf_to_markdown_api(service_type: str = Query("Open Source")):
+async def convert_pdf_to_markdown_api(document_id: str = Query(...), service_type: str = Query("Open Source")):
     """
-    Uses the saved latest file details to convert the PDF into markdown using Docling.
+    Uses the saved file details of a document to convert the PDF into markdown using Docling.
     """
     try:
-        if not latest_file_details:
-            raise HTTPException(status_code=404, detail="No file has been downloaded yet. Please fetch the latest file first.")
-
-        local_path = latest_file_details.get("local_path")
-        filename = latest_file_details.get("filename")
-
-        if not local_path or not filename:
-            raise HTTPException(status_code=404, detail="Incomplete file details. Please fetch the latest file again.")
-
-        
-        main(local_path,service_type)
-
+        job = await run_pdf_job(document_id, "docling", service_type)
 
         return {
-            "filename": filename,
+            "filename": job["metadata"]["filename"],
             "message": "PDF successfully converted to Markdown using Docling and uploaded to S3",
-            "local_path": local_path,
+            "local_path": job["metadata"]["local_path"],
+            "document_id": document_id,
+            "job_id": job["job_id"],
+            "cached": job["metadata"].get("cache_hit", False),
         }
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Docling Markdown conversion failed: {str(e)}")
     
-@app.get("/fetch-latest-markdown-urls")
-async def fetch_latest_markdown_from_s3():
+@contextlib.asynccontextmanager
+async def batch_slot(tenant):
     """
-    Fetch Markdown file URLs from the latest job-specific subfolder in S3.
+    Hold one of the tenant's BATCH_TENANT_CONCURRENCY slots and one of the BATCH_MAX_CONCURRENCY global ones.
+
+    The tenant id is an unchecked header, so the global limit is what bounds
+    the work; a tenant's entry is dropped once none of its documents is in flight.
     """
+    global batch_semaphore
+    if batch_semaphore is None:
+        batch_semaphore = asyncio.Semaphore(BATCH_MAX_CONCURRENCY)
+    entry = tenant_semaphores.setdefault(tenant, [asyncio.Semaphore(BATCH_TENANT_CONCURRENCY), 0])
+    entry[1] += 1
     try:
-        # Base folder where markdowns are stored
-        s3_base_folder = "pdf_processing_pipeline/markdown_outputs/"
-
-        # Fetch all objects under markdown_outputs
-        response = s3_client.list_objects_v2(Bucket=S3_BUCKET, Prefix=s3_base_folder, Delimiter='/')
-
-        if "CommonPrefixes" not in response:
-            raise HTTPException(status_code=404, detail="No markdown folders found in S3.")
-
-        # Extract all job-specific subfolders
-        subfolders = [prefix["Prefix"] for prefix in response["CommonPrefixes"]]
-
-        if not subfolders:
-            raise HTTPException(status_code=404, detail="No markdown subfolders found in S3.")
-
-        # Fetch last modified markdown file inside each subfolder
-        latest_folder = None
-        latest_time = None
-
-        for folder in subfolders:
-            # List files inside each subfolder
-            folder_response = s3_client.list_objects_v2(Bucket=S3_BUCKET, Prefix=folder)
+        async with entry[0], batch_semaphore:
+            yield
+    finally:
+        entry[1] -= 1
+        if entry[1] == 0:
+            del tenant_semaphores[tenant]
+
+def file_sha256(path):
+    """
+    SHA-256 of a local file, read in fixed-size chunks.
+    """
+    hasher = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(UPLOAD_CHUNK_SIZE), b""):
+            hasher.update(chunk)
+    return hasher.hexdigest()
 
-            if "Contents" not in folder_response:
-                continue
+def stage_batch_upload(upload):
+    """
+    Register an uploaded batch file and copy it into the document cache.
 
-            # Get the latest modified file inside the folder
-            for obj in folder_response["Contents"]:
-                if obj["Key"].endswith(".md"):
-                    last_modified = obj["LastModified"]
+    Only local disk is touched here, so every file is safely stored before
+    the request body is released; S3 upload and parsing happen later.
+    """
+    document_id = document_registry.create(upload.filename)["document_id"]
+    try:
+        with document_cache.spool_file() as spool:
+            spool_path = spool.name
+            try:
+                sha256, _ = spool_upload(upload.file, spool, None, MAX_FILE_SIZE_MB * 1024 * 1024)
+            except Exception:
+                spool.close()
+                os.remove(spool_path)
+                raise
+        local_path = document_cache.put_file(document_id, upload.filename, spool_path)
+        document_registry.update(document_id, sha256=sha256, local_path=local_path)
+    except Exception:
+        document_registry.delete(document_id)
+        raise
+    return document_id
+
+def ingest_batch_document(document_id, s3_key=None):
+    """
+    Validate a staged document and make it available in S3.
 
-                    if latest_time is None or last_modified > latest_time:
-                        latest_folder = folder
-                        latest_time = last_modified
+    Uploaded files are sent to S3 from the cache; documents given by S3 key
+    are streamed into the cache instead. Raises ValueError on rejection.
+    """
+    document = document_registry.get(document_id)
+    if s3_key is None:
+        s3_key = f"RawInputs/{document_id}/{document['filename']}"
+        upload_needed = True
+    else:
+        local_path = document_cache.fetch(document_id, document["filename"], s3_key)
+        document_registry.update(document_id, local_path=local_path, sha256=file_sha256(local_path))
+        upload_needed = False
+
+    constraint_check = check_pdf_constraints(document_id)
+    if "error" in constraint_check:
+        raise ValueError(constraint_check["error"])
+
+    if upload_needed:
+        get_uploader().upload_file(document_cache.get(document_id), s3_key, "application/pdf")
+    file_url = get_s3_client().generate_presigned_url(
+        'get_object',
+        Params={'Bucket': S3_BUCKET, 'Key': s3_key},
+        ExpiresIn=3600  # 1 hour validity
+    )
+    document_registry.update(document_id, s3_key=s3_key, file_url=file_url)
+
+async def process_batch_document(index, filename, document_id, s3_key, engine, service_type, tenant):
+    """
+    Ingest and parse one batch document; return its completion event.
 
-        if latest_folder is None:
-            raise HTTPException(status_code=404, detail="No markdown files found in subfolders.")
+    A full job queue holds the document back until there is room, it is never failed for it.
+    """
+    event = {"event": "failed", "index": index, "filename": filename, "document_id": document_id}
+    async with batch_slot(tenant):
+        try:
+            await asyncio.to_thread(ingest_batch_document, document_id, s3_key)
+            job_id = await submit_pdf_job(document_id, engine, service_type, wait_for_capacity=True)
+            job = await job_queue.wait(job_id)
+            event.update(
+                event="completed" if job["status"] == JOB_SUCCEEDED else "failed",
+                job_id=job_id,
+                status=job["status"],
+                cached=job["metadata"].get("cache_hit", False),
+                s3_output=job["metadata"].get("s3_output"),
+                error=job["error"],
+            )
+            return event
+        except HTTPException as e:
+            event["error"] = str(e.detail)
+        except Exception as e:
+            event["error"] = str(e)
+
+    # ✅ Rejected before a job ran: forget the document
+    await asyncio.to_thread(discard_document, document_id)
+    return event
+
+@app.post("/batch")
+async def batch_process_pdfs(
+    engine: str = Form(...),
+    service_type: str = Form("Open Source"),
+    files: Optional[List[UploadFile]] = File(None),
+    s3_keys: Optional[List[str]] = Form(None),
+    x_tenant_id: str = Header("default"),
+):
+    """
+    Upload (or reference by S3 key) many PDFs and parse them all with one engine.
+
+    Documents are pipelined through the worker pool, at most
+    BATCH_TENANT_CONCURRENCY at a time per tenant (X-Tenant-ID header) and
+    BATCH_MAX_CONCURRENCY overall. The request body is capped at
+    BATCH_MAX_REQUEST_MB.
+    The response is a stream of JSON lines: one "accepted" line, then one
+    "completed" or "failed" line per document as soon as it finishes.
+    """
+    if engine not in PDF_ENGINES:
+        raise HTTPException(status_code=400, detail=f"Invalid engine! Choose one of: {', '.join(PDF_ENGINES)}.")
+    if not S3_BUCKET:
+        raise HTTPException(status_code=500, detail="S3_BUCKET environment variable is missing")
 
-        # Fetch all markdown files inside the latest folder
-        latest_folder_response = s3_client.list_objects_v2(Bucket=S3_BUCKET, Prefix=latest_folder)
-        markdown_urls = [
-            f"https://{S3_BUCKET}.s3.amazonaws.com/{obj['Key']}"
-            for obj in latest_folder_response["Contents"]
-            if obj["Key"].endswith(".md")
-        ]
+    files = files or []
+    s3_keys = s3_keys or []
+    if not files and not s3_keys:
+        raise HTTPException(status_code=400, detail="Provide at least one PDF file or S3 key")
+    if len(files) + len(s3_keys) > BATCH_MAX_DOCUMENTS:
+        raise HTTPException(status_code=400, detail=f"Too many documents (Limit: {BATCH_MAX_DOCUMENTS} per batch)")
+
+    tasks = []
+    rejected = []
+
+    # ✅ Copy uploaded files to local disk now; everything else runs in the background
+    for index, upload in enumerate(files):
+        if upload.content_type != "application/pdf" or not upload.filename:
+            rejected.append({"event": "failed", "index": index, "filename": upload.filename,
+                             "error": "Only PDF files are allowed"})
+            continue
+        try:
+            document_id = await asyncio.to_thread(stage_batch_upload, upload)
+        except Exception as e:
+            rejected.append({"event": "failed", "index": index, "filename": upload.filename, "error": str(e)})
+            continue
+        tasks.append(asyncio.create_task(process_batch_document(
+            index, upload.filename, document_id, None, engine, service_type, x_tenant_id)))
+
+    for offset, s3_key in enumerate(s3_keys):
+        index = len(files) + offset
+        filename = os.path.basename(s3_key)
+        document_id = (await asyncio.to_thread(document_registry.create, filename, s3_key=s3_key))["document_id"]
+        tasks.append(asyncio.create_task(process_batch_document(
+            index, filename, document_id, s3_key, engine, service_type, x_tenant_id)))
+
+    async def events():
+        yield json.dumps({"event": "accepted", "tenant": x_tenant_id, "engine": engine,
+                          "documents": len(files) + len(s3_keys)}) + "\n"
+        for event in rejected:
+            yield json.dumps(event) + "\n"
+        for task in asyncio.as_completed(tasks):
+            yield json.dumps(await task) + "\n"
+
+    return StreamingResponse(events(), media_type="application/x-ndjson")
+
+async def latest_markdown_job():
+    """
+    Newest markdown job folder and its markdown keys, or 404.
+    """
+    try:
+        await asyncio.to_thread(markdown_index.ensure_loaded)
+    except Exception as e:
+        raise HTTPException(status_code=503, detail=f"Markdown index unavailable: {str(e)}")
+    latest = markdown_index.latest()
+    if latest is None:
+        raise HTTPException(status_code=404, detail="No markdown files found in S3.")
+    return latest
 
-        return {
-            "message": f"Fetched Markdown files from the latest subfolder: {latest_folder}",
-            "latest_folder": latest_folder,
-            "markdown_files": markdown_urls
-        }
+@app.get("/fetch-latest-markdown-urls")
+async def fetch_latest_markdown_from_s3():
+    """
+    Fetch Markdown file URLs from the latest job-specific subfolder in S3.
+    """
+    latest_folder, markdown_files = await latest_markdown_job()
+    markdown_urls = [f"https://{S3_BUCKET}.s3.amazonaws.com/{key}" for key in markdown_files]
 
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to fetch markdown files: {str(e)}")
+    return {
+        "message": f"Fetched Markdown files from the latest subfolder: {latest_folder}",
+        "latest_folder": latest_folder,
+        "markdown_files": markdown_urls
+    }
     
 
 @app.get("/fetch-latest-markdown-downloads")
@@ -353,58 +968,14 @@ async def fetch_latest_markdown_downloads():
     """
     Fetch Markdown file download links from the latest job-specific folder in S3.
     """
-    try:
-        # Base S3 folder where markdowns are stored
-        s3_base_folder = "pdf_processing_pipeline/markdown_outputs/"
-
-        # Fetch all job subfolders
-        response = s3_client.list_objects_v2(Bucket=S3_BUCKET, Prefix=s3_base_folder, Delimiter='/')
-
-        if "CommonPrefixes" not in response:
-            raise HTTPException(status_code=404, detail="No markdown folders found in S3.")
-
-        # Extract all subfolders
-        subfolders = [prefix["Prefix"] for prefix in response["CommonPrefixes"]]
-
-        if not subfolders:
-            raise HTTPException(status_code=404, detail="No markdown subfolders found in S3.")
-
-        # Find the latest folder based on the most recently modified file
-        latest_folder = None
-        latest_time = None
-
-        for folder in subfolders:
-            folder_response = s3_client.list_objects_v2(Bucket=S3_BUCKET, Prefix=folder)
-
-            if "Contents" not in folder_response:
-                continue
-
-            # Check the latest file modification time inside each subfolder
-            for obj in folder_response["Contents"]:
-                if obj["Key"].endswith(".md"):
-                    last_modified = obj["LastModified"]
-
-                    if latest_time is None or last_modified > latest_time:
-                        latest_folder = folder
-                        latest_time = last_modified
-
-        if latest_folder is None:
-            raise HTTPException(status_code=404, detail="No markdown files found in subfolders.")
-
-        # ✅ List all Markdown files inside the latest folder
-        latest_folder_response = s3_client.list_objects_v2(Bucket=S3_BUCKET, Prefix=latest_folder)
-        markdown_files = [
-            obj["Key"] for obj in latest_folder_response["Contents"] if obj["Key"].endswith(".md")
-        ]
-
-        if not markdown_files:
-            raise HTTPException(status_code=404, detail="No markdown files available for download.")
+    latest_folder, markdown_files = await latest_markdown_job()
 
+    try:
         # ✅ Generate public or pre-signed download URLs for the markdown files
         markdown_download_links = []
         for file_key in markdown_files:
             # ✅ Option 1: Use pre-signed URL for private files (recommended for security)
-            download_url = s3_client.generate_presigned_url(
+            download_url = get_s3_client().generate_presigned_url(
                 "get_object",
                 Params={"Bucket": S3_BUCKET, "Key": file_key},
                 ExpiresIn=3600 
@@ -426,6 +997,17 @@ async def fetch_latest_markdown_downloads():
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to fetch markdown downloads: {str(e)}")
+
+@app.post("/markdown-index/rebuild")
+async def rebuild_markdown_index():
+    """
+    Re-create the markdown index from a paginated listing of the markdown outputs in S3.
+    """
+    try:
+        jobs = await asyncio.to_thread(markdown_index.rebuild)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to rebuild markdown index: {str(e)}")
+    return {"message": f"Markdown index rebuilt with {jobs} jobs", "jobs": jobs}
     
 @app.post("/enscrape")
 def scrape_webpage(request: ScrapeRequest):
@@ -433,108 +1015,128 @@ def scrape_webpage(request: ScrapeRequest):
     if not is_valid_url(request.url):
         raise HTTPException(status_code=400, detail="Invalid URL or unsupported file type.")
  
-    # Apify actor configuration
-    actor_id = "apify/puppeteer-scraper"
-    input_data = {
-        "startUrls": [{"url": request.url}],
-        "maxConcurrency": 10,
-        "maxPagesPerCrawl": 5,
-        "pageFunction": """async ({ page, request }) => {
-            try {
-                await page.waitForSelector('img');
-                const images = await page.$$eval('img', imgs => imgs.map(img => img.src || img.getAttribute('ng-src')));
-                const validImages = [...new Set(images)].filter(url => url && url.startsWith('http'));
-                const textContent = await page.evaluate(() => document.body.innerText);
-                return { url: request.url, title: await page.title(), images: validImages, text: textContent };
-            } catch (error) {
-                return { url: request.url, error: error.message };
-            }
-        }""",
-    }
- 
     try:
-        # Initialize Apify client
-        client = ApifyClient(APIFY_TOKEN)
- 
-        # Run the Apify actor
-        run = client.actor(actor_id).call(run_input=input_data)
- 
-        # Fetch the results
-        dataset_id = run["defaultDatasetId"]
-        items = client.dataset(dataset_id).list_items().items
- 
-        # Process the results
-        for item in items:
-            images = item.get("images", [])
-            text = item.get("text", "")
-            s3_image_urls = save_and_upload_images(images)
-            md_s3_url = generate_and_upload_markdown(text, s3_image_urls)
-            return {"markdown_s3_url": md_s3_url}
- 
+        return scrape_with_apify(request.url)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"An error occurred: {str(e)}")
+
+@app.post("/enscrape/jobs")
+async def submit_enscrape_job(request: ScrapeRequest):
+    """
+    Start an Apify scrape and return a job id right away.
+
+    Pages are turned into markdown while the crawl is still running; follow
+    them on /jobs/{job_id}/events and read the summary from /jobs/{job_id}/result.
+    """
+    if not is_valid_url(request.url):
+        raise HTTPException(status_code=400, detail="Invalid URL or unsupported file type.")
+    try:
+        # Apify runs can poll for many minutes, so they stay off the pool PDF jobs use
+        job_id = job_queue.submit("enscrape", stream_apify_scrape, request.url, long_running=True,
+                                  metadata={"url": request.url}, progress=True)
+    except QueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    return {"job_id": job_id, "status": job_queue.get(job_id)["status"]}
     
 
 
-@app.post("/OpenSourceWebscrape/")
-async def scrape_url(scrape_request: ScrapeRequest):
-    url = scrape_request.url
- 
-    if not is_valid_url(url):
-        raise HTTPException(status_code=400, detail="Invalid URL")
- 
-    # Scrape text data
-    markdown_s3_path = scrape_text_data_with_images(url)
- 
-    # Scrape visual data (images & tables)
-    visual_data = scrape_visual_data(url)
+def run_os_scrape(url, streaming=False):
+    """
+    Scrape one page into S3 (blocking: downloads, image fetches and uploads) and return the endpoint's response.
+    """
+    # Every artifact of this scrape goes under a content-addressed key, listed in one manifest
+    manifest = new_scrape_manifest(url)
+
+    if streaming:
+        # Text, images and tables from a single pass over the downloading page
+        try:
+            markdown_s3_path, visual_data = scrape_page_streaming(url, manifest)
+        except (requests.RequestException, PageTooLargeError) as e:
+            raise HTTPException(status_code=502, detail=f"Failed to fetch URL: {str(e)}")
+    else:
+        # Fetch and parse the page once for every extractor
+        try:
+            page = ScrapeSession(url)
+        except requests.RequestException as e:
+            raise HTTPException(status_code=502, detail=f"Failed to fetch URL: {str(e)}")
+
+        # Scrape text data
+        markdown_s3_path = scrape_text_data_with_images(page, manifest)
+
+        # Scrape visual data (images & tables)
+        visual_data = scrape_visual_data(page, manifest)
  
     # Convert to final Markdown with images and tables
-    final_markdown_s3_path = convert_to_markdown(visual_data)
+    final_markdown_s3_path = convert_to_markdown(visual_data, manifest)
  
     return {
         "message": "Scraping completed successfully",
         "markdown_s3_path": markdown_s3_path,
         "final_markdown_s3_path": final_markdown_s3_path,
+        "manifest_s3_key": write_manifest(manifest),
     }
 
+@app.post("/OpenSourceWebscrape/")
+async def scrape_url(scrape_request: OSScrapeRequest):
+    url = scrape_request.url
+ 
+    if not is_valid_url(url):
+        raise HTTPException(status_code=400, detail="Invalid URL")
+ 
+    # The scrape blocks on the network and S3, so it runs off the event loop
+    return await asyncio.to_thread(run_os_scrape, url, scrape_request.streaming)
+
+@app.post("/OpenSourceWebcrawl/")
+async def crawl_site(crawl_request: CrawlRequest):
+    """
+    Start a crawl from the given URL and return a job id right away.
+
+    Each page's markdown is written to S3 as it is crawled; follow them on
+    /jobs/{job_id}/events and read the summary from /jobs/{job_id}/result.
+    """
+    if not is_valid_url(crawl_request.url):
+        raise HTTPException(status_code=400, detail="Invalid URL")
+    if crawl_request.max_pages < 1 or crawl_request.max_pages > CRAWL_MAX_PAGES:
+        raise HTTPException(status_code=400, detail=f"max_pages must be between 1 and {CRAWL_MAX_PAGES}")
+    if crawl_request.max_depth < 0:
+        raise HTTPException(status_code=400, detail="max_depth must not be negative")
+
+    try:
+        # Crawl delays can stretch a crawl over minutes, so it runs with the other long-running jobs
+        job_id = job_queue.submit("crawl", run_crawl, crawl_request.url, crawl_request.max_pages,
+                                  crawl_request.max_depth, long_running=True,
+                                  metadata={"url": crawl_request.url}, progress=True)
+    except QueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    return {"job_id": job_id, "status": job_queue.get(job_id)["status"]}
+
 @app.get("/fetch-WebScrapMarkdowns")
 async def fetch_WebScrapMarkdowns_from_s3(service_type: str = Query(...)):
     """
     Fetch the latest Markdown file from the correct S3 folder based on service type.
     """
     try:
-        # ✅ Select the correct folder based on service_type
+        # ✅ Select the correct manifest folder based on service_type
         if service_type == "Open Source":
-            s3_folder = "scraped_data/scraped_os_data/"
+            manifests_prefix = OS_MANIFESTS_PREFIX
         elif service_type == "Enterprise":
-            s3_folder = "scraped_data/scraped_en_data/"
+            manifests_prefix = EN_MANIFESTS_PREFIX
         else:
             raise HTTPException(status_code=400, detail="Invalid service type! Choose 'Open Source' or 'Enterprise'.")
 
-        # ✅ Fetch all files in the selected folder
-        response = s3_client.list_objects_v2(Bucket=S3_BUCKET, Prefix=s3_folder)
-
-        if "Contents" not in response or len(response["Contents"]) == 0:
+        # ✅ Every scrape also writes its manifest to the service's latest-manifest key: one GET, no listing
+        manifest = await asyncio.to_thread(load_latest_manifest, manifests_prefix)
+        if manifest is None:
             raise HTTPException(status_code=404, detail=f"No markdown files found in S3 for {service_type}.")
 
-        # ✅ Get the latest markdown file
-        latest_file = None
-        latest_time = None
-
-        for obj in response["Contents"]:
-            if obj["Key"].endswith(".md"):  # ✅ Process Markdown files
-                last_modified = obj["LastModified"]
-
-                if latest_time is None or last_modified > latest_time:
-                    latest_file = obj["Key"]
-                    latest_time = last_modified
-
-        if latest_file is None:
+        # ✅ The manifest names the scrape's main markdown document
+        primary = manifest.get("primary")
+        if primary not in manifest.get("artifacts", {}):
             raise HTTPException(status_code=404, detail=f"No markdown files found in {service_type} folder.")
+        latest_file = manifest["artifacts"][primary]["key"]
 
         # ✅ Generate pre-signed URL for download
-        download_url = s3_client.generate_presigned_url(
+        download_url = get_s3_client().generate_presigned_url(
             "get_object",
             Params={"Bucket": S3_BUCKET, "Key": latest_file},
             ExpiresIn=3600  # 1-hour expiration
@@ -542,9 +1144,11 @@ async def fetch_WebScrapMarkdowns_from_s3(service_type: str = Query(...)):
 
         return {
             "message": f"Fetched latest markdown file for {service_type}.",
-            "file_name": latest_file.split("/")[-1],  # Extract just the filename
+            "file_name": primary.split("/")[-1],  # Extract just the filename
             "download_url": download_url
         }
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to fetch markdown downloads: {str(e)}")
@@ -0,0 +1,333 @@
+import os
+import json
+import time
+import uuid
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from botocore.exceptions import ClientError
+from s3_uploader import get_uploader, MB
+
+# ✅ Where content-addressed objects live and how many known keys to remember (override via environment)
+ARTIFACT_PREFIX = os.getenv("ARTIFACT_PREFIX", "artifacts")
+ARTIFACT_KNOWN_KEYS = int(os.getenv("ARTIFACT_KNOWN_KEYS", 100_000))
+
+# Name of the copy of the newest manifest kept next to a service's manifests
+LATEST_MANIFEST_NAME = "latest.json"
+
+
+def digest_key(digest, ext="", prefix=ARTIFACT_PREFIX):
+    return f"{prefix}/objects/{digest[:2]}/{digest}{ext}"
+
+
+def artifact_key(data, ext="", prefix=ARTIFACT_PREFIX):
+    """S3 key of a content-addressed object: `{prefix}/objects/ab/abcd...{ext}` from the sha256 of its bytes."""
+    digest = hashlib.sha256(data).hexdigest()
+    return digest_key(digest, ext, prefix), digest
+
+
+class ArtifactStore:
+    """
+    Content-addressed S3 objects: a key is derived from the sha256 of the bytes.
+
+    Identical artifacts from different pages or jobs share one object and
+    are uploaded once. Keys known to exist are remembered in a bounded LRU;
+    other keys are HEAD-checked before uploading, and concurrent submits of
+    the same bytes share a single upload.
+    """
+
+    def __init__(self, uploader=None, prefix=ARTIFACT_PREFIX, max_known=ARTIFACT_KNOWN_KEYS):
+        self._uploader = uploader
+        self.prefix = prefix
+        self.max_known = max_known
+        self._known = OrderedDict()  # key -> None, most recently used last
+        self._inflight = {}  # key -> Future of its upload
+        self._lock = threading.Lock()
+        self.uploaded = 0
+        self.deduplicated = 0
+
+    @property
+    def uploader(self):
+        return self._uploader or get_uploader()
+
+    def _remember(self, key):
+        with self._lock:
+            self._known[key] = None
+            self._known.move_to_end(key)
+            while len(self._known) > self.max_known:
+                self._known.popitem(last=False)
+
+    def exists(self, key):
+        """True if the object is known or found by a HEAD request."""
+        with self._lock:
+            if key in self._known:
+                self._known.move_to_end(key)
+                return True
+        uploader = self.uploader
+        try:
+            uploader.client.head_object(Bucket=uploader.bucket, Key=key)
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return False
+            raise
+        self._remember(key)
+        return True
+
+    def _put(self, data, key, content_type):
+        try:
+            if self.exists(key):
+                with self._lock:
+                    self.deduplicated += 1
+                return key
+            self.uploader.upload_bytes(data, key, content_type)
+            self._remember(key)
+            with self._lock:
+                self.uploaded += 1
+            return key
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def submit_bytes(self, data, ext="", content_type=None):
+        """
+        Store bytes (or str) under their content key without blocking.
+
+        Returns (key, sha256, future); the key is usable right away, the
+        future completes once the object is known to be in S3.
+        """
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        key, digest = artifact_key(data, ext, self.prefix)
+        with self._lock:
+            if key in self._known:
+                self._known.move_to_end(key)
+                self.deduplicated += 1
+                future = Future()
+                future.set_result(key)
+                return key, digest, future
+            future = self._inflight.get(key)
+            if future is None:
+                future = self._inflight[key] = self.uploader.executor.submit(self._put, data, key, content_type)
+            else:
+                self.deduplicated += 1
+        return key, digest, future
+
+    def open(self, ext="", content_type=None):
+        """Writable stream for an artifact too large to build in memory; see ArtifactStream."""
+        return ArtifactStream(self, ext, content_type)
+
+    def _promote(self, staging_key, key):
+        """Move a finished streamed upload from its staging key to its content key."""
+        uploader = self.uploader
+        try:
+            if not self.exists(key):
+                uploader.client.copy_object(Bucket=uploader.bucket, Key=key,
+                                            CopySource={"Bucket": uploader.bucket, "Key": staging_key})
+                self._remember(key)
+                with self._lock:
+                    self.uploaded += 1
+            else:
+                with self._lock:
+                    self.deduplicated += 1
+        finally:
+            uploader.client.delete_object(Bucket=uploader.bucket, Key=staging_key)
+        return key
+
+    def put_bytes(self, data, ext="", content_type=None):
+        """Store bytes (or str) under their content key and return the key."""
+        key, _, future = self.submit_bytes(data, ext, content_type)
+        future.result()
+        return key
+
+
+class ArtifactStream:
+    """
+    Content-addressed artifact written incrementally.
+
+    Data is hashed as it arrives. A small artifact stays in memory and is
+    stored like submit_bytes(); once it outgrows one multipart part it is
+    streamed to a staging key and, when closed, copied to its content key.
+    After close(), `key` and `future` are set as for submit_bytes().
+    """
+
+    def __init__(self, store, ext="", content_type=None, on_close=None):
+        self.store = store
+        self.ext = ext
+        self.content_type = content_type
+        self.on_close = on_close
+        self.part_size = max(store.uploader.transfer_config.multipart_chunksize, 5 * MB)
+        self.size = 0
+        self.key = None
+        self.future = None
+        self._hash = hashlib.sha256()
+        self._buffer = bytearray()
+        self._multipart = None
+        self._staging_key = None
+
+    def write(self, data):
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        self._hash.update(data)
+        self.size += len(data)
+        if self._multipart is not None:
+            self._multipart.write(data)
+            return
+        self._buffer += data
+        if len(self._buffer) >= self.part_size:
+            self._staging_key = f"{self.store.prefix}/staging/{uuid.uuid4().hex}{self.ext}"
+            self._multipart = self.store.uploader.stream(self._staging_key, self.content_type)
+            self._multipart.write(bytes(self._buffer))
+            self._buffer = bytearray()
+
+    def close(self):
+        """Finish the upload; return the content key."""
+        digest = self._hash.hexdigest()
+        if self._multipart is None:
+            self.key, _, self.future = self.store.submit_bytes(bytes(self._buffer), self.ext, self.content_type)
+            self._buffer = bytearray()
+        else:
+            self.key = digest_key(digest, self.ext, self.store.prefix)
+            self.future = Future()
+            try:
+                self._multipart.complete()
+                self.future.set_result(self.store._promote(self._staging_key, self.key))
+            except Exception as e:
+                self.future.set_exception(e)
+        if self.on_close:
+            self.on_close(self.key, digest, self.size, self.future)
+        return self.key
+
+    def abort(self):
+        """Discard the artifact; nothing is stored."""
+        self._buffer = bytearray()
+        if self._multipart is not None:
+            self._multipart.abort()
+            self._multipart = None
+
+
+class JobManifest:
+    """
+    One job's artifacts: readable names mapped to content-addressed keys.
+
+    Artifacts are added as they are produced and upload in the background;
+    write() waits for them and stores the manifest as JSON at `manifest_key`,
+    and also at `latest_key` if given, so the newest job is one GET away.
+    """
+
+    def __init__(self, manifest_key, store=None, metadata=None, latest_key=None):
+        self.manifest_key = manifest_key
+        self.latest_key = latest_key
+        self.store = store or get_artifact_store()
+        self.metadata = metadata or {}
+        self.primary = None
+        self.artifacts = {}  # name -> {"key", "sha256", "size", "content_type"}
+        self._pending = []  # (name, future)
+
+    def _record(self, name, key, digest, size, content_type, future, primary):
+        self.artifacts[name] = {"key": key, "sha256": digest, "size": size, "content_type": content_type}
+        self._pending.append((name, future))
+        if primary:
+            self.primary = name
+
+    def add_bytes(self, name, data, content_type=None, primary=False):
+        """Add an artifact under `name` (its extension is kept on the key); return its S3 key."""
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        key, digest, future = self.store.submit_bytes(data, os.path.splitext(name)[1], content_type)
+        self._record(name, key, digest, len(data), content_type, future, primary)
+        return key
+
+    def open(self, name, content_type=None, primary=False):
+        """Writable ArtifactStream for a large artifact; it joins the manifest when closed (its `key` is set then)."""
+        def on_close(key, digest, size, future):
+            self._record(name, key, digest, size, content_type, future, primary)
+        return ArtifactStream(self.store, os.path.splitext(name)[1], content_type, on_close=on_close)
+
+    def key(self, name):
+        return self.artifacts[name]["key"]
+
+    def wait(self):
+        """Wait for every artifact; return (name, key, error) tuples in add order."""
+        results = []
+        for name, future in self._pending:
+            try:
+                future.result()
+                results.append((name, self.artifacts[name]["key"], None))
+            except Exception as e:
+                results.append((name, self.artifacts[name]["key"], e))
+        self._pending = []
+        return results
+
+    def write(self):
+        """Wait for every artifact, then upload the manifest; return the (name, key, error) results."""
+        results = self.wait()
+        failed = {name for name, _, error in results if error}
+        manifest = {
+            **self.metadata,
+            "manifest_key": self.manifest_key,
+            "created_at": time.time(),
+            "primary": self.primary,
+            "artifacts": {name: entry for name, entry in self.artifacts.items() if name not in failed},
+        }
+        payload = json.dumps(manifest, indent=2)
+        self.store.uploader.upload_bytes(payload, self.manifest_key, "application/json")
+        if self.latest_key:
+            # Concurrent jobs race here; the last one to finish is the latest
+            self.store.uploader.upload_bytes(payload, self.latest_key, "application/json")
+        return results
+
+
+def load_manifest(manifest_key, uploader=None):
+    """Read a manifest written by JobManifest.write()."""
+    uploader = uploader or get_uploader()
+    response = uploader.client.get_object(Bucket=uploader.bucket, Key=manifest_key)
+    return json.loads(response["Body"].read())
+
+
+def latest_manifest_key(manifests_prefix):
+    return f"{manifests_prefix}/{LATEST_MANIFEST_NAME}"
+
+
+def load_latest_manifest(manifests_prefix, uploader=None):
+    """
+    Newest manifest written under `manifests_prefix`, or None if there is none.
+
+    Reads the latest-manifest copy; prefixes written before it existed are
+    listed once and the copy is created from the newest manifest found.
+    """
+    uploader = uploader or get_uploader()
+    latest_key = latest_manifest_key(manifests_prefix)
+    try:
+        return load_manifest(latest_key, uploader)
+    except uploader.client.exceptions.NoSuchKey:
+        pass
+
+    newest_key = None
+    newest_time = None
+    paginator = uploader.client.get_paginator("list_objects_v2")
+    for page in paginator.paginate(Bucket=uploader.bucket, Prefix=f"{manifests_prefix}/"):
+        for obj in page.get("Contents", []):
+            if obj["Key"].endswith(".json") and obj["Key"] != latest_key and \
+                    (newest_time is None or obj["LastModified"] > newest_time):
+                newest_key = obj["Key"]
+                newest_time = obj["LastModified"]
+    if newest_key is None:
+        return None
+    manifest = load_manifest(newest_key, uploader)
+    manifest.setdefault("manifest_key", newest_key)
+    uploader.upload_bytes(json.dumps(manifest, indent=2), latest_key, "application/json")
+    return manifest
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_artifact_store():
+    """Return the shared artifact store of this process."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = ArtifactStore()
+        return _store
@@ -0,0 +1,108 @@
+"""
+Offline benchmark of the Azure pipeline's figure fetching.
+
+A fake Document Intelligence client and a fake S3 client simulate network
+latency, so the effect of AZURE_FIGURE_CONCURRENCY can be measured without
+Azure or AWS credentials:
+
+    python benchmarks/azure_figures.py --figures 40 --latency 0.2
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+import tempfile
+from types import SimpleNamespace
+
+from botocore.exceptions import ClientError
+
+# Add the root directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from Azure_Document_Intelligence import extract_and_upload_pdf_async
+from s3_uploader import S3Uploader
+
+
+class FakePoller:
+    def __init__(self, result, latency):
+        self.details = {"operation_id": "fake-operation"}
+        self._result = result
+        self._latency = latency
+
+    async def result(self):
+        await asyncio.sleep(self._latency)
+        return self._result
+
+
+class FakeDocumentIntelligenceClient:
+    """Stand-in for the aio DocumentIntelligenceClient: fixed latency per call, dummy figures."""
+
+    def __init__(self, figures, latency, figure_size=64 * 1024):
+        self.latency = latency
+        self.figure_bytes = b"\x89PNG" + b"\0" * figure_size
+        self.result = SimpleNamespace(
+            model_id="prebuilt-layout",
+            figures=[SimpleNamespace(id=f"1.{index}") for index in range(figures)],
+            pages=[SimpleNamespace(page_number=1, width=8.5, height=11, unit="inch",
+                                   lines=[SimpleNamespace(content="Fake line")])],
+            styles=[],
+            tables=[],
+            paragraphs=[],
+        )
+
+    async def begin_analyze_document(self, model_id, body, output=None):
+        await asyncio.sleep(self.latency)
+        return FakePoller(self.result, self.latency)
+
+    async def get_analyze_result_figure(self, model_id, result_id, figure_id):
+        await asyncio.sleep(self.latency)
+
+        async def chunks():
+            yield self.figure_bytes
+
+        return chunks()
+
+    async def close(self):
+        pass
+
+
+class FakeS3Client:
+    """Accepts put_object calls after a fixed latency and keeps only the keys."""
+
+    def __init__(self, latency):
+        self.latency = latency
+        self.keys = set()
+
+    def put_object(self, **kwargs):
+        time.sleep(self.latency)
+        self.keys.add(kwargs["Key"])
+
+    def head_object(self, Bucket, Key):
+        time.sleep(self.latency)
+        if Key not in self.keys:
+            raise ClientError({"Error": {"Code": "404"}}, "HeadObject")
+
+
+def run(figures, latency, concurrency):
+    client = FakeDocumentIntelligenceClient(figures, latency)
+    uploader = S3Uploader(client=FakeS3Client(latency), bucket="benchmark")
+    with tempfile.NamedTemporaryFile(suffix=".pdf") as pdf:
+        start_time = time.time()
+        asyncio.run(extract_and_upload_pdf_async(pdf.name, "benchmark", client=client, uploader=uploader,
+                                                 max_concurrency=concurrency))
+        elapsed = time.time() - start_time
+    uploader.shutdown()
+    return elapsed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--figures", type=int, default=40)
+    parser.add_argument("--latency", type=float, default=0.2, help="seconds per simulated Azure/S3 call")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    args = parser.parse_args()
+
+    results = [(concurrency, run(args.figures, args.latency, concurrency)) for concurrency in args.concurrency]
+    print(f"\n{args.figures} figures, {args.latency:.2f}s latency per call")
+    for concurrency, elapsed in results:
+        print(f"concurrency {concurrency:>3}: {elapsed:6.2f}s ({results[0][1] / elapsed:.1f}x)")
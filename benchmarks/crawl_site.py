@@ -0,0 +1,99 @@
+"""
+Benchmark of the site crawler against a local fixture site.
+
+Serves a generated site of linked HTML pages (plus a robots.txt that
+disallows one section) with a fixed per-request delay, crawls it and
+reports pages per second. Markdown goes to a fake S3 client:
+
+    python benchmarks/crawl_site.py --pages 200 --delay 0.05
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Add the root directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from OSWebCrawl import Crawler
+from s3_uploader import S3Uploader
+
+
+class FakeS3Client:
+    """Accepts put_object calls after a fixed latency and keeps nothing."""
+
+    def __init__(self, latency):
+        self.latency = latency
+
+    def put_object(self, **kwargs):
+        time.sleep(self.latency)
+
+
+def start_fixture_site(pages, delay, fanout):
+    """Serve /page/<n>.html, each linking to `fanout` following pages and one disallowed page."""
+    robots = b"User-agent: *\nDisallow: /private/\n"
+
+    def page_body(n):
+        links = "".join(f'<li><a href="/page/{(n + step) % pages}.html#top">Page {(n + step) % pages}</a></li>'
+                        for step in range(1, fanout + 1))
+        return (f"<html><head><title>Page {n}</title></head><body>"
+                f"<h1>Page {n}</h1><p>{'Fixture text. ' * 50}</p>"
+                f'<ul>{links}<li><a href="/private/{n}.html">Private</a></li>'
+                f'<li><a href="https://example.com/">External</a></li></ul>'
+                f"</body></html>").encode("utf-8")
+
+    class SiteHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            if self.path == "/robots.txt":
+                self._send(200, "text/plain", robots)
+                return
+            time.sleep(delay)
+            if self.path.startswith("/page/"):
+                self._send(200, "text/html; charset=utf-8", page_body(int(self.path.split("/")[-1].split(".")[0])))
+            else:
+                self._send(404, "text/plain", b"Not found")
+
+        def _send(self, status, content_type, body):
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), SiteHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--pages", type=int, default=200)
+    parser.add_argument("--delay", type=float, default=0.05, help="seconds the server waits per page")
+    parser.add_argument("--fanout", type=int, default=5, help="links from each page to other pages")
+    parser.add_argument("--host-delay", type=float, default=0.0, help="crawler politeness delay per host")
+    parser.add_argument("--upload-latency", type=float, default=0.02)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 8, 16])
+    args = parser.parse_args()
+
+    server = start_fixture_site(args.pages, args.delay, args.fanout)
+    start_url = f"http://127.0.0.1:{server.server_port}/page/0.html"
+    uploader = S3Uploader(client=FakeS3Client(args.upload_latency), bucket="benchmark")
+
+    print(f"\n{args.pages}-page site, {args.delay:.2f}s server delay, {args.host_delay:.2f}s host delay")
+    for concurrency in args.concurrency:
+        crawler = Crawler(start_url, max_pages=args.pages, max_depth=args.pages, concurrency=concurrency,
+                          host_delay=args.host_delay, s3_prefix="benchmark", uploader=uploader)
+        stats = asyncio.run(crawler.run())
+        print(f"concurrency {concurrency:>3}: {stats['pages']} pages in {stats['seconds']:6.2f}s "
+              f"({stats['pages_per_second']:.1f} pages/s, {stats['failed']} failed, "
+              f"{stats['skipped_by_robots']} blocked by robots.txt)")
+
+    uploader.shutdown()
+    server.shutdown()
@@ -0,0 +1,127 @@
+"""
+Offline benchmark of the Apify enterprise scraper.
+
+A stub Apify client "crawls" one page every --page-seconds; the pages'
+images (partly shared between pages) are served by the local fixture
+server from image_fetch.py. Compares the previous one-image-at-a-time
+loop, scrape_with_apify (blocking actor call, then a shared deduplicated
+image stage) and stream_apify_scrape (pages processed while the crawl runs):
+
+    python benchmarks/enterprise_scrape.py --pages 20 --images-per-page 20 --shared 0.5
+"""
+import os
+import sys
+import time
+import argparse
+from types import SimpleNamespace
+
+import requests
+
+# Add the root directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from EnterpriseWebScrap import scrape_with_apify, stream_apify_scrape
+from image_fetcher import ImageFetcher
+from s3_uploader import S3Uploader
+from image_fetch import FakeS3Client, start_fixture_server
+
+
+class FakeApifyClient:
+    """Stand-in for ApifyClient: the actor writes one dataset item every `page_seconds`."""
+
+    def __init__(self, items, page_seconds):
+        self.items = items
+        self.page_seconds = page_seconds
+        self.started_at = None
+
+    def _written(self):
+        return min(len(self.items), int((time.time() - self.started_at) / self.page_seconds))
+
+    def _start(self, run_input):
+        self.started_at = time.time()
+        return {"id": "benchmark-run", "defaultDatasetId": "benchmark"}
+
+    def _call(self, run_input):
+        run = self._start(run_input)
+        time.sleep(len(self.items) * self.page_seconds)
+        return run
+
+    def _list_items(self, offset=0, limit=None):
+        written = self._written()
+        end = written if limit is None else min(written, offset + limit)
+        return SimpleNamespace(items=self.items[offset:end])
+
+    def actor(self, actor_id):
+        return SimpleNamespace(call=self._call, start=self._start)
+
+    def _status(self):
+        return {"status": "SUCCEEDED" if self._written() == len(self.items) else "RUNNING"}
+
+    def run(self, run_id):
+        # The status is read on every get(), like a real run client polling the API
+        return SimpleNamespace(get=self._status, abort=lambda: None)
+
+    def dataset(self, dataset_id):
+        return SimpleNamespace(list_items=self._list_items)
+
+
+def make_items(base_url, pages, images_per_page, shared):
+    """Pages whose first `shared` fraction of images (logos, icons, ...) is the same on every page."""
+    shared_count = int(images_per_page * shared)
+    items = []
+    for page in range(pages):
+        images = [f"{base_url}/img/shared_{n}.png" for n in range(shared_count)]
+        images += [f"{base_url}/img/page{page}_{n}.png" for n in range(images_per_page - shared_count)]
+        items.append({"url": f"{base_url}/page/{page}", "title": f"Page {page}", "text": "Fixture text.",
+                      "images": images})
+    return items
+
+
+def sequential(items, uploader):
+    """The previous implementation, applied to every page: one requests.get per image reference."""
+    for page, item in enumerate(items):
+        for idx, url in enumerate(item["images"]):
+            uploader.upload_bytes(requests.get(url).content, f"benchmark/page{page}_image_{idx + 1}.jpg", "image/jpeg")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--pages", type=int, default=20)
+    parser.add_argument("--images-per-page", type=int, default=20)
+    parser.add_argument("--shared", type=float, default=0.5, help="fraction of each page's images shared by all pages")
+    parser.add_argument("--delay", type=float, default=0.05, help="seconds the server waits per image")
+    parser.add_argument("--size-kb", type=int, default=50)
+    parser.add_argument("--upload-latency", type=float, default=0.02)
+    parser.add_argument("--page-seconds", type=float, default=0.2, help="simulated crawl time per page")
+    parser.add_argument("--poll-seconds", type=float, default=0.1)
+    args = parser.parse_args()
+
+    server = start_fixture_server(args.delay, args.size_kb * 1024)
+    items = make_items(f"http://127.0.0.1:{server.server_port}", args.pages, args.images_per_page, args.shared)
+    uploader = S3Uploader(client=FakeS3Client(args.upload_latency), bucket="benchmark")
+    references = sum(len(item["images"]) for item in items)
+    crawl_seconds = args.pages * args.page_seconds
+
+    start_time = time.time()
+    sequential(items, uploader)
+    baseline = crawl_seconds + time.time() - start_time
+
+    fetcher = ImageFetcher()
+    start_time = time.time()
+    result = scrape_with_apify("http://benchmark", client=FakeApifyClient(items, args.page_seconds),
+                               fetcher=fetcher, uploader=uploader)
+    blocking = time.time() - start_time
+
+    result = stream_apify_scrape("http://benchmark", client=FakeApifyClient(items, args.page_seconds),
+                                 fetcher=fetcher, uploader=uploader, poll_seconds=args.poll_seconds)
+    fetcher.shutdown()
+
+    print(f"\n{args.pages} pages ({crawl_seconds:.1f}s crawl), {references} image references, "
+          f"{args.delay:.2f}s server delay")
+    print(f"sequential          : first result {baseline:6.2f}s, total {baseline:6.2f}s")
+    print(f"scrape_with_apify   : first result {blocking:6.2f}s, total {blocking:6.2f}s ({baseline / blocking:.1f}x)")
+    print(f"stream_apify_scrape : first result {result['first_result_seconds']:6.2f}s, "
+          f"total {result['total_seconds']:6.2f}s ({baseline / result['total_seconds']:.1f}x, "
+          f"{result['images']} distinct images uploaded)")
+
+    uploader.shutdown()
+    server.shutdown()
@@ -0,0 +1,89 @@
+"""
+Benchmark of parsing very large pages in OSWebScrap.
+
+Generates a page of paragraphs, images and tables, then compares the DOM
+path (ScrapeSession: BeautifulSoup over the whole body, then the text and
+table extractors) with the streaming parser fed the body in download-sized
+chunks. Reports the time of each and, with --memory, their peak Python
+memory (tracemalloc slows both down considerably).
+
+Both paths use lxml when it is installed. Without it they fall back to the
+pure-Python html.parser, about five times slower: keep pages small then.
+
+    python benchmarks/html_parse.py --size-mb 1 5 10 --memory
+"""
+import os
+import sys
+import time
+import argparse
+import tracemalloc
+
+# Add the root directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from OSWebScrap import ScrapeSession, text_markdown, extract_tables, PAGE_CHUNK_SIZE, HTML_PARSER
+from html_stream import iter_page_events
+from s3_uploader import MB
+
+BASE_URL = "http://benchmark/page"
+
+
+def make_page(size_bytes):
+    """Repeated <section>s of a heading, paragraph, script, image and small table, until `size_bytes`."""
+    parts = ["<html><head><title>Benchmark</title><style>p { margin: 0 }</style></head><body>"]
+    size = 0
+    section = 0
+    while size < size_bytes:
+        part = (f"<section><h2>Section {section}</h2><p>Paragraph {section} with some   text &amp; an entity.</p>"
+                f"<script>var section = {section};</script><img src=\"/img/{section}.png\" alt=\"Figure {section}\">"
+                f"<table><tr><th>Name</th><th>Value</th></tr>"
+                + "".join(f"<tr><td>row {row}</td><td>{section * row}</td></tr>" for row in range(5))
+                + "</table></section>")
+        parts.append(part)
+        size += len(part)
+        section += 1
+    parts.append("</body></html>")
+    return "".join(parts)
+
+
+def dom(html):
+    page = ScrapeSession(BASE_URL, html=html)
+    text_markdown(page)
+    extract_tables(page.soup)
+
+
+def streamed(html):
+    # The text is consumed as it is produced, like scrape_page_streaming() writing to S3
+    for _ in iter_page_events((html[i:i + PAGE_CHUNK_SIZE] for i in range(0, len(html), PAGE_CHUNK_SIZE)), BASE_URL):
+        pass
+
+
+def timed(fn, html):
+    start_time = time.time()
+    fn(html)
+    return time.time() - start_time
+
+
+def peak_memory(fn, html):
+    tracemalloc.start()
+    fn(html)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--size-mb", type=int, nargs="+", default=[1, 5])
+    parser.add_argument("--memory", action="store_true", help="also measure peak memory (slow)")
+    args = parser.parse_args()
+
+    print(f"\nParser: {HTML_PARSER} (peak memory excludes the page string itself)")
+    for size_mb in args.size_mb:
+        html = make_page(size_mb * 1024 * 1024)
+        dom_seconds = timed(dom, html)
+        stream_seconds = timed(streamed, html)
+        print(f"{size_mb:>4} MB: DOM {dom_seconds:6.2f}s | streaming {stream_seconds:6.2f}s "
+              f"({dom_seconds / stream_seconds:.1f}x faster)")
+        if args.memory:
+            print(f"         peak memory: DOM {peak_memory(dom, html) / MB:7.1f} MB | "
+                  f"streaming {peak_memory(streamed, html) / MB:7.1f} MB")
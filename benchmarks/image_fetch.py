@@ -0,0 +1,109 @@
+"""
+Benchmark of scraped-image fetching against a local HTTP fixture server.
+
+Serves generated PNG images with a fixed per-request delay, then compares
+the old sequential requests.get loop with the concurrent ImageFetcher.
+Uploads go to a fake S3 client, so no network or credentials are needed:
+
+    python benchmarks/image_fetch.py --images 200 --delay 0.05
+"""
+import os
+import sys
+import time
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+from botocore.exceptions import ClientError
+
+# Add the root directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from image_fetcher import ImageFetcher
+from s3_uploader import S3Uploader
+
+
+class FakeS3Client:
+    """Accepts put_object calls after a fixed latency and keeps only the keys."""
+
+    def __init__(self, latency):
+        self.latency = latency
+        self.keys = set()
+
+    def put_object(self, **kwargs):
+        time.sleep(self.latency)
+        self.keys.add(kwargs["Key"])
+
+    def head_object(self, Bucket, Key):
+        time.sleep(self.latency)
+        if Key not in self.keys:
+            raise ClientError({"Error": {"Code": "404"}}, "HeadObject")
+
+
+def start_fixture_server(delay, image_size):
+    """Serve /img/<n>.png (a PNG-signed blob of `image_size` bytes) after `delay` seconds."""
+    body = b"\x89PNG\r\n\x1a\n" + b"\0" * image_size
+
+    class ImageHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive, like real image hosts
+
+        def do_GET(self):
+            time.sleep(delay)
+            self.send_response(200)
+            self.send_header("Content-Type", "image/png")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), ImageHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def sequential(urls, uploader):
+    """The previous implementation: one bare requests.get after another."""
+    batch = uploader.batch()
+    for idx, url in enumerate(urls):
+        batch.add_bytes(requests.get(url).content, f"benchmark/image_{idx + 1}.jpg", "image/jpeg")
+    return batch.wait()
+
+
+def concurrent(urls, uploader, per_host):
+    fetcher = ImageFetcher(per_host=per_host)
+    try:
+        return fetcher.fetch_to_s3(urls, "benchmark", uploader=uploader)
+    finally:
+        fetcher.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--images", type=int, default=200)
+    parser.add_argument("--delay", type=float, default=0.05, help="seconds the server waits per image")
+    parser.add_argument("--size-kb", type=int, default=50)
+    parser.add_argument("--upload-latency", type=float, default=0.02)
+    parser.add_argument("--per-host", type=int, nargs="+", default=[4, 8, 16])
+    args = parser.parse_args()
+
+    server = start_fixture_server(args.delay, args.size_kb * 1024)
+    urls = [f"http://127.0.0.1:{server.server_port}/img/{n}.png" for n in range(args.images)]
+    uploader = S3Uploader(client=FakeS3Client(args.upload_latency), bucket="benchmark")
+
+    start_time = time.time()
+    sequential(urls, uploader)
+    baseline = time.time() - start_time
+    print(f"\n{args.images} images, {args.delay:.2f}s server delay, {args.size_kb} KB each")
+    print(f"sequential          : {baseline:6.2f}s")
+
+    for per_host in args.per_host:
+        start_time = time.time()
+        results = concurrent(urls, uploader, per_host)
+        elapsed = time.time() - start_time
+        failed = sum(1 for _, _, error in results if error)
+        print(f"concurrent (host {per_host:>3}): {elapsed:6.2f}s ({baseline / elapsed:.1f}x, {failed} failed)")
+
+    uploader.shutdown()
+    server.shutdown()
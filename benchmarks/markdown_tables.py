@@ -0,0 +1,66 @@
+"""
+Benchmark of markdown building for pages with large tables.
+
+Compares the previous `markdown_content +=` loop with MarkdownWriter,
+in memory and streaming into a sink that discards the bytes:
+
+    python benchmarks/markdown_tables.py --rows 10000 100000 500000
+"""
+import os
+import sys
+import time
+import argparse
+
+# Add the root directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from markdown_writer import MarkdownWriter
+
+
+class NullSink:
+    """Accepts writes like an upload stream and keeps only the byte count."""
+
+    def __init__(self):
+        self.size = 0
+
+    def write(self, data):
+        self.size += len(data)
+
+
+def concatenated(table):
+    """The previous implementation."""
+    markdown_content = "# Extracted Web Content\n\n## Tables\n\n### Table 1\n\n"
+    for row in table:
+        markdown_content += "| " + " | ".join(row) + " |\n"
+    return markdown_content
+
+
+def written(table, sink=None):
+    md = MarkdownWriter(sink)
+    md.heading("Extracted Web Content")
+    md.heading("Tables", 2)
+    md.heading("Table 1", 3)
+    md.table(table)
+    md.close()
+    return md
+
+
+def timed(fn, *args):
+    start_time = time.time()
+    fn(*args)
+    return time.time() - start_time
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[10000, 100000, 500000])
+    parser.add_argument("--columns", type=int, default=6)
+    args = parser.parse_args()
+
+    print()
+    for rows in args.rows:
+        table = [[f"cell {row}.{column}" for column in range(args.columns)] for row in range(rows)]
+        baseline = timed(concatenated, table)
+        in_memory = timed(written, table)
+        streamed = timed(written, table, NullSink())
+        print(f"{rows:>8} rows: += {baseline:6.2f}s | writer {in_memory:6.2f}s | "
+              f"writer to stream {streamed:6.2f}s")
@@ -0,0 +1,83 @@
+import os
+import asyncio
+import threading
+from dotenv import load_dotenv
+from apify_client import ApifyClient
+from azure.core.credentials import AzureKeyCredential
+from azure.ai.documentintelligence.aio import DocumentIntelligenceClient
+from s3_uploader import get_uploader
+
+# Load environment variables once, not on every request
+load_dotenv()
+
+# Lazily created clients of this process, rebuilt after a fork
+_clients = {}
+_clients_pid = None
+_clients_lock = threading.Lock()
+
+# Event loop that owns the async Azure client (aio clients are tied to one loop)
+_loop = None
+_loop_pid = None
+_loop_lock = threading.Lock()
+
+
+def _get_or_create(name, factory):
+    global _clients, _clients_pid
+    with _clients_lock:
+        # Connection pools do not survive fork, so each worker process builds its own
+        if _clients_pid != os.getpid():
+            _clients = {}
+            _clients_pid = os.getpid()
+        client = _clients.get(name)
+        if client is None:
+            client = _clients[name] = factory()
+        return client
+
+
+def get_s3_client():
+    """Shared S3 client; its keep-alive pool is sized for every upload worker."""
+    return get_uploader().client
+
+
+def get_document_intelligence_client():
+    """Shared async Azure Document Intelligence client; use it from run_async() coroutines only."""
+    def create():
+        endpoint = os.getenv("AZURE_FORM_RECOGNIZER_ENDPOINT")
+        key = os.getenv("AZURE_FORM_RECOGNIZER_KEY")
+        return DocumentIntelligenceClient(endpoint=endpoint, credential=AzureKeyCredential(key))
+    return _get_or_create("document_intelligence", create)
+
+
+def get_apify_client():
+    """Shared Apify client."""
+    return _get_or_create("apify", lambda: ApifyClient(os.getenv("APIFY_TOKEN")))
+
+
+def _client_loop():
+    global _loop, _loop_pid
+    with _loop_lock:
+        if _loop is None or _loop_pid != os.getpid():
+            _loop = asyncio.new_event_loop()
+            _loop_pid = os.getpid()
+            threading.Thread(target=_loop.run_forever, name="client-loop", daemon=True).start()
+        return _loop
+
+
+def run_async(coro):
+    """
+    Run a coroutine on the shared client loop and block until it is done.
+
+    Lets worker threads use the async clients without each one starting
+    (and tearing down) its own event loop and connection pool.
+    """
+    return asyncio.run_coroutine_threadsafe(coro, _client_loop()).result()
+
+
+def warm_up():
+    """Create every client now and open a first S3 connection so the first request skips the setup."""
+    s3_client = get_s3_client()
+    get_document_intelligence_client()
+    get_apify_client()
+    bucket = os.getenv("AWS_BUCKET_NAME")
+    if bucket:
+        s3_client.head_bucket(Bucket=bucket)
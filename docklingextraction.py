@@ -1,63 +1,123 @@
 import logging
 import time
+import threading
 from pathlib import Path
 from docling_core.types.doc import ImageRefMode, PictureItem, TableItem
 from docling.datamodel.base_models import FigureElement, InputFormat, Table
 from docling.datamodel.pipeline_options import PdfPipelineOptions
 from docling.document_converter import DocumentConverter, PdfFormatOption
-import boto3
 import os
-from open_source_parsing import upload_file_to_s3
+from s3_uploader import get_uploader, new_artifact_buffer
 
 # AWS S3 Configuration
-s3 = boto3.client('s3',
-                  aws_access_key_id=os.getenv('AWS_SERVER_PUBLIC_KEY'),
-                  aws_secret_access_key=os.getenv('AWS_SERVER_SECRET_KEY'))
 bucket_name = os.getenv('AWS_BUCKET_NAME')
 
 # Constants
 IMAGE_RESOLUTION_SCALE = 2.0
 
-def main(pdf_path,service_type):
+# Process-wide converters keyed by pipeline-option fingerprint
+_converters = {}
+_converters_lock = threading.Lock()
+# Seconds spent building converters that no job result has reported yet
+_unreported_builds = {}
+
+def pipeline_fingerprint(images_scale=IMAGE_RESOLUTION_SCALE, generate_page_images=True, generate_picture_images=True):
+    """Key identifying a converter configuration."""
+    return (float(images_scale), bool(generate_page_images), bool(generate_picture_images))
+
+def get_converter(images_scale=IMAGE_RESOLUTION_SCALE, generate_page_images=True, generate_picture_images=True):
+    """
+    Return a cached DocumentConverter for these pipeline options.
+
+    The second value is True when the converter was already loaded (warm),
+    False when it had to be built and its layout/table models loaded (cold).
+    """
+    key = pipeline_fingerprint(images_scale, generate_page_images, generate_picture_images)
+    with _converters_lock:
+        doc_converter = _converters.get(key)
+        if doc_converter is not None:
+            return doc_converter, True
+
+        build_start = time.time()
+        # Configure pipeline options
+        pipeline_options = PdfPipelineOptions()
+        pipeline_options.images_scale = key[0]
+        pipeline_options.generate_page_images = key[1]
+        pipeline_options.generate_picture_images = key[2]
+
+        doc_converter = DocumentConverter(
+            format_options={
+                InputFormat.PDF: PdfFormatOption(pipeline_options=pipeline_options)
+            }
+        )
+        # Load the PDF pipeline models now instead of on the first convert()
+        doc_converter.initialize_pipeline(InputFormat.PDF)
+        _converters[key] = doc_converter
+        _unreported_builds[key] = time.time() - build_start
+        return doc_converter, False
+
+def pop_build_seconds(images_scale=IMAGE_RESOLUTION_SCALE, generate_page_images=True, generate_picture_images=True):
+    """Build time of this converter if no job has reported it yet, else None."""
+    key = pipeline_fingerprint(images_scale, generate_page_images, generate_picture_images)
+    with _converters_lock:
+        return _unreported_builds.pop(key, None)
+
+def warm_up_converter():
+    """
+    Load the default converter so the first job in this process runs warm.
+
+    Runs as the worker pool initializer, so it never raises: a failed load
+    would break the whole pool. The converter is then built by the first job.
+    """
+    try:
+        _, warm = get_converter()
+        if not warm:
+            logging.info(f"Docling converter warmed up in {_unreported_builds[pipeline_fingerprint()]:.2f} seconds")
+    except Exception as e:
+        logging.error(f"Docling converter warm-up failed, it will be built by the first job: {e}")
+
+def main(pdf_path,service_type,job_folder=None,progress=None):
     logging.basicConfig(level=logging.INFO)
 
     input_doc_path = Path(pdf_path)
-    output_dir = Path(f"output/{Path(pdf_path).stem}")
-
-
-    # Configure pipeline options
-    pipeline_options = PdfPipelineOptions()
-    pipeline_options.images_scale = IMAGE_RESOLUTION_SCALE
-    pipeline_options.generate_page_images = True
-    pipeline_options.generate_picture_images = True
-
-    doc_converter = DocumentConverter(
-        format_options={
-            InputFormat.PDF: PdfFormatOption(pipeline_options=pipeline_options)
-        }
-    )
 
     start_time = time.time()
+    doc_converter, converter_warm = get_converter()
+    # Set when this is the first job on a converter; a warm-up's build time is then reported as the cold cost
+    build_seconds = pop_build_seconds()
+    if progress:
+        progress("started", f"Converting with Docling ({'warm' if converter_warm else 'cold'} converter)")
+
     # Convert the document
     conv_res = doc_converter.convert(input_doc_path)
+    conversion_seconds = time.time() - start_time
+    logging.info(f"Docling conversion took {conversion_seconds:.2f} seconds ({'warm' if converter_warm else 'cold'} converter)")
 
-    output_dir.mkdir(parents=True, exist_ok=True)
     doc_filename = conv_res.input.file.stem
+    if progress:
+        progress("converted", f"Converted {len(conv_res.document.pages)} pages in {conversion_seconds:.1f}s",
+                 total=len(conv_res.document.pages))
 # Define job-specific folder based on PDF filename and service type
-    job_folder = f"{doc_filename}-{service_type}"
+    job_folder = job_folder or f"{doc_filename}-{service_type}"
     s3_folder = f"pdf_processing_pipeline/markdown_outputs/{job_folder}/"
 
-    # Create a local output directory for the job
-    output_dir = output_dir / job_folder
-    output_dir.mkdir(parents=True, exist_ok=True)
+    # ✅ Artifacts are rendered into memory buffers and streamed to S3,
+    # uploads run concurrently while the next artifacts are rendered
+    batch = get_uploader().batch()
 
     # ✅ Save page images inside the job-specific folder
     for page_no, page in conv_res.document.pages.items():
-        page_image_filename = output_dir / f"{doc_filename}-{page_no}.png"
-        with page_image_filename.open("wb") as fp:
-            page.image.pil_image.save(fp, format="PNG")
+        buffer = new_artifact_buffer()
+        page.image.pil_image.save(buffer, format="PNG")
         # ✅ Upload to S3 inside the job-specific folder
-        upload_file_to_s3(str(page_image_filename), f"{s3_folder}{page_image_filename.name}")
+        batch.add_buffer(buffer, f"{s3_folder}{doc_filename}-{page_no}.png", "image/png")
+        if progress:
+            progress("page_rendered", f"Page {page_no} image rendered", advance=1)
+
+    # ✅ Save markdown with embedded images inside the job-specific folder
+    md_embedded = conv_res.document.export_to_markdown(image_mode=ImageRefMode.EMBEDDED)
+    # ✅ Upload to S3 inside the job-specific folder
+    batch.add_bytes(md_embedded, f"{s3_folder}{doc_filename}-with-images.md", "text/markdown")
 
     # ✅ Save images of tables and figures inside the job-specific folder
     table_counter = 0
@@ -65,31 +125,50 @@ def main(pdf_path,service_type):
     for element, _level in conv_res.document.iterate_items():
         if isinstance(element, TableItem):
             table_counter += 1
-            element_image_filename = output_dir / f"{doc_filename}-table-{table_counter}.png"
-            with element_image_filename.open("wb") as fp:
-                element.get_image(conv_res.document).save(fp, "PNG")
+            buffer = new_artifact_buffer()
+            element.get_image(conv_res.document).save(buffer, "PNG")
             # ✅ Upload to S3 inside the job-specific folder
-            upload_file_to_s3(str(element_image_filename), f"{s3_folder}{element_image_filename.name}")
+            batch.add_buffer(buffer, f"{s3_folder}{doc_filename}-table-{table_counter}.png", "image/png")
 
         if isinstance(element, PictureItem):
             picture_counter += 1
-            element_image_filename = output_dir / f"{doc_filename}-picture-{picture_counter}.png"
-            with element_image_filename.open("wb") as fp:
-                element.get_image(conv_res.document).save(fp, "PNG")
+            picture_filename = f"{doc_filename}-picture-{picture_counter}.png"
+            buffer = new_artifact_buffer()
+            element.get_image(conv_res.document).save(buffer, "PNG")
             # ✅ Upload to S3 inside the job-specific folder
-            upload_file_to_s3(str(element_image_filename), f"{s3_folder}{element_image_filename.name}")
+            batch.add_buffer(buffer, f"{s3_folder}{picture_filename}", "image/png")
+            # Referenced markdown points at the uploaded sibling file
+            if element.image is not None:
+                element.image.uri = Path(picture_filename)
 
-    # ✅ Save markdown with embedded images inside the job-specific folder
-    md_filename_embedded = output_dir / f"{doc_filename}-with-images.md"
-    conv_res.document.save_as_markdown(md_filename_embedded, image_mode=ImageRefMode.EMBEDDED)
-    # ✅ Upload to S3 inside the job-specific folder
-    upload_file_to_s3(str(md_filename_embedded), f"{s3_folder}{md_filename_embedded.name}")
+    if progress:
+        progress("figures", f"{table_counter} tables and {picture_counter} pictures exported")
 
     # ✅ Save markdown with externally referenced images inside the job-specific folder
-    md_filename_referenced = output_dir / f"{doc_filename}-with-image-refs.md"
-    conv_res.document.save_as_markdown(md_filename_referenced, image_mode=ImageRefMode.REFERENCED)
+    md_referenced = conv_res.document.export_to_markdown(image_mode=ImageRefMode.REFERENCED)
     # ✅ Upload to S3 inside the job-specific folder
-    upload_file_to_s3(str(md_filename_referenced), f"{s3_folder}{md_filename_referenced.name}")
+    batch.add_bytes(md_referenced, f"{s3_folder}{doc_filename}-with-image-refs.md", "text/markdown")
+
+    # ✅ Wait for every upload of this job
+    markdown_files = []
+    failed_uploads = 0
+    for _, key, error in batch.wait():
+        if error:
+            failed_uploads += 1
+            logging.error(f"Error uploading {key}: {error}")
+        elif key.endswith(".md"):
+            markdown_files.append(key)
 
     end_time = time.time() - start_time
+    if progress:
+        progress("uploaded", f"{len(markdown_files)} markdown files uploaded to S3")
     logging.info(f"Document converted and saved in {end_time:.2f} seconds. Files stored in: {s3_folder}")
+    return {
+        "s3_folder": s3_folder,
+        "markdown_files": markdown_files,
+        "failed_uploads": failed_uploads,
+        "converter_warm": converter_warm,
+        "converter_build_seconds": round(build_seconds, 3) if build_seconds is not None else None,
+        "conversion_seconds": round(conversion_seconds, 3),
+        "total_seconds": round(end_time, 3),
+    }
@@ -0,0 +1,240 @@
+import os
+import time
+import mmap
+import socket
+import shutil
+import tempfile
+import threading
+from collections import OrderedDict
+from s3_uploader import get_uploader
+
+# ✅ File locks let workers sharing the cache directory see each other's pins (not available on Windows)
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# ✅ Cache location and size (override via environment)
+DOCUMENT_CACHE_DIR = os.getenv("DOCUMENT_CACHE_DIR", os.path.join(os.getcwd(), "downloads"))
+DOCUMENT_CACHE_MAX_MB = int(os.getenv("DOCUMENT_CACHE_MAX_MB", 1024))
+DOCUMENT_SPOOL_MAX_AGE = int(os.getenv("DOCUMENT_SPOOL_MAX_AGE", 3600))  # Seconds before a spool file is stale
+
+# Spool files are named spool-<host>-<pid>-..., so a restart only removes the ones it can tell are abandoned
+SPOOL_PREFIX = "spool-"
+PIN_FILE = ".pin"
+
+
+def spool_owner_alive(name):
+    """False if a spool file was left by a process of this host that no longer runs."""
+    try:
+        host, pid = name[len(SPOOL_PREFIX):].rsplit("-", 2)[:2]
+        pid = int(pid)
+    except ValueError:
+        return True
+    if host != socket.gethostname():
+        return True  # another machine or container: only its age tells
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class DocumentCache:
+    """
+    Size-bounded, LRU-evicted local copies of uploaded PDFs, one folder per document id.
+
+    Uploads are kept here so parsers read them straight from local disk;
+    S3 is only hit (with a streaming download) on a miss. Documents in use
+    by a running job are pinned and never evicted.
+
+    Several workers may share the directory: the disk is the source of
+    truth (file mtimes give the LRU order and are re-read before evicting),
+    and pins are also held as shared file locks that other workers respect.
+    """
+
+    def __init__(self, cache_dir=DOCUMENT_CACHE_DIR, max_bytes=DOCUMENT_CACHE_MAX_MB * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # document_id -> (path, size)
+        self._pins = {}
+        self._pin_files = {}  # document_id -> open file holding the shared lock
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+        self._load()
+
+    def _load(self):
+        # Pick up documents cached before a restart, and drop abandoned spool files
+        now = time.time()
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            if not name.startswith(SPOOL_PREFIX) or os.path.isdir(path):
+                continue
+            try:
+                if not spool_owner_alive(name) or now - os.path.getmtime(path) > DOCUMENT_SPOOL_MAX_AGE:
+                    os.remove(path)  # left behind by an interrupted upload
+            except FileNotFoundError:
+                pass
+        with self._lock:
+            self._sync()
+            self._evict()
+
+    def _sync(self):
+        # Rebuild the entries from disk, least recently used first; caller holds the lock
+        found = []
+        for document_id in os.listdir(self.cache_dir):
+            folder = os.path.join(self.cache_dir, document_id)
+            if not os.path.isdir(folder):
+                continue
+            try:
+                for name in os.listdir(folder):
+                    if name.startswith("."):
+                        continue
+                    path = os.path.join(folder, name)
+                    found.append((os.path.getmtime(path), document_id, path))
+            except FileNotFoundError:
+                continue  # evicted by another worker meanwhile
+        self._entries = OrderedDict()
+        self._total_bytes = 0
+        for _, document_id, path in sorted(found):
+            try:
+                self._add(document_id, path)
+            except FileNotFoundError:
+                pass
+
+    def _add(self, document_id, path):
+        size = os.path.getsize(path)
+        if document_id in self._entries:
+            self._total_bytes -= self._entries[document_id][1]
+        self._entries[document_id] = (path, size)
+        self._entries.move_to_end(document_id)
+        self._total_bytes += size
+
+    def _remove_folder(self, folder):
+        """Delete a document's folder unless another worker holds its pin lock; True if deleted."""
+        if fcntl is None:
+            shutil.rmtree(folder, ignore_errors=True)
+            return True
+        try:
+            with open(os.path.join(folder, PIN_FILE), "a") as pin_file:
+                # Held while deleting, so a worker pinning meanwhile waits and then sees a miss
+                fcntl.flock(pin_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                shutil.rmtree(folder, ignore_errors=True)
+        except BlockingIOError:
+            return False
+        except FileNotFoundError:
+            pass  # already gone
+        return True
+
+    def _evict(self):
+        for document_id in list(self._entries):
+            if self._total_bytes <= self.max_bytes:
+                break
+            if self._pins.get(document_id):
+                continue
+            path, size = self._entries[document_id]
+            if not self._remove_folder(os.path.dirname(path)):
+                continue  # in use by a job of another worker
+            del self._entries[document_id]
+            self._total_bytes -= size
+            print(f"[INFO] Evicted cached PDF: {path}")
+
+    def _document_path(self, document_id, filename):
+        folder = os.path.join(self.cache_dir, document_id)
+        os.makedirs(folder, exist_ok=True)
+        return os.path.join(folder, os.path.basename(filename))
+
+    def spool_file(self):
+        """Temp file on the cache's filesystem, so put_file() is a cheap rename."""
+        prefix = f"{SPOOL_PREFIX}{socket.gethostname()}-{os.getpid()}-"
+        return tempfile.NamedTemporaryFile(delete=False, prefix=prefix, suffix=".pdf", dir=self.cache_dir)
+
+    def put_file(self, document_id, filename, src_path):
+        """Move a local file into the cache and return its cached path."""
+        path = self._document_path(document_id, filename)
+        shutil.move(src_path, path)
+        with self._lock:
+            # Other workers may have added or evicted documents since the last look
+            self._sync()
+            self._evict()
+        return path
+
+    def get(self, document_id):
+        """Return the cached path (marking it recently used), or None on a miss."""
+        with self._lock:
+            entry = self._entries.get(document_id)
+            if entry is None:
+                # Possibly cached by another worker
+                folder = os.path.join(self.cache_dir, document_id)
+                names = [name for name in os.listdir(folder) if not name.startswith(".")] \
+                    if os.path.isdir(folder) else []
+                if not names:
+                    return None
+                self._add(document_id, os.path.join(folder, names[0]))
+                entry = self._entries[document_id]
+            try:
+                os.utime(entry[0])  # the mtime is the LRU order every worker sees
+            except FileNotFoundError:
+                # Evicted by another worker
+                self._total_bytes -= entry[1]
+                del self._entries[document_id]
+                return None
+            self._entries.move_to_end(document_id)
+            return entry[0]
+
+    def fetch(self, document_id, filename, s3_key):
+        """Return the cached path, streaming the PDF down from S3 on a miss."""
+        path = self.get(document_id)
+        if path is not None:
+            return path
+
+        uploader = get_uploader()
+        with self.spool_file() as spool:
+            try:
+                uploader.client.download_fileobj(uploader.bucket, s3_key, spool, Config=uploader.transfer_config)
+            except Exception:
+                os.remove(spool.name)
+                raise
+        print(f"[INFO] PDF downloaded from S3 into cache: {s3_key}")
+        return self.put_file(document_id, filename, spool.name)
+
+    def open_mmap(self, document_id):
+        """Read-only memory map of a cached PDF, or None on a miss."""
+        path = self.get(document_id)
+        if path is None:
+            return None
+        with open(path, "rb") as f:
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def remove(self, document_id):
+        """Drop a document from the cache (e.g. an upload that failed validation)."""
+        with self._lock:
+            entry = self._entries.pop(document_id, None)
+            if entry is not None:
+                self._total_bytes -= entry[1]
+                shutil.rmtree(os.path.dirname(entry[0]), ignore_errors=True)
+
+    def pin(self, document_id):
+        """Keep a document from being evicted while a job reads it, by this worker or any other."""
+        with self._lock:
+            self._pins[document_id] = self._pins.get(document_id, 0) + 1
+            folder = os.path.join(self.cache_dir, document_id)
+            if fcntl is not None and document_id not in self._pin_files and os.path.isdir(folder):
+                pin_file = open(os.path.join(folder, PIN_FILE), "a")
+                fcntl.flock(pin_file, fcntl.LOCK_SH)
+                self._pin_files[document_id] = pin_file
+
+    def unpin(self, document_id):
+        with self._lock:
+            remaining = self._pins.get(document_id, 0) - 1
+            if remaining > 0:
+                self._pins[document_id] = remaining
+            else:
+                self._pins.pop(document_id, None)
+                pin_file = self._pin_files.pop(document_id, None)
+                if pin_file is not None:
+                    pin_file.close()  # releases the lock
+            self._evict()
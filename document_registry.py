@@ -0,0 +1,179 @@
+import os
+import json
+import time
+import uuid
+import sqlite3
+import threading
+from collections import OrderedDict
+
+# ✅ SQLite file backing the registry and how many records stay in memory (override via environment)
+REGISTRY_DB_PATH = os.getenv("DOCUMENT_REGISTRY_DB", "document_registry.db")
+REGISTRY_MAX_CACHED = int(os.getenv("DOCUMENT_REGISTRY_MAX_CACHED", 1000))
+
+# ✅ Document lifecycle stages, in order
+STAGE_UPLOADED = "uploaded"
+STAGE_DOWNLOADED = "downloaded"
+STAGE_PARSED = "parsed"
+STAGE_MARKDOWN = "markdown"
+
+# Columns stored as JSON text in SQLite
+JSON_FIELDS = ("timings", "jobs", "s3_outputs")
+
+
+class DocumentRegistry:
+    """
+    Tracks every uploaded document by id: upload -> download -> parse -> markdown.
+
+    Records are written through to SQLite, which holds all of them and
+    survives restarts; the most recently used ones are also kept in a
+    bounded in-memory LRU for fast lookups.
+    """
+
+    def __init__(self, db_path=REGISTRY_DB_PATH, max_cached=REGISTRY_MAX_CACHED):
+        self._lock = threading.Lock()
+        self.max_cached = max_cached
+        self._documents = OrderedDict()  # document_id -> record, most recently used last
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS documents (
+                document_id TEXT PRIMARY KEY,
+                filename TEXT NOT NULL,
+                sha256 TEXT,
+                stage TEXT NOT NULL,
+                s3_key TEXT,
+                file_url TEXT,
+                local_path TEXT,
+                timings TEXT,
+                jobs TEXT,
+                s3_outputs TEXT,
+                error TEXT,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            )
+            """
+        )
+        # Databases created before the sha256 column existed
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(documents)")]
+        if "sha256" not in columns:
+            self._conn.execute("ALTER TABLE documents ADD COLUMN sha256 TEXT")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_documents_created ON documents (created_at)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_documents_sha256 ON documents (sha256)")
+        self._conn.commit()
+        self._load()
+
+    def _load(self):
+        # Warm the LRU with the newest documents
+        cursor = self._conn.execute("SELECT * FROM documents ORDER BY created_at DESC LIMIT ?", (self.max_cached,))
+        for record in reversed(self._decode(cursor)):
+            self._remember(record)
+
+    @staticmethod
+    def _decode(cursor):
+        columns = [col[0] for col in cursor.description]
+        records = []
+        for row in cursor.fetchall():
+            record = dict(zip(columns, row))
+            for field in JSON_FIELDS:
+                record[field] = json.loads(record[field]) if record[field] else {}
+            records.append(record)
+        return records
+
+    def _remember(self, record):
+        # Caller holds the lock (or is the constructor)
+        self._documents[record["document_id"]] = record
+        self._documents.move_to_end(record["document_id"])
+        while len(self._documents) > self.max_cached:
+            self._documents.popitem(last=False)
+
+    def _record(self, document_id):
+        # The live record, from memory or SQLite, or None; caller holds the lock
+        record = self._documents.get(document_id)
+        if record is not None:
+            self._documents.move_to_end(document_id)
+            return record
+        records = self._decode(self._conn.execute("SELECT * FROM documents WHERE document_id = ?", (document_id,)))
+        if not records:
+            return None
+        self._remember(records[0])
+        return records[0]
+
+    def _persist(self, record):
+        row = dict(record)
+        for field in JSON_FIELDS:
+            row[field] = json.dumps(row[field])
+        columns = ", ".join(row)
+        placeholders = ", ".join(f":{col}" for col in row)
+        self._conn.execute(f"INSERT OR REPLACE INTO documents ({columns}) VALUES ({placeholders})", row)
+        self._conn.commit()
+
+    def create(self, filename, s3_key=None, file_url=None, sha256=None):
+        """Register a newly uploaded document and return its record."""
+        now = time.time()
+        record = {
+            "document_id": uuid.uuid4().hex,
+            "filename": filename,
+            "sha256": sha256,
+            "stage": STAGE_UPLOADED,
+            "s3_key": s3_key,
+            "file_url": file_url,
+            "local_path": None,
+            "timings": {},
+            "jobs": {},
+            "s3_outputs": {},
+            "error": None,
+            "created_at": now,
+            "updated_at": now,
+        }
+        with self._lock:
+            self._remember(record)
+            self._persist(record)
+        return dict(record)
+
+    def get(self, document_id):
+        """Return a copy of the document record, or None if it is unknown."""
+        with self._lock:
+            record = self._record(document_id)
+            return json.loads(json.dumps(record)) if record else None
+
+    def update(self, document_id, **fields):
+        """Update top-level fields of a document record; None if it is unknown (e.g. deleted)."""
+        with self._lock:
+            record = self._record(document_id)
+            if record is None:
+                return None
+            record.update(fields)
+            record["updated_at"] = time.time()
+            self._persist(record)
+            return dict(record)
+
+    def record_stage(self, document_id, stage, seconds=None, job_id=None, s3_output=None):
+        """Move a document to `stage`, keeping its timing, job id and S3 output location; None if it is unknown."""
+        with self._lock:
+            record = self._record(document_id)
+            if record is None:
+                return None
+            record["stage"] = stage
+            record["error"] = None
+            if seconds is not None:
+                record["timings"][stage] = round(seconds, 3)
+            if job_id is not None:
+                record["jobs"][stage] = job_id
+            if s3_output is not None:
+                record["s3_outputs"][stage] = s3_output
+            record["updated_at"] = time.time()
+            self._persist(record)
+            return dict(record)
+
+    def delete(self, document_id):
+        """Forget a document (e.g. an upload that was rejected midway)."""
+        with self._lock:
+            self._documents.pop(document_id, None)
+            self._conn.execute("DELETE FROM documents WHERE document_id = ?", (document_id,))
+            self._conn.commit()
+
+    def list(self, limit=50):
+        """Return the most recently created documents first."""
+        with self._lock:
+            cursor = self._conn.execute("SELECT * FROM documents ORDER BY created_at DESC LIMIT ?", (limit,))
+            return self._decode(cursor)
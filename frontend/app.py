@@ -1,6 +1,7 @@
 import streamlit as st
 import requests
 import time
+import json
 
 # Streamlit UI
 st.set_page_config(page_title="📄 PDF Processing & Markdown Viewer", layout="wide")
@@ -27,6 +28,7 @@ LATEST_FILE_API = f"{FASTAPI_URL}/get-latest-file-url"
 PARSE_PDF_API = f"{FASTAPI_URL}/parse-pdf"
 PARSE_PDF_AZURE_API = f"{FASTAPI_URL}/parse-pdf-azure"
 CONVERT_MARKDOWN_API = f"{FASTAPI_URL}/convert-pdf-markdown"
+JOBS_API = f"{FASTAPI_URL}/jobs"
 FETCH_MARKDOWN_API = f"{FASTAPI_URL}/fetch-latest-markdown-urls"
 FETCH_DOWNLOADABLE_MARKDOWN_API = f"{FASTAPI_URL}/fetch-latest-markdown-downloads"
 SCRAPE_OS_API = f"{FASTAPI_URL}/OpenSourceWebscrape/"
@@ -68,99 +70,105 @@ def upload_pdf(file):
             response = requests.post(UPLOAD_PDF_API, files=files)
         if response.status_code == 200:
             st.session_state.file_uploaded = True
+            st.session_state.document_id = response.json().get("document_id")  # ✅ Track this upload by id
             return response.json()
         else:
             return {"error": f"Upload failed: {response.status_code}"}
     except requests.RequestException as e:
         return {"error": str(e)}# Function to Trigger Open Source PDF Parsing (with Detailed Logging)
 
+# Function to Follow a Job's Live Progress (server-sent events)
+def follow_job(job_id, progress_bar, status_text):
+    total, done = None, 0
+    event_name = None
+    with requests.get(f"{JOBS_API}/{job_id}/events", stream=True, timeout=600) as response:
+        response.raise_for_status()
+        for line in response.iter_lines(decode_unicode=True):
+            if line.startswith("event: "):
+                event_name = line[len("event: "):]
+            elif line.startswith("data: "):
+                data = json.loads(line[len("data: "):])
+                if event_name == "done":
+                    return data
+                # ✅ Real progress: work units reported by the pipeline
+                if data.get("total"):
+                    total = data["total"]
+                done += data.get("advance") or 0
+                if total:
+                    progress_bar.progress(min(100, int(done * 100 / total)))
+                status_text.text(f"{data['stage']}: {data['message']}")
+    return {"status": "failed", "error": "Progress stream ended unexpectedly"}
+
+# Function to Run a PDF Job and Show its Progress
+def run_pdf_job(engine, service_type="Open Source"):
+    document_id = st.session_state.get("document_id")
+    if not document_id:
+        return {"error": "⚠️ Please upload a file first!"}
+
+    # Step 1: Get Latest File URL
+    response_latest = requests.get(LATEST_FILE_API, params={"document_id": document_id})
+    if response_latest.status_code != 200:
+        return {"error": f"❌ Failed to fetch latest file URL: {response_latest.text}"}
+
+    # Step 2: Submit the job
+    response_submit = requests.post(JOBS_API, params={"document_id": document_id, "engine": engine, "service_type": service_type})
+    if response_submit.status_code != 200:
+        return {"error": f"❌ Failed to start processing: {response_submit.text}"}
+    job_id = response_submit.json()["job_id"]
+
+    # Step 3: Render live progress until the job is done
+    progress_bar = st.progress(0)
+    status_text = st.empty()
+    try:
+        final = follow_job(job_id, progress_bar, status_text)
+    finally:
+        progress_bar.empty()
+        status_text.empty()
+    if final.get("status") != "succeeded":
+        return {"error": f"❌ Processing failed! {final.get('error')}"}
+
+    response_result = requests.get(f"{JOBS_API}/{job_id}/result")
+    return {"response": response_result.text}
+
 def process_open_source_pdf():
     with st.spinner("⏳ Processing Open Source PDF... Please wait."):
-        progress_bar = st.progress(0)  # Initialize progress bar
         try:
-            for i in range(10):  # Simulate progress while waiting
-                time.sleep(1)
-                progress_bar.progress((i + 1) * 10)  # Update progress
-
-            # Step 1: Get Latest File URL
-            response_latest = requests.get(LATEST_FILE_API)
-            if response_latest.status_code != 200:
-                progress_bar.empty()
-                return {"error": f"❌ Failed to fetch latest file URL: {response_latest.text}"}
-
-            # Step 2: Parse the PDF
-            response_parse = requests.get(PARSE_PDF_API, timeout=600)  # Increased timeout
-            if response_parse.status_code == 200:
-                st.session_state.extraction_complete = True
-                progress_bar.empty()
-                return {"message": f"✅ Open Source PDF Analysis Completed! Click Markdown to view results.\n\n**Response:** {response_parse.text}"}
-            else:
-                progress_bar.empty()
-                return {"error": f"❌ Parsing failed! Response: {response_parse.text}"}
+            result = run_pdf_job("open_source")
+            if "error" in result:
+                return result
+            st.session_state.extraction_complete = True
+            return {"message": f"✅ Open Source PDF Analysis Completed! Click Markdown to view results.\n\n**Response:** {result['response']}"}
 
         except requests.exceptions.RequestException as e:
-            progress_bar.empty()
             return {"error": f"⚠️ API Request Failed: {str(e)}"}
-# Function to Trigger Azure PDF Parsing (Enterprise) with Progress Bar & Debugging
+# Function to Trigger Azure PDF Parsing (Enterprise) with Live Progress
 def process_azure_pdf():
     with st.spinner("⏳ Processing PDF using Azure Document Intelligence... Please wait."):
-        progress_bar = st.progress(0)
-
         try:
-            for i in range(10):  # Simulate progress while waiting
-                time.sleep(1)
-                progress_bar.progress((i + 1) * 10)
-             # Step 1: Get Latest File URL
-            response_latest = requests.get(LATEST_FILE_API)
-            if response_latest.status_code != 200:
-                progress_bar.empty()
-                return {"error": f"❌ Failed to fetch latest file URL: {response_latest.text}"}
-
-            response = requests.get(PARSE_PDF_AZURE_API, timeout=600)  # Increased timeout
-
-            if response.status_code == 200:
-                st.session_state.extraction_complete = True
-                progress_bar.empty()
-                return {"message": f"✅ Azure-based PDF Analysis Completed! Click Markdown to view results.\n\n**Response:** {response.text}"}
-            else:
-                error_message = response.json().get("detail", "❌ Azure PDF Parsing failed!")
-                return {"error": error_message}
+            result = run_pdf_job("azure")
+            if "error" in result:
+                return result
+            st.session_state.extraction_complete = True
+            return {"message": f"✅ Azure-based PDF Analysis Completed! Click Markdown to view results.\n\n**Response:** {result['response']}"}
 
         except requests.exceptions.RequestException as e:
-            progress_bar.empty()
             return {"error": f"⚠️ API Request Failed: {str(e)}"}
 
-# Function to Convert PDF to Markdown (With Progress Bar)
+# Function to Convert PDF to Markdown (With Live Progress)
 def convert_to_markdown():
     with st.spinner("⏳ Converting PDF to Markdown... Please wait."):
-        progress_bar = st.progress(0)
-
         try:
-            for i in range(10):  # Simulate progress while waiting
-                time.sleep(1)
-                progress_bar.progress((i + 1) * 10)
-
             service_type = st.session_state.get("service_type", None)
             if not service_type or service_type == "Select Service":
                 return {"error": "⚠️ Please select a valid Service Type!"}
-            # Step 1: Get Latest File URL
-            response_latest = requests.get(LATEST_FILE_API,params={"service_type": service_type})
-            if response_latest.status_code != 200:
-                progress_bar.empty()
-                return {"error": f"❌ Failed to fetch latest file URL: {response_latest.text}"}
 
-            # Step 2: Convert PDF to Markdown
-            response = requests.get(CONVERT_MARKDOWN_API)
-            if response.status_code == 200:
-                st.session_state.markdown_ready = True
-                progress_bar.empty()
-                return {"message": "✅ Markdown Conversion Completed! Click View to see results."}
-            else:
-                progress_bar.empty()
-                return {"error": f"❌ Markdown conversion failed! Response: {response.text}"}
+            result = run_pdf_job("docling", service_type)
+            if "error" in result:
+                return result
+            st.session_state.markdown_ready = True
+            return {"message": "✅ Markdown Conversion Completed! Click View to see results."}
 
         except requests.exceptions.RequestException as e:
-            progress_bar.empty()
             return {"error": f"⚠️ API Request Failed: {str(e)}"}
 # Function to Fetch Markdown File from S3
 def fetch_markdown():
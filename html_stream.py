@@ -0,0 +1,179 @@
+from html.parser import HTMLParser
+from urllib.parse import urljoin
+
+# ✅ lxml's C parser when installed (several times faster), the built-in parser otherwise.
+# lxml is in requirements.txt; without it streaming still bounds memory but parses at pure-Python speed.
+try:
+    from lxml import etree
+except ImportError:
+    etree = None
+
+# Events emitted while a page is parsed, as (kind, value) pairs
+TEXT = "text"  # value: cleaned lines of one block of visible text, joined by "\n"
+IMAGE = "image"  # value: (absolute URL, alt text) of an <img> with a src
+TABLE = "table"  # value: number of the table that starts, from 1 in page order
+TABLE_ROW = "table_row"  # value: (table number, cell texts of one <tr>)
+
+# Content of these elements is never visible text
+SKIPPED_TAGS = frozenset(["script", "style"])
+
+# Elements that start or end a block of text
+BLOCK_TAGS = frozenset([
+    "address", "article", "aside", "blockquote", "br", "caption", "dd", "div", "dl", "dt", "fieldset",
+    "figcaption", "figure", "footer", "form", "h1", "h2", "h3", "h4", "h5", "h6", "header", "hr", "li",
+    "main", "nav", "ol", "p", "pre", "section", "table", "td", "th", "title", "tr", "ul",
+])
+CELL_TAGS = frozenset(["td", "th"])
+
+
+def clean_lines(text):
+    """Visible lines of `text`: stripped, split on double spaces, blanks dropped (as for soup.get_text())."""
+    # Most blocks are a single line: no line breaks (isprintable() is False for those) and no double spaces
+    if text.isprintable() and "  " not in text:
+        text = text.strip()
+        return [text] if text else []
+    lines = (line.strip() for line in text.splitlines())
+    chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
+    return [chunk for chunk in chunks if chunk]
+
+
+class PageEvents:
+    """
+    Turns a page's parse callbacks into text blocks, images and table rows.
+
+    Tags, text and end tags arrive one at a time from a streaming parser;
+    events are queued as soon as their closing tag (or the next block) is
+    seen, and drain() hands them over. No tree is built, so memory is
+    bounded by the largest text block and table row rather than by the page.
+    """
+
+    def __init__(self, base_url):
+        self.base_url = base_url
+        self.events = []
+        self._text = []
+        self._skip = 0
+        self._image_count = 0
+        self._table_count = 0
+        self._tables = []  # open tables, innermost last: [number, row cells or None, cell fragments or None]
+
+    def drain(self):
+        events, self.events = self.events, []
+        return events
+
+    def _flush_text(self):
+        if self._text:
+            lines = clean_lines("".join(self._text))
+            self._text = []
+            if lines:
+                self.events.append((TEXT, "\n".join(lines)))
+
+    def _close_cell(self, table):
+        if table[2] is not None:
+            if table[1] is None:
+                table[1] = []
+            table[1].append("".join(table[2]))
+            table[2] = None
+
+    def _close_row(self, table):
+        self._close_cell(table)
+        if table[1] is not None:
+            self.events.append((TABLE_ROW, (table[0], table[1])))
+            table[1] = None
+
+    def _image(self, attrs):
+        self._image_count += 1
+        src = attrs.get("src")
+        if src:
+            alt = (attrs["alt"] or "") if "alt" in attrs else f"Image {self._image_count}"
+            self.events.append((IMAGE, (urljoin(self.base_url, src), alt)))
+
+    def start(self, tag, attrs):
+        if tag in SKIPPED_TAGS:
+            self._skip += 1
+            return
+        if tag in BLOCK_TAGS:
+            self._flush_text()
+        if tag == "img":
+            self._image(attrs)
+        elif tag == "table":
+            self._table_count += 1
+            self._tables.append([self._table_count, None, None])
+            self.events.append((TABLE, self._table_count))
+        elif self._tables:
+            # End tags of rows and cells are optional in HTML, so a new one closes the previous one
+            table = self._tables[-1]
+            if tag == "tr":
+                self._close_row(table)
+                table[1] = []
+            elif tag in CELL_TAGS:
+                self._close_cell(table)
+                table[2] = []
+
+    def end(self, tag):
+        if tag in SKIPPED_TAGS:
+            self._skip = max(self._skip - 1, 0)
+            return
+        if tag in BLOCK_TAGS:
+            self._flush_text()
+        if not self._tables:
+            return
+        if tag in CELL_TAGS:
+            self._close_cell(self._tables[-1])
+        elif tag == "tr":
+            self._close_row(self._tables[-1])
+        elif tag == "table":
+            self._close_row(self._tables.pop())
+
+    def data(self, data):
+        if self._skip:
+            return
+        self._text.append(data)
+        if self._tables and self._tables[-1][2] is not None:
+            stripped = data.strip()
+            if stripped:
+                self._tables[-1][2].append(stripped)
+
+    def close(self):
+        self._flush_text()
+        while self._tables:
+            self._close_row(self._tables.pop())
+
+
+class _BuiltinParser(HTMLParser):
+    """html.parser front end of PageEvents."""
+
+    def __init__(self, events):
+        super().__init__(convert_charrefs=True)
+        self.target = events
+
+    def handle_starttag(self, tag, attrs):
+        self.target.start(tag, dict(attrs))
+
+    def handle_endtag(self, tag):
+        self.target.end(tag)
+
+    def handle_data(self, data):
+        self.target.data(data)
+
+    def close(self):
+        super().close()
+        self.target.close()
+
+
+def page_parser(events):
+    """Feed parser delivering its callbacks to `events`: lxml when installed, html.parser otherwise."""
+    if etree is not None:
+        return etree.HTMLParser(target=events)
+    return _BuiltinParser(events)
+
+
+def iter_page_events(chunks, base_url):
+    """Parse HTML from an iterable of str chunks, yielding (kind, value) events as each chunk is parsed."""
+    events = PageEvents(base_url)
+    parser = page_parser(events)
+    for chunk in chunks:
+        parser.feed(chunk)
+        if events.events:
+            yield from events.drain()
+    parser.close()
+    yield from events.drain()
@@ -0,0 +1,238 @@
+import os
+import re
+import json
+import time
+import hashlib
+import sqlite3
+import tempfile
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+
+# ✅ Cache location, freshness and size (override via environment)
+HTTP_CACHE_DIR = os.getenv("HTTP_CACHE_DIR", os.path.join(os.getcwd(), "http_cache"))
+HTTP_CACHE_TTL = int(os.getenv("HTTP_CACHE_TTL", 300))  # Seconds a response is reused without revalidating
+HTTP_CACHE_MAX_MB = int(os.getenv("HTTP_CACHE_MAX_MB", 512))
+
+# Where a cached response came from
+STATUS_FRESH = "fresh"  # served from disk, within its TTL
+STATUS_REVALIDATED = "revalidated"  # server answered 304 Not Modified
+STATUS_FETCHED = "fetched"  # full response downloaded
+
+MAX_AGE_PATTERN = re.compile(r"max-age=(\d+)")
+
+
+class CachedResponse:
+    """A response body plus what the cache knows about it."""
+
+    def __init__(self, url, content, content_type, encoding, fingerprint, status, unchanged):
+        self.url = url
+        self.content = content
+        self.content_type = content_type
+        self.encoding = encoding
+        self.fingerprint = fingerprint  # sha256 of the body
+        self.status = status
+        self.unchanged = unchanged  # same body as the previous fetch of this URL
+
+    @property
+    def text(self):
+        return self.content.decode(self.encoding or "utf-8", errors="replace")
+
+
+def freshness_seconds(headers, default_ttl):
+    """TTL from Cache-Control (no-store -> None, no-cache -> 0, max-age) or the default."""
+    cache_control = headers.get("Cache-Control", "").lower()
+    if "no-store" in cache_control:
+        return None
+    if "no-cache" in cache_control:
+        return 0
+    match = MAX_AGE_PATTERN.search(cache_control)
+    return int(match.group(1)) if match else default_ttl
+
+
+class HttpCache:
+    """
+    Disk-backed HTTP cache for scraped pages and images, keyed by URL.
+
+    Bodies live in files; validators (ETag / Last-Modified), TTLs and LRU
+    order live in SQLite. Within its TTL a response is served from disk;
+    after that it is revalidated with a conditional GET, so an unchanged
+    resource costs a 304 instead of a full download.
+
+    Parse results are cached per (URL, body fingerprint), so callers can
+    skip re-parsing unchanged content.
+    """
+
+    def __init__(self, cache_dir=HTTP_CACHE_DIR, ttl=HTTP_CACHE_TTL, max_bytes=HTTP_CACHE_MAX_MB * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        os.makedirs(os.path.join(cache_dir, "bodies"), exist_ok=True)
+        self._conn = sqlite3.connect(os.path.join(cache_dir, "http_cache.db"), check_same_thread=False)
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS responses (
+                url TEXT PRIMARY KEY,
+                fingerprint TEXT NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                content_type TEXT,
+                encoding TEXT,
+                size INTEGER NOT NULL,
+                expires_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_responses_accessed ON responses (accessed_at);
+            CREATE TABLE IF NOT EXISTS derived (
+                url TEXT NOT NULL,
+                name TEXT NOT NULL,
+                fingerprint TEXT NOT NULL,
+                value TEXT NOT NULL,
+                PRIMARY KEY (url, name)
+            );
+            """
+        )
+        self._conn.commit()
+        self._total_bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    def _session(self):
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=16, pool_maxsize=16)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            self._local.session = session
+        return session
+
+    def _body_path(self, url):
+        return os.path.join(self.cache_dir, "bodies", hashlib.sha256(url.encode("utf-8")).hexdigest())
+
+    def _row(self, url):
+        with self._lock:
+            cursor = self._conn.execute("SELECT * FROM responses WHERE url = ?", (url,))
+            row = cursor.fetchone()
+            return dict(zip([col[0] for col in cursor.description], row)) if row else None
+
+    def _read_body(self, url):
+        try:
+            with open(self._body_path(url), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def _touch(self, url, expires_at=None):
+        with self._lock:
+            if expires_at is None:
+                self._conn.execute("UPDATE responses SET accessed_at = ? WHERE url = ?", (time.time(), url))
+            else:
+                self._conn.execute("UPDATE responses SET accessed_at = ?, expires_at = ? WHERE url = ?",
+                                   (time.time(), expires_at, url))
+            self._conn.commit()
+
+    def _store(self, url, body, fingerprint, response, ttl):
+        # Write the body next to its final path first so readers never see a partial file
+        path = self._body_path(url)
+        with tempfile.NamedTemporaryFile(delete=False, dir=os.path.dirname(path)) as f:
+            f.write(body)
+        os.replace(f.name, path)
+
+        now = time.time()
+        with self._lock:
+            previous = self._conn.execute("SELECT size FROM responses WHERE url = ?", (url,)).fetchone()
+            self._total_bytes += len(body) - (previous[0] if previous else 0)
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (url, fingerprint, response.headers.get("ETag"), response.headers.get("Last-Modified"),
+                 response.headers.get("Content-Type"), response.encoding, len(body), now + ttl, now),
+            )
+            self._conn.commit()
+            self._evict()
+
+    def _evict(self):
+        # Least recently used first; caller holds the lock
+        while self._total_bytes > self.max_bytes:
+            row = self._conn.execute("SELECT url, size FROM responses ORDER BY accessed_at LIMIT 1").fetchone()
+            if row is None:
+                break
+            url, size = row
+            self._conn.execute("DELETE FROM responses WHERE url = ?", (url,))
+            self._conn.execute("DELETE FROM derived WHERE url = ?", (url,))
+            self._total_bytes -= size
+            try:
+                os.remove(self._body_path(url))
+            except FileNotFoundError:
+                pass
+        self._conn.commit()
+
+    def get(self, url, timeout=30, session=None, read_body=None):
+        """
+        Return a CachedResponse for `url`, from disk, after a 304, or freshly downloaded.
+
+        `read_body(response)` reads the body of a streamed 200 response (e.g.
+        with a size cap); by default the whole body is read. HTTP errors are
+        raised as requests exceptions.
+        """
+        row = self._row(url)
+        body = self._read_body(url) if row else None
+        if body is None:
+            row = None
+        elif time.time() < row["expires_at"]:
+            self._touch(url)
+            return CachedResponse(url, body, row["content_type"], row["encoding"], row["fingerprint"],
+                                  STATUS_FRESH, True)
+
+        headers = {}
+        if row and row["etag"]:
+            headers["If-None-Match"] = row["etag"]
+        if row and row["last_modified"]:
+            headers["If-Modified-Since"] = row["last_modified"]
+
+        with (session or self._session()).get(url, headers=headers, timeout=timeout, stream=True) as response:
+            ttl = freshness_seconds(response.headers, self.ttl)
+            if response.status_code == 304 and row:
+                self._touch(url, time.time() + (ttl or 0))
+                return CachedResponse(url, body, row["content_type"], row["encoding"], row["fingerprint"],
+                                      STATUS_REVALIDATED, True)
+            response.raise_for_status()
+            if response.encoding is None and "text" in response.headers.get("Content-Type", ""):
+                response.encoding = response.apparent_encoding
+            new_body = bytes(read_body(response)) if read_body else response.content
+
+        fingerprint = hashlib.sha256(new_body).hexdigest()
+        if ttl is not None:
+            self._store(url, new_body, fingerprint, response, ttl)
+        unchanged = row is not None and row["fingerprint"] == fingerprint
+        return CachedResponse(url, new_body, response.headers.get("Content-Type"), response.encoding, fingerprint,
+                              STATUS_FETCHED, unchanged)
+
+    def derived(self, url, name, fingerprint):
+        """Parse result `name` stored for this exact body of `url`, or None."""
+        with self._lock:
+            row = self._conn.execute("SELECT fingerprint, value FROM derived WHERE url = ? AND name = ?",
+                                     (url, name)).fetchone()
+        if row is None or row[0] != fingerprint:
+            return None
+        return json.loads(row[1])
+
+    def store_derived(self, url, name, fingerprint, value):
+        """Remember a JSON-serialisable parse result for this body of `url`."""
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO derived VALUES (?, ?, ?, ?)",
+                               (url, name, fingerprint, json.dumps(value)))
+            self._conn.commit()
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_http_cache():
+    """Return the shared HTTP cache of this process."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = HttpCache()
+        return _cache
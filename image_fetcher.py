@@ -0,0 +1,212 @@
+import os
+import threading
+import requests
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urlsplit
+from requests.adapters import HTTPAdapter
+from s3_uploader import get_uploader, MB
+from http_cache import get_http_cache
+
+# ✅ Image download tuning (override via environment)
+IMAGE_FETCH_WORKERS = int(os.getenv("IMAGE_FETCH_WORKERS", 32))
+IMAGE_FETCH_PER_HOST = int(os.getenv("IMAGE_FETCH_PER_HOST", 8))  # Connections to one host at once
+IMAGE_FETCH_TIMEOUT = float(os.getenv("IMAGE_FETCH_TIMEOUT", 15))  # Seconds to connect and between reads
+IMAGE_MAX_MB = int(os.getenv("IMAGE_MAX_MB", 10))
+
+IMAGE_CHUNK_SIZE = 64 * 1024
+
+# Leading bytes of common image formats -> (extension, content type)
+IMAGE_SIGNATURES = (
+    (b"\x89PNG\r\n\x1a\n", "png", "image/png"),
+    (b"\xff\xd8\xff", "jpg", "image/jpeg"),
+    (b"GIF87a", "gif", "image/gif"),
+    (b"GIF89a", "gif", "image/gif"),
+    (b"BM", "bmp", "image/bmp"),
+    (b"\x00\x00\x01\x00", "ico", "image/x-icon"),
+)
+
+# Content types trusted from the response header when the bytes are not recognised
+IMAGE_CONTENT_TYPES = {
+    "image/png": "png",
+    "image/jpeg": "jpg",
+    "image/gif": "gif",
+    "image/webp": "webp",
+    "image/svg+xml": "svg",
+    "image/bmp": "bmp",
+    "image/x-icon": "ico",
+    "image/avif": "avif",
+}
+
+
+class ImageFetchError(Exception):
+    """Raised when a URL does not yield an acceptable image."""
+
+
+def detect_image_type(data, header_content_type=None):
+    """Return (extension, content type) from the image bytes, falling back to the response header."""
+    for signature, ext, content_type in IMAGE_SIGNATURES:
+        if data.startswith(signature):
+            return ext, content_type
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "webp", "image/webp"
+    if data.lstrip()[:5] in (b"<?xml", b"<svg ") and b"<svg" in data[:1024]:
+        return "svg", "image/svg+xml"
+
+    content_type = (header_content_type or "").split(";")[0].strip().lower()
+    if content_type in IMAGE_CONTENT_TYPES:
+        return IMAGE_CONTENT_TYPES[content_type], content_type
+    raise ImageFetchError(f"Not an image (Content-Type: {header_content_type or 'unknown'})")
+
+
+class ImageFetcher:
+    """
+    Downloads images concurrently over pooled keep-alive sessions.
+
+    Each worker thread keeps its own requests.Session; connections to a
+    single host are capped at `per_host`. Every download has a timeout and
+    a size cap, and its format is detected from the bytes. With an
+    HttpCache, unchanged images are revalidated instead of re-downloaded.
+    """
+
+    def __init__(self, max_workers=IMAGE_FETCH_WORKERS, per_host=IMAGE_FETCH_PER_HOST,
+                 timeout=IMAGE_FETCH_TIMEOUT, max_bytes=IMAGE_MAX_MB * MB, cache=None):
+        self.per_host = per_host
+        self.timeout = timeout
+        self.max_bytes = max_bytes
+        self.cache = cache
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="image-fetch")
+        self._local = threading.local()
+        self._host_limits = {}
+        self._lock = threading.Lock()
+
+    def _session(self):
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=self.per_host, pool_maxsize=self.per_host)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            session.headers["User-Agent"] = "Mozilla/5.0 (compatible; AI-Information-Extractor)"
+            self._local.session = session
+        return session
+
+    def _host_limit(self, url):
+        host = urlsplit(url).netloc
+        with self._lock:
+            if host not in self._host_limits:
+                self._host_limits[host] = threading.BoundedSemaphore(self.per_host)
+            return self._host_limits[host]
+
+    def _read_capped(self, response):
+        content_length = response.headers.get("Content-Length", "")
+        # A malformed header is ignored: the streamed size is capped below anyway
+        if content_length.isdigit() and int(content_length) > self.max_bytes:
+            raise ImageFetchError(f"Image too large ({int(content_length) // 1024} KB)")
+        data = bytearray()
+        for chunk in response.iter_content(IMAGE_CHUNK_SIZE):
+            data += chunk
+            if len(data) > self.max_bytes:
+                raise ImageFetchError(f"Image larger than {self.max_bytes // MB} MB")
+        return data
+
+    def fetch(self, url):
+        """Download one image; return (bytes, extension, content type) or raise ImageFetchError."""
+        with self._host_limit(url):
+            try:
+                if self.cache is not None:
+                    cached = self.cache.get(url, self.timeout, self._session(), read_body=self._read_capped)
+                    data, header_content_type = cached.content, cached.content_type
+                else:
+                    with self._session().get(url, stream=True, timeout=self.timeout) as response:
+                        response.raise_for_status()
+                        data = bytes(self._read_capped(response))
+                        header_content_type = response.headers.get("Content-Type")
+            except ImageFetchError:
+                raise
+            except Exception as e:
+                # Network errors and anything unexpected fail this image only, never the whole scrape
+                raise ImageFetchError(str(e)) from e
+        ext, content_type = detect_image_type(data, header_content_type)
+        return data, ext, content_type
+
+    def _fetch_distinct(self, image_urls):
+        """Submit one fetch per distinct URL; return {future: [indexes of that URL in image_urls]}."""
+        indexes = {}
+        for idx, url in enumerate(image_urls):
+            indexes.setdefault(url, []).append(idx)
+        return {self.executor.submit(self.fetch, url): idxs for url, idxs in indexes.items()}
+
+    def fetch_to_s3(self, image_urls, s3_prefix, uploader=None, first_index=1):
+        """
+        Download every image and upload each to `{s3_prefix}/image_{n}.{ext}` as soon as it arrives.
+
+        `n` counts from `first_index`, so successive calls can share one prefix.
+        A URL listed several times is fetched and uploaded once, under the
+        `n` of its first occurrence.
+
+        Returns one (url, s3_path or None, error or None) tuple per input URL, in input order.
+        """
+        batch = (uploader or get_uploader()).batch()
+        results = [(url, None, None) for url in image_urls]
+        indexes_of_path = {}
+        futures = self._fetch_distinct(image_urls)
+        for future in as_completed(futures):
+            idxs = futures[future]
+            try:
+                data, ext, content_type = future.result()
+            except ImageFetchError as e:
+                for idx in idxs:
+                    results[idx] = (image_urls[idx], None, e)
+                continue
+            s3_path = f"{s3_prefix}/image_{first_index + idxs[0]}.{ext}"
+            batch.add_bytes(data, s3_path, content_type)
+            for idx in idxs:
+                results[idx] = (image_urls[idx], s3_path, None)
+            indexes_of_path[s3_path] = idxs
+
+        for _, s3_path, error in batch.wait():
+            if error:
+                for idx in indexes_of_path[s3_path]:
+                    results[idx] = (image_urls[idx], None, error)
+        return results
+
+    def fetch_to_manifest(self, image_urls, manifest, name_prefix="images", first_index=1):
+        """
+        Download every image and add each to a JobManifest as `{name_prefix}/image_{n}.{ext}`.
+
+        Images are stored under content-addressed keys, so one already in S3
+        (from another page or job) is not uploaded again, and a URL listed
+        several times is fetched once. Returns one (url, s3_key or None,
+        error or None) tuple per input URL, in input order; upload errors
+        are reported by manifest.write().
+        """
+        results = [(url, None, None) for url in image_urls]
+        futures = self._fetch_distinct(image_urls)
+        for future in as_completed(futures):
+            idxs = futures[future]
+            try:
+                data, ext, content_type = future.result()
+            except ImageFetchError as e:
+                for idx in idxs:
+                    results[idx] = (image_urls[idx], None, e)
+                continue
+            s3_key = manifest.add_bytes(f"{name_prefix}/image_{first_index + idxs[0]}.{ext}", data, content_type)
+            for idx in idxs:
+                results[idx] = (image_urls[idx], s3_key, None)
+        return results
+
+    def shutdown(self, wait=True):
+        self.executor.shutdown(wait=wait)
+
+
+_fetcher = None
+_fetcher_lock = threading.Lock()
+
+
+def get_image_fetcher():
+    """Return the shared image fetcher of this process."""
+    global _fetcher
+    with _fetcher_lock:
+        if _fetcher is None:
+            _fetcher = ImageFetcher(cache=get_http_cache())
+        return _fetcher
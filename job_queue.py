@@ -0,0 +1,289 @@
+import os
+import asyncio
+import time
+import uuid
+import threading
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+# ✅ Worker pool sizing (override via environment)
+PROCESS_WORKERS = int(os.getenv("JOB_PROCESS_WORKERS", max(1, (os.cpu_count() or 2) - 1)))
+THREAD_WORKERS = int(os.getenv("JOB_THREAD_WORKERS", 8))
+LONG_RUNNING_WORKERS = int(os.getenv("JOB_LONG_RUNNING_WORKERS", 4))  # Threads for jobs that wait minutes (scrapes, crawls)
+MAX_PENDING_JOBS = int(os.getenv("JOB_MAX_PENDING", 100))
+MAX_FINISHED_JOBS = int(os.getenv("JOB_MAX_FINISHED", 500))
+MAX_PROGRESS_EVENTS = int(os.getenv("JOB_MAX_PROGRESS_EVENTS", 1000))  # Kept per job, oldest dropped first
+
+# ✅ Job states
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+
+
+def _noop():
+    return None
+
+
+def _run_job(progress_queue, job_id, fn, args, kwargs):
+    """
+    Runs in the worker: announce the start time, then run the job.
+
+    Returns (started_at, result), so the start time is right even when
+    nobody looked at the job while it ran. A failure carries the start
+    time too, as `job_started_at` on the exception.
+    """
+    started_at = time.time()
+    try:
+        progress_queue.put({"job_id": job_id, "started_at": started_at})
+    except Exception:
+        pass
+    try:
+        return started_at, fn(*args, **kwargs)
+    except Exception as e:
+        try:
+            e.job_started_at = started_at
+        except Exception:
+            pass
+        raise
+
+
+class ProgressReporter:
+    """
+    Picklable callable a pipeline uses to report progress of one job:
+    `progress(stage, message, total=None, advance=None)`.
+
+    `total` sets the number of work units expected, `advance` counts units
+    finished. Events go through a manager queue, so worker processes can
+    report too. Reporting never fails the job.
+    """
+
+    def __init__(self, queue, job_id):
+        self.queue = queue
+        self.job_id = job_id
+
+    def __call__(self, stage, message, **fields):
+        try:
+            self.queue.put({"job_id": self.job_id, "stage": stage, "message": message, "time": time.time(), **fields})
+        except Exception:
+            pass
+
+
+class QueueFullError(Exception):
+    """Raised when the job queue has no capacity left for new submissions."""
+
+
+class JobQueue:
+    """
+    Runs pipeline functions off the event loop.
+
+    CPU-bound parsers (PyMuPDF, camelot, Docling) go to a process pool,
+    network-bound pipelines (Azure, scrapers) go to a thread pool. Jobs
+    that mostly wait on a remote service for minutes (Apify runs, crawls)
+    get a thread pool of their own, so they cannot hold up PDF jobs.
+    Job state is kept in memory and looked up by job id.
+    """
+
+    def __init__(self, process_workers=PROCESS_WORKERS, thread_workers=THREAD_WORKERS,
+                 long_running_workers=LONG_RUNNING_WORKERS, max_pending=MAX_PENDING_JOBS,
+                 max_finished=MAX_FINISHED_JOBS, process_initializer=None):
+        # `process_initializer` runs once in every worker process (e.g. to load models)
+        self.process_workers = process_workers
+        self.process_pool = ProcessPoolExecutor(max_workers=process_workers, initializer=process_initializer)
+        self.thread_pool = ThreadPoolExecutor(max_workers=thread_workers, thread_name_prefix="job")
+        self.long_running_pool = ThreadPoolExecutor(max_workers=long_running_workers, thread_name_prefix="job-long")
+        self.max_pending = max_pending
+        self.max_finished = max_finished
+        self._jobs = {}
+        self._futures = {}
+        self._callbacks = {}
+        self._lock = threading.Lock()
+
+        # Progress events from every pool land on one queue, pumped into per-job buffers
+        self._manager = multiprocessing.Manager()
+        self.progress_queue = self._manager.Queue()
+        self._events = {}
+        self._event_seq = 0
+        self._pump = threading.Thread(target=self._pump_progress, name="job-progress", daemon=True)
+        self._pump.start()
+
+    def submit(self, kind, fn, *args, cpu_bound=True, long_running=False, metadata=None, on_done=None,
+               progress=False, **kwargs):
+        """
+        Schedule `fn(*args, **kwargs)` and return the new job id immediately.
+
+        `long_running=True` runs it on the long-running thread pool instead.
+        `on_done(job)` is called in this process once the job has finished.
+        With `progress=True`, `fn` also gets a ProgressReporter as `progress`.
+        """
+        with self._lock:
+            pending = sum(1 for job in self._jobs.values() if job["status"] in (JOB_QUEUED, JOB_RUNNING))
+            if pending >= self.max_pending:
+                raise QueueFullError(f"Job queue is full ({pending} pending jobs)")
+
+            job_id = uuid.uuid4().hex
+            self._jobs[job_id] = {
+                "job_id": job_id,
+                "kind": kind,
+                "status": JOB_QUEUED,
+                "metadata": metadata or {},
+                "submitted_at": time.time(),
+                "started_at": None,
+                "finished_at": None,
+                "result": None,
+                "error": None,
+            }
+            if on_done is not None:
+                self._callbacks[job_id] = on_done
+            if progress:
+                self._events[job_id] = deque(maxlen=MAX_PROGRESS_EVENTS)
+                kwargs["progress"] = ProgressReporter(self.progress_queue, job_id)
+
+        if long_running:
+            executor = self.long_running_pool
+        else:
+            executor = self.process_pool if cpu_bound else self.thread_pool
+        future = executor.submit(_run_job, self.progress_queue, job_id, fn, args, kwargs)
+        with self._lock:
+            self._futures[job_id] = future
+        future.add_done_callback(lambda f, job_id=job_id: self._on_done(job_id, f))
+        return job_id
+
+    def complete(self, kind, result, metadata=None, on_done=None):
+        """Record a job that needed no work (e.g. a cache hit) as already succeeded."""
+        now = time.time()
+        job_id = uuid.uuid4().hex
+        job = {
+            "job_id": job_id,
+            "kind": kind,
+            "status": JOB_SUCCEEDED,
+            "metadata": metadata or {},
+            "submitted_at": now,
+            "started_at": now,
+            "finished_at": now,
+            "result": result,
+            "error": None,
+        }
+        with self._lock:
+            self._jobs[job_id] = job
+            snapshot = dict(job)
+            self._prune_finished()
+        if on_done is not None:
+            on_done(snapshot)
+        return job_id
+
+    def _refresh_status(self, job):
+        # Executors flip a future to running once a worker picks it up; started_at comes from the worker itself
+        future = self._futures.get(job["job_id"])
+        if job["status"] == JOB_QUEUED and future is not None and future.running():
+            job["status"] = JOB_RUNNING
+
+    def _on_done(self, job_id, future):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return
+            job["finished_at"] = time.time()
+            exc = future.exception()
+            if exc is not None:
+                job["status"] = JOB_FAILED
+                job["error"] = str(exc)
+                job["started_at"] = getattr(exc, "job_started_at", None) or job["started_at"]
+                print(f"❌ Job {job_id} ({job['kind']}) failed: {exc}")
+            else:
+                job["status"] = JOB_SUCCEEDED
+                job["started_at"], job["result"] = future.result()
+                print(f"✅ Job {job_id} ({job['kind']}) finished in {job['finished_at'] - job['submitted_at']:.2f}s")
+            if job["started_at"] is None:
+                # Never started (e.g. cancelled or a broken pool)
+                job["started_at"] = job["submitted_at"]
+            self._futures.pop(job_id, None)
+            callback = self._callbacks.pop(job_id, None)
+            snapshot = dict(job)
+            self._prune_finished()
+
+        if callback is not None:
+            try:
+                callback(snapshot)
+            except Exception as e:
+                print(f"❌ Job {job_id} completion hook failed: {e}")
+
+    def _prune_finished(self):
+        finished = [job for job in self._jobs.values() if job["status"] in (JOB_SUCCEEDED, JOB_FAILED)]
+        if len(finished) <= self.max_finished:
+            return
+        finished.sort(key=lambda job: job["finished_at"])
+        for job in finished[:len(finished) - self.max_finished]:
+            del self._jobs[job["job_id"]]
+            self._events.pop(job["job_id"], None)
+
+    def _pump_progress(self):
+        while True:
+            try:
+                event = self.progress_queue.get()
+            except (EOFError, OSError):
+                return  # manager shut down
+            if event is None:
+                return
+            with self._lock:
+                if "stage" not in event:
+                    # A worker announcing that it started the job
+                    job = self._jobs.get(event["job_id"])
+                    if job is not None and job["started_at"] is None:
+                        job["started_at"] = event["started_at"]
+                        if job["status"] == JOB_QUEUED:
+                            job["status"] = JOB_RUNNING
+                    continue
+                events = self._events.get(event["job_id"])
+                if events is None:
+                    continue
+                self._event_seq += 1
+                event["seq"] = self._event_seq
+                events.append(event)
+
+    def events(self, job_id, after_seq=0):
+        """Progress events of a job newer than `after_seq`, oldest first."""
+        with self._lock:
+            return [dict(event) for event in self._events.get(job_id, ()) if event["seq"] > after_seq]
+
+    def warm_up(self):
+        """Start every worker process now so their initializer runs before the first job."""
+        return [self.process_pool.submit(_noop) for _ in range(self.process_workers)]
+
+    def get(self, job_id):
+        """Return a snapshot of the job, or None if it is unknown."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            self._refresh_status(job)
+            return dict(job)
+
+    def future(self, job_id):
+        """Return the concurrent future of a job that has not finished yet."""
+        with self._lock:
+            return self._futures.get(job_id)
+
+    async def wait(self, job_id):
+        """Await a job from async code without blocking the event loop."""
+        future = self.future(job_id)
+        if future is not None:
+            try:
+                await asyncio.wrap_future(future)
+            except Exception:
+                pass  # failure is recorded on the job itself
+        return self.get(job_id)
+
+    def list(self):
+        with self._lock:
+            for job in self._jobs.values():
+                self._refresh_status(job)
+            return [dict(job) for job in self._jobs.values()]
+
+    def shutdown(self, wait=False):
+        self.thread_pool.shutdown(wait=wait, cancel_futures=True)
+        self.long_running_pool.shutdown(wait=wait, cancel_futures=True)
+        self.process_pool.shutdown(wait=wait, cancel_futures=True)
+        self.progress_queue.put(None)
+        self._manager.shutdown()
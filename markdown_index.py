@@ -0,0 +1,200 @@
+import os
+import json
+import time
+import threading
+from collections import OrderedDict
+from botocore.exceptions import ClientError
+from s3_uploader import get_uploader
+
+# ✅ Where Docling markdown jobs live and where the index is persisted
+MARKDOWN_OUTPUTS_PREFIX = "pdf_processing_pipeline/markdown_outputs/"
+MARKDOWN_INDEX_KEY = "pdf_processing_pipeline/markdown_index.json"
+
+# ✅ Newest jobs kept in the index, and how often a process re-reads it for jobs written by other instances
+MARKDOWN_INDEX_MAX_JOBS = int(os.getenv("MARKDOWN_INDEX_MAX_JOBS", 1000))
+MARKDOWN_INDEX_REFRESH_SECONDS = int(os.getenv("MARKDOWN_INDEX_REFRESH_SECONDS", 30))
+
+# Conditional writes lost to another writer are retried this many times
+MARKDOWN_INDEX_WRITE_ATTEMPTS = 5
+_CONFLICT_CODES = ("PreconditionFailed", "ConditionalRequestConflict")
+
+
+class MarkdownIndex:
+    """
+    Job folder -> markdown keys, ordered from oldest to newest job.
+
+    Updated whenever a Docling job writes its outputs, so "latest job" and
+    "files for job" are dictionary lookups instead of S3 prefix scans. A
+    JSON copy of the newest `max_jobs` jobs is kept in S3; a full rebuild
+    pages through the bucket.
+
+    Several processes share the S3 copy: each write re-reads it, merges in
+    this process's new jobs and is conditional on the ETag it read, so a
+    concurrent write is retried instead of overwritten. Nothing is written
+    until the S3 copy has been loaded, so a failed load cannot erase it.
+    """
+
+    def __init__(self, prefix=MARKDOWN_OUTPUTS_PREFIX, index_key=MARKDOWN_INDEX_KEY, uploader=None,
+                 max_jobs=MARKDOWN_INDEX_MAX_JOBS, refresh_seconds=MARKDOWN_INDEX_REFRESH_SECONDS):
+        self.prefix = prefix
+        self.index_key = index_key
+        self.max_jobs = max_jobs
+        self.refresh_seconds = refresh_seconds
+        self._uploader = uploader
+        self._jobs = OrderedDict()  # s3_folder -> {"markdown_files": [...], "updated_at": ...}
+        self._pending = {}  # jobs recorded here and not yet written to S3
+        self._loaded_at = None
+        self._lock = threading.Lock()
+        self._persist_lock = threading.RLock()
+
+    @property
+    def uploader(self):
+        return self._uploader or get_uploader()
+
+    def record(self, s3_folder, markdown_files, updated_at=None):
+        """Register a job's markdown files and make it the latest job."""
+        entry = {"markdown_files": list(markdown_files), "updated_at": updated_at or time.time()}
+        with self._lock:
+            self._pending[s3_folder] = entry
+            self._jobs[s3_folder] = entry
+            self._jobs.move_to_end(s3_folder)
+            self._trim()
+        return self.uploader.executor.submit(self._persist_logged)
+
+    def latest(self):
+        """Return (s3_folder, markdown_files) of the newest job, or None."""
+        with self._lock:
+            if not self._jobs:
+                return None
+            s3_folder = next(reversed(self._jobs))
+            return s3_folder, list(self._jobs[s3_folder]["markdown_files"])
+
+    def files_for(self, s3_folder):
+        """Markdown keys of one job folder, or None if it is unknown."""
+        with self._lock:
+            entry = self._jobs.get(s3_folder)
+            return list(entry["markdown_files"]) if entry else None
+
+    def _trim(self):
+        while len(self._jobs) > self.max_jobs:
+            self._jobs.popitem(last=False)
+
+    def _merge(self, jobs):
+        # Jobs from S3 plus the ones still pending here, oldest first (caller holds the lock)
+        merged = {job["s3_folder"]: {"markdown_files": job["markdown_files"], "updated_at": job["updated_at"]}
+                  for job in jobs}
+        merged.update(self._pending)
+        ordered = sorted(merged.items(), key=lambda item: item[1]["updated_at"])
+        return OrderedDict(ordered[-self.max_jobs:] if self.max_jobs else ordered)
+
+    def _read(self):
+        """(jobs, ETag) of the S3 copy, or (None, None) when there is none."""
+        uploader = self.uploader
+        try:
+            response = uploader.client.get_object(Bucket=uploader.bucket, Key=self.index_key)
+        except uploader.client.exceptions.NoSuchKey:
+            return None, None
+        return json.loads(response["Body"].read())["jobs"], response["ETag"]
+
+    def _put(self, jobs, etag=None, condition=True):
+        # Only replaces the copy that was read (or creates it when there was none)
+        payload = json.dumps({"jobs": [{"s3_folder": folder, **entry} for folder, entry in jobs.items()]})
+        kwargs = {}
+        if condition:
+            kwargs = {"IfMatch": etag} if etag else {"IfNoneMatch": "*"}
+        uploader = self.uploader
+        uploader.client.put_object(Bucket=uploader.bucket, Key=self.index_key, Body=payload.encode("utf-8"),
+                                   ContentType="application/json", **kwargs)
+
+    def _written(self, written):
+        # Drop pending jobs that are now in S3, unless they were recorded again meanwhile
+        for folder, entry in written.items():
+            if self._pending.get(folder) is entry:
+                del self._pending[folder]
+
+    def _persist(self):
+        with self._persist_lock:
+            if self._loaded_at is None:
+                self.load()  # raises while S3 is unreadable, leaving the jobs pending
+            for _ in range(MARKDOWN_INDEX_WRITE_ATTEMPTS):
+                with self._lock:
+                    if not self._pending:
+                        return  # an earlier write already included them
+                    written = dict(self._pending)
+                jobs, etag = self._read()
+                with self._lock:
+                    merged = self._merge(jobs or [])
+                try:
+                    self._put(merged, etag)
+                except ClientError as e:
+                    if e.response.get("Error", {}).get("Code") in _CONFLICT_CODES:
+                        continue  # another process wrote first: merge its jobs and try again
+                    raise
+                with self._lock:
+                    self._written(written)
+                    self._jobs = self._merge([{"s3_folder": folder, **entry} for folder, entry in merged.items()])
+                    self._loaded_at = time.time()
+                return
+            raise RuntimeError(f"Markdown index kept changing, gave up after {MARKDOWN_INDEX_WRITE_ATTEMPTS} attempts")
+
+    def _persist_logged(self):
+        try:
+            self._persist()
+        except Exception as e:
+            print(f"❌ Failed to persist markdown index, will retry on the next job: {e}")
+
+    def load(self):
+        """Load the persisted index from S3, rebuilding it from a bucket listing if there is none."""
+        with self._persist_lock:
+            jobs, _ = self._read()
+            if jobs is None:
+                return self.rebuild()
+            with self._lock:
+                self._jobs = self._merge(jobs)
+                self._loaded_at = time.time()
+        print(f"✅ Loaded markdown index with {len(jobs)} jobs")
+        return len(jobs)
+
+    def ensure_loaded(self):
+        """Load the index if that has not succeeded yet, or re-read it when older than `refresh_seconds`."""
+        loaded_at = self._loaded_at
+        if loaded_at is not None and time.time() - loaded_at < self.refresh_seconds:
+            return
+        try:
+            with self._persist_lock:
+                if self._loaded_at is loaded_at:
+                    self.load()
+        except Exception as e:
+            if loaded_at is None:
+                raise
+            print(f"❌ Failed to refresh markdown index, serving the copy loaded earlier: {e}")
+
+    def rebuild(self):
+        """Re-create the index from every markdown object under the prefix (paginated, no 1000-key cap)."""
+        uploader = self.uploader
+        found = {}
+        paginator = uploader.client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=uploader.bucket, Prefix=self.prefix):
+            for obj in page.get("Contents", []):
+                key = obj["Key"]
+                if not key.endswith(".md"):
+                    continue
+                s3_folder = key[:key.rindex("/") + 1]
+                if s3_folder == self.prefix:
+                    continue  # only job subfolders hold markdown outputs
+                entry = found.setdefault(s3_folder, {"markdown_files": [], "updated_at": 0})
+                entry["markdown_files"].append(key)
+                entry["updated_at"] = max(entry["updated_at"], obj["LastModified"].timestamp())
+
+        # The listing is the whole truth, so the S3 copy is replaced outright
+        with self._persist_lock:
+            with self._lock:
+                written = dict(self._pending)
+                jobs = self._merge([{"s3_folder": folder, **entry} for folder, entry in found.items()])
+            self._put(jobs, condition=False)
+            with self._lock:
+                self._written(written)
+                self._jobs = jobs
+                self._loaded_at = time.time()
+        print(f"✅ Rebuilt markdown index with {len(found)} jobs")
+        return len(found)
@@ -0,0 +1,127 @@
+import io
+
+# Small writes are gathered into chunks of this size before they reach the sink
+WRITE_CHUNK_SIZE = 64 * 1024
+TABLE_ROWS_PER_WRITE = 1000
+
+# Placeholder between cells while a row is escaped as one string
+CELL_JOIN = "\0"
+
+
+def table_row(cells, width):
+    """
+    One markdown table row, padded to `width` cells: pipes escaped, line breaks folded into spaces.
+
+    Cells are joined first and escaped as one string, so a row costs a few
+    C-level string operations instead of several per cell.
+    """
+    try:
+        row = CELL_JOIN.join(cells)
+    except TypeError:
+        row = CELL_JOIN.join(["" if cell is None else str(cell) for cell in cells])
+    if "|" in row:
+        row = row.replace("|", "\\|")
+    if "\n" in row or "\r" in row:
+        row = row.replace("\r\n", " ").replace("\n", " ").replace("\r", " ")
+    if len(cells) < width:
+        row += CELL_JOIN * (width - max(len(cells), 1))
+    return "| " + row.replace(CELL_JOIN, " | ") + " |\n"
+
+
+def escape_alt(text):
+    return " ".join(str(text or "").split()).replace("[", "\\[").replace("]", "\\]")
+
+
+class MarkdownWriter:
+    """
+    Builds a markdown document piece by piece, in time linear in its size.
+
+    Output goes to `sink`, anything with write(bytes) such as a JobManifest
+    stream or an S3 MultipartStream, so a large document never has to sit in
+    memory whole. Without a sink it is kept in memory; read it with getvalue().
+    Use as a context manager: the sink is closed on success and aborted
+    (if it can be) on error.
+    """
+
+    def __init__(self, sink=None, encoding="utf-8"):
+        self.sink = sink
+        self.encoding = encoding
+        self._memory = io.StringIO() if sink is None else None
+        self._chunks = []
+        self._pending = 0
+
+    def write(self, text):
+        if self._memory is not None:
+            self._memory.write(text)
+            return
+        self._chunks.append(text)
+        self._pending += len(text)
+        if self._pending >= WRITE_CHUNK_SIZE:
+            self.flush()
+
+    def flush(self):
+        if self._chunks:
+            self.sink.write("".join(self._chunks).encode(self.encoding))
+            self._chunks = []
+            self._pending = 0
+
+    def line(self, text=""):
+        self.write(f"{text}\n")
+
+    def heading(self, text, level=1):
+        self.write(f"{'#' * level} {' '.join(str(text).split())}\n\n")
+
+    def paragraph(self, text):
+        if text:
+            self.write(f"{text}\n\n")
+
+    def image(self, url, alt=""):
+        self.write(f"![{escape_alt(alt)}]({url.replace(' ', '%20')})\n\n")
+
+    def table(self, rows, header=None):
+        """
+        Markdown table; the first row is the header unless `header` is given.
+
+        Rows are padded to the widest one, so ragged HTML tables still render.
+        Non-string cells are converted with str().
+        """
+        if not isinstance(rows, list):
+            rows = list(rows)
+        if header is None:
+            if not rows:
+                return
+            header, rows = rows[0], rows[1:]
+        width = max(len(header), max(map(len, rows), default=0)) or 1
+
+        self.write(table_row(header, width) + "|" + " --- |" * width + "\n")
+        # Rows are written in blocks, not one write() per row
+        for start in range(0, len(rows), TABLE_ROWS_PER_WRITE):
+            self.write("".join([table_row(row, width) for row in rows[start:start + TABLE_ROWS_PER_WRITE]]))
+        self.write("\n")
+
+    def getvalue(self):
+        """The document written so far (in-memory writers only)."""
+        return self._memory.getvalue()
+
+    def close(self):
+        """Flush buffered text and finish the sink (its close() or, for a MultipartStream, complete())."""
+        if self.sink is not None:
+            self.flush()
+            finish = getattr(self.sink, "close", None) or getattr(self.sink, "complete", None)
+            if finish:
+                finish()
+
+    def abort(self):
+        self._chunks = []
+        if self.sink is not None and hasattr(self.sink, "abort"):
+            self.sink.abort()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+        return False
@@ -2,24 +2,22 @@ import os
 import fitz  # PyMuPDF
 import camelot
 import requests
-import boto3
 from dotenv import load_dotenv
+from s3_uploader import get_uploader
 
 # Load environment variables
 load_dotenv()
 
 # AWS S3 Configuration
-session = boto3.Session(
-    aws_access_key_id=os.getenv('AWS_SERVER_PUBLIC_KEY'),
-    aws_secret_access_key=os.getenv('AWS_SERVER_SECRET_KEY'),
-)
-s3 = session.client('s3')
 bucket_name = os.getenv('AWS_BUCKET_NAME')
 
+# Default S3 folder for parsed artifacts
+S3_OUTPUT_PREFIX = "pdf_processing_pipeline/pdf_os_pipeline/parsed_data"
+
 def upload_file_to_s3(file_path, object_name):
     """Uploads a file to S3."""
     try:
-        s3.upload_file(file_path, bucket_name, object_name)
+        get_uploader().upload_file(file_path, object_name)
         return f"Uploaded {file_path} to s3://{bucket_name}/{object_name}"
     except Exception as e:
         return f"Error uploading file {file_path}: {e}"
@@ -34,72 +32,329 @@ def download_pdf(url, output_path):
     else:
         raise Exception(f"Failed to download PDF. Status code: {response.status_code}")
 
-def extract_text_from_pdf(file_path, output_folder):
-    """Extract text from PDF and upload to S3."""
-    logs = []
-    with fitz.open(file_path) as pdf_document:
-        for page_num in range(len(pdf_document)):
-            text = pdf_document[page_num].get_text()
-            text_filename = os.path.join(output_folder, f"page_{page_num + 1}_text.txt")
-            with open(text_filename, "w", encoding="utf-8") as text_file:
-                text_file.write(text)
-            logs.append(upload_file_to_s3(text_filename, f"pdf_processing_pipeline/pdf_os_pipeline/parsed_data/{os.path.basename(text_filename)}"))
-    return logs
+# Line prefixes treated as list items
+LIST_MARKERS = ('-', '*', '•', '○')
 
-def extract_images_from_pdf(file_path, output_folder):
-    """Extract images from PDF and upload to S3."""
-    logs = []
-    pdf_document = fitz.open(file_path)
-    for page_num in range(len(pdf_document)):
+# ✅ Table detection tuning (override via environment)
+TABLE_ACCURACY_THRESHOLD = float(os.getenv("OS_TABLE_ACCURACY", 80))  # Minimum camelot accuracy kept
+TABLE_SCORE_THRESHOLD = float(os.getenv("OS_TABLE_SCORE", 0.3))  # Minimum pre-pass score sent to camelot
+MIN_RULING_LINES = 3  # Horizontal and vertical rules needed to treat a page as a ruled (lattice) table
+
+def count_ruling_lines(page):
+    """Number of horizontal and vertical rules drawn on a page (lines and hairline rectangles)."""
+    horizontal = vertical = 0
+    for drawing in page.get_drawings():
+        for item in drawing["items"]:
+            if item[0] == "l":
+                p1, p2 = item[1], item[2]
+                if abs(p1.y - p2.y) < 1 and abs(p1.x - p2.x) > 10:
+                    horizontal += 1
+                elif abs(p1.x - p2.x) < 1 and abs(p1.y - p2.y) > 10:
+                    vertical += 1
+            elif item[0] == "re":
+                rect = item[1]
+                if rect.height < 2 and rect.width > 10:
+                    horizontal += 1
+                elif rect.width < 2 and rect.height > 10:
+                    vertical += 1
+    return horizontal, vertical
+
+def aligned_column_score(page):
+    """
+    Share of text rows that look like table rows, using word geometry only.
+
+    Words are grouped into visual rows by baseline and split into cells at
+    wide gaps; a row counts when it has 2+ cells that start at x positions
+    shared with at least two other rows.
+    """
+    rows = {}
+    for x0, y0, x1, y1, *_ in page.get_text("words"):
+        rows.setdefault(round(y1 / 3), []).append((x0, x1, y1 - y0))
+    if len(rows) < 3:
+        return 0.0
+
+    row_cells = []
+    for words in rows.values():
+        words.sort()
+        cells = [words[0][0]]
+        for (_, prev_x1, height), (x0, _, _) in zip(words, words[1:]):
+            if x0 - prev_x1 > 1.5 * height:
+                cells.append(x0)
+        row_cells.append({round(x / 5) for x in cells})
+
+    column_hits = {}
+    for cells in row_cells:
+        for column in cells:
+            column_hits[column] = column_hits.get(column, 0) + 1
+    columns = {column for column, hits in column_hits.items() if hits >= 3}
+    table_rows = sum(1 for cells in row_cells if len(cells) >= 2 and len(cells & columns) >= 2)
+    return table_rows / len(row_cells)
+
+def score_table_page(page, text):
+    """
+    Cheap table likelihood of a page (0..1) and the camelot flavor suited to it.
+
+    Ruled pages go to camelot's lattice parser, aligned text columns to stream.
+    """
+    if not text.strip():
+        return 0.0, None
+    horizontal, vertical = count_ruling_lines(page)
+    if horizontal >= MIN_RULING_LINES and vertical >= MIN_RULING_LINES:
+        return 1.0, "lattice"
+    return aligned_column_score(page), "stream"
+
+def is_table_candidate(page, text):
+    """Camelot flavor to run on this page, or None if it is unlikely to hold a table."""
+    score, flavor = score_table_page(page, text)
+    return flavor if score >= TABLE_SCORE_THRESHOLD else None
+
+def iter_pdf_pages(pdf_document, page_numbers=None, seen_xrefs=None, find_tables=True):
+    """
+    Single pass over an open PDF: one dict per page with its text, list lines,
+    new image xrefs and the camelot flavor to run on it (None if no table is likely).
+
+    Images are deduplicated by xref across pages through `seen_xrefs`.
+    With `find_tables=False` pages are not scored for tables (the flavor is
+    always None), which saves reading their drawings and words.
+    """
+    if seen_xrefs is None:
+        seen_xrefs = set()
+    if page_numbers is None:
+        page_numbers = range(len(pdf_document))
+
+    for page_num in page_numbers:
         page = pdf_document[page_num]
-        image_list = page.get_images(full=True)
-        for img_index, img in enumerate(image_list):
+        text = page.get_text()
+
+        images = []
+        for img_index, img in enumerate(page.get_images(full=True)):
             xref = img[0]
-            base_image = pdf_document.extract_image(xref)
-            if base_image is None or "image" not in base_image:
+            if xref in seen_xrefs:
                 continue
-            image_bytes = base_image["image"]
-            image_ext = base_image["ext"]
-            image_filename = os.path.join(output_folder, f"page_{page_num + 1}_img_{img_index + 1}.{image_ext}")
-            with open(image_filename, "wb") as img_file:
-                img_file.write(image_bytes)
-            logs.append(upload_file_to_s3(image_filename, f"pdf_processing_pipeline/pdf_os_pipeline/parsed_data/{os.path.basename(image_filename)}"))
-    return logs
+            seen_xrefs.add(xref)
+            images.append((img_index, xref))
 
-def extract_tables_from_pdf(file_path, output_folder):
-    """Extract tables from PDF and upload to S3."""
-    logs = []
-    tables = camelot.read_pdf(file_path, pages='all', flavor='stream')
-    for table in tables:
-        if table.parsing_report['accuracy'] >= 80:
-            table_filename = os.path.join(output_folder, f"page_{table.page}_table.csv")
-            table.to_csv(table_filename)
-            logs.append(upload_file_to_s3(table_filename, f"pdf_processing_pipeline/pdf_os_pipeline/parsed_data/{os.path.basename(table_filename)}"))
-    return logs
+        yield {
+            "page_num": page_num,
+            "text": text,
+            "list_lines": [line.strip() for line in text.splitlines() if line.strip().startswith(LIST_MARKERS)],
+            "images": images,
+            "table_flavor": is_table_candidate(page, text) if find_tables else None,
+        }
 
-def extract_lists_from_pdf(file_path, output_folder):
-    """Extract lists from PDF and upload to S3."""
-    logs = []
+def save_page_text(page_data, batch, s3_prefix=S3_OUTPUT_PREFIX):
+    """Queue a page's text for upload to S3."""
+    key = f"{s3_prefix}/page_{page_data['page_num'] + 1}_text.txt"
+    batch.add_bytes(page_data["text"].encode("utf-8"), key, "text/plain")
+
+def save_page_images(pdf_document, page_data, batch, s3_prefix=S3_OUTPUT_PREFIX):
+    """Extract a page's new images and queue their upload to S3."""
+    for img_index, xref in page_data["images"]:
+        base_image = pdf_document.extract_image(xref)
+        if base_image is None or "image" not in base_image:
+            continue
+        key = f"{s3_prefix}/page_{page_data['page_num'] + 1}_img_{img_index + 1}.{base_image['ext']}"
+        batch.add_bytes(base_image["image"], key, f"image/{base_image['ext']}")
+
+def save_page_lists(page_data, batch, s3_prefix=S3_OUTPUT_PREFIX):
+    """Queue a page's list lines (if any) for upload to S3."""
+    if not page_data["list_lines"]:
+        return
+    key = f"{s3_prefix}/page_{page_data['page_num'] + 1}_lists.txt"
+    batch.add_bytes("\n".join(page_data["list_lines"]).encode("utf-8"), key, "text/plain")
+
+# The extract_* functions keep their `output_folder` argument for existing
+# callers; artifacts are built in memory and never written to local disk.
+
+def extract_text_from_pdf(file_path, output_folder=None, s3_prefix=S3_OUTPUT_PREFIX):
+    """Extract text from PDF and upload to S3."""
+    batch = get_uploader().batch()
+    with fitz.open(file_path) as pdf_document:
+        for page_data in iter_pdf_pages(pdf_document, find_tables=False):
+            save_page_text(page_data, batch, s3_prefix)
+    return batch.logs()
+
+def extract_images_from_pdf(file_path, output_folder=None, s3_prefix=S3_OUTPUT_PREFIX):
+    """Extract images from PDF and upload to S3."""
+    batch = get_uploader().batch()
+    with fitz.open(file_path) as pdf_document:
+        for page_data in iter_pdf_pages(pdf_document, find_tables=False):
+            save_page_images(pdf_document, page_data, batch, s3_prefix)
+    return batch.logs()
+
+def find_table_pages(file_path):
+    """Table pre-pass: [(page number starting at 1, camelot flavor)] for every candidate page."""
+    table_pages = []
     with fitz.open(file_path) as pdf_document:
         for page_num in range(len(pdf_document)):
             page = pdf_document[page_num]
-            text = page.get_text()
-            list_lines = [line.strip() for line in text.splitlines() if line.strip().startswith(('-', '*', '•', '○'))]
-            if list_lines:
-                list_filename = os.path.join(output_folder, f"page_{page_num + 1}_lists.txt")
-                with open(list_filename, "w", encoding="utf-8") as list_file:
-                    list_file.write("\n".join(list_lines))
-                logs.append(upload_file_to_s3(list_filename, f"pdf_processing_pipeline/pdf_os_pipeline/parsed_data/{os.path.basename(list_filename)}"))
+            flavor = is_table_candidate(page, page.get_text())
+            if flavor:
+                table_pages.append((page_num + 1, flavor))
+    return table_pages
+
+def extract_tables_from_pdf(file_path, output_folder=None, s3_prefix=S3_OUTPUT_PREFIX, pages='all', batch=None,
+                            flavor='stream', progress=None):
+    """
+    Extract tables from PDF and upload to S3.
+
+    With pages='all' camelot only runs on the pages the pre-pass flags,
+    each with the flavor chosen for it.
+    """
+    own_batch = batch is None
+    batch = batch or get_uploader().batch()
+    if pages == 'all':
+        for page_no, page_flavor in find_table_pages(file_path):
+            extract_tables_from_pdf(file_path, s3_prefix=s3_prefix, pages=str(page_no), batch=batch,
+                                    flavor=page_flavor, progress=progress)
+        return batch.logs() if own_batch else []
+
+    tables = camelot.read_pdf(file_path, pages=pages, flavor=flavor)
+    found = 0
+    for table in tables:
+        if table.parsing_report['accuracy'] >= TABLE_ACCURACY_THRESHOLD:
+            found += 1
+            # Same CSV layout as camelot's Table.to_csv, written to memory
+            csv_text = table.df.to_csv(index=False, header=False)
+            batch.add_bytes(csv_text.encode("utf-8"), f"{s3_prefix}/page_{table.page}_table.csv", "text/csv")
+    if progress:
+        progress("tables_found", f"Page {pages}: {found} tables found ({flavor})", advance=len(pages.split(",")))
+    return batch.logs() if own_batch else []
+
+def extract_page_tables(file_path, table_pages, s3_prefix=S3_OUTPUT_PREFIX, progress=None):
+    """
+    Run camelot on (page number, flavor) pairs and upload the tables to S3.
+
+    Pages sharing a flavor go to camelot in one call.
+    """
+    batch = get_uploader().batch()
+    for flavor in ("lattice", "stream"):
+        pages = [str(page_no) for page_no, page_flavor in table_pages if page_flavor == flavor]
+        if pages:
+            extract_tables_from_pdf(file_path, s3_prefix=s3_prefix, pages=",".join(pages), batch=batch,
+                                    flavor=flavor, progress=progress)
+    return batch.logs()
+
+def extract_lists_from_pdf(file_path, output_folder=None, s3_prefix=S3_OUTPUT_PREFIX):
+    """Extract lists from PDF and upload to S3."""
+    batch = get_uploader().batch()
+    with fitz.open(file_path) as pdf_document:
+        for page_data in iter_pdf_pages(pdf_document, find_tables=False):
+            save_page_lists(page_data, batch, s3_prefix)
+    return batch.logs()
+
+def extract_page_range(file_path, start, stop, s3_prefix=S3_OUTPUT_PREFIX, skip_xrefs=None, progress=None):
+    """
+    Extract text, images and lists for pages [start, stop) and upload them to S3.
+
+    Opens its own handle on the PDF, so it can run in any worker process.
+    Images in `skip_xrefs` are owned by an earlier page range and not re-extracted.
+    Returns the upload logs and the (page number, flavor) table candidates.
+    """
+    # Uploads run in the background while later pages are still being parsed
+    batch = get_uploader().batch()
+    table_pages = []
+    with fitz.open(file_path) as pdf_document:
+        stop = min(stop, len(pdf_document))
+        for page_data in iter_pdf_pages(pdf_document, range(start, stop), set(skip_xrefs or ())):
+            save_page_text(page_data, batch, s3_prefix)
+            save_page_images(pdf_document, page_data, batch, s3_prefix)
+            save_page_lists(page_data, batch, s3_prefix)
+            if page_data["table_flavor"]:
+                table_pages.append((page_data["page_num"] + 1, page_data["table_flavor"]))
+            if progress:
+                progress("page_parsed", f"Page {page_data['page_num'] + 1}: {len(page_data['images'])} images, "
+                         f"{len(page_data['list_lines'])} list items", advance=1)
+    return batch.logs(), table_pages
+
+def failed_uploads(logs):
+    """Number of failed uploads in upload logs."""
+    return sum(1 for line in logs if line.startswith("Error uploading"))
+
+def report_uploads(logs, progress):
+    """Final progress event summarising the upload logs."""
+    failed = failed_uploads(logs)
+    progress("uploaded", f"{len(logs) - failed} artifacts uploaded to S3, {failed} failed")
+
+def extract_all_from_pdf(file_path, output_folder=None, s3_prefix=S3_OUTPUT_PREFIX, progress=None):
+    """
+    Extract all data from a PDF and upload to S3.
+
+    The PDF is opened once and every page is visited once for text, lists and
+    images; camelot then only runs on the pages flagged as table candidates.
+    """
+    if progress:
+        with fitz.open(file_path) as pdf_document:
+            page_count = len(pdf_document)
+        progress("started", f"Parsing {page_count} pages", total=page_count)
+    logs, table_pages = extract_page_range(file_path, 0, float("inf"), s3_prefix, progress=progress)
+    if table_pages:
+        if progress:
+            progress("tables", f"{len(table_pages)} pages may hold tables", total=page_count + len(table_pages))
+        logs.extend(extract_page_tables(file_path, table_pages, s3_prefix, progress))
+    if progress:
+        report_uploads(logs, progress)
     return logs
 
-def extract_all_from_pdf(file_path, output_folder):
-    """Extract all data from a PDF and upload to S3."""
-    logs = []
-    if not os.path.exists(output_folder):
-        os.makedirs(output_folder)
+# ✅ Page sharding (override via environment)
+MIN_PAGES_PER_SHARD = int(os.getenv("OS_MIN_PAGES_PER_SHARD", 8))
+
+def scan_pdf_images(file_path):
+    """
+    Page count and the first page each image xref appears on.
 
-    logs += extract_text_from_pdf(file_path, output_folder)
-    logs += extract_images_from_pdf(file_path, output_folder)
-    logs += extract_tables_from_pdf(file_path, output_folder)
-    logs += extract_lists_from_pdf(file_path, output_folder)
+    Only reads the page image lists; no image data is decoded.
+    """
+    first_pages = {}
+    with fitz.open(file_path) as pdf_document:
+        for page_num in range(len(pdf_document)):
+            for img in pdf_document.get_page_images(page_num):
+                first_pages.setdefault(img[0], page_num)
+        return len(pdf_document), first_pages
+
+def shard_ranges(page_count, shards, min_pages=MIN_PAGES_PER_SHARD):
+    """Split pages into at most `shards` contiguous (start, stop) ranges of at least `min_pages` pages."""
+    shards = max(1, min(shards, page_count // max(1, min_pages)))
+    size, extra = divmod(page_count, shards)
+    ranges, start = [], 0
+    for shard in range(shards):
+        stop = start + size + (1 if shard < extra else 0)
+        ranges.append((start, stop))
+        start = stop
+    return ranges
+
+def extract_all_from_pdf_parallel(file_path, executor, workers, s3_prefix=S3_OUTPUT_PREFIX, progress=None):
+    """
+    Page-sharded extract_all_from_pdf: each range of pages runs on `executor`.
+
+    Every worker opens the PDF itself (fitz handles cannot be shared). An
+    image is extracted only by the range holding the first page it appears
+    on. Camelot, the slowest stage, then runs one task per candidate page so
+    table-heavy ranges do not hold everything up. Upload logs are merged back
+    in page order.
+    """
+    page_count, first_pages = executor.submit(scan_pdf_images, file_path).result()
+    ranges = shard_ranges(page_count, workers)
+    if progress:
+        progress("started", f"Parsing {page_count} pages in {len(ranges)} shards", total=page_count)
+    futures = []
+    for start, stop in ranges:
+        skip_xrefs = [xref for xref, page_num in first_pages.items() if page_num < start]
+        futures.append(executor.submit(extract_page_range, file_path, start, stop, s3_prefix, skip_xrefs, progress))
+
+    logs = []
+    table_futures = []
+    for future in futures:
+        shard_logs, table_pages = future.result()
+        logs.extend(shard_logs)
+        if table_pages and progress:
+            # Every table page is one more unit of work
+            progress("tables", f"{len(table_pages)} more pages may hold tables",
+                     total=page_count + len(table_futures) + len(table_pages))
+        table_futures.extend(executor.submit(extract_page_tables, file_path, [table_page], s3_prefix, progress)
+                             for table_page in table_pages)
+    for future in table_futures:
+        logs.extend(future.result())
+    if progress:
+        report_uploads(logs, progress)
     return logs
@@ -0,0 +1,76 @@
+import os
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+from s3_uploader import get_uploader
+
+# ✅ Cache sizing and location (override via environment)
+RESULT_CACHE_MAX_ENTRIES = int(os.getenv("RESULT_CACHE_MAX_ENTRIES", 1000))
+RESULT_CACHE_PREFIX = "pdf_processing_pipeline/result_cache"
+
+
+def options_fingerprint(options):
+    """Stable short hash of an engine's options dict."""
+    payload = json.dumps(options or {}, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+class ResultCache:
+    """
+    Parse results keyed by (PDF sha256, engine, options).
+
+    A local LRU answers repeated lookups; every entry is also written as a
+    JSON manifest to S3 so other instances and restarts can reuse it.
+    """
+
+    def __init__(self, max_entries=RESULT_CACHE_MAX_ENTRIES, prefix=RESULT_CACHE_PREFIX, uploader=None):
+        self.max_entries = max_entries
+        self.prefix = prefix
+        self._uploader = uploader
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def uploader(self):
+        return self._uploader or get_uploader()
+
+    def manifest_key(self, sha256, engine, options=None):
+        return f"{self.prefix}/{sha256}/{engine}-{options_fingerprint(options)}.json"
+
+    def _remember(self, key, entry):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get(self, sha256, engine, options=None):
+        """Return the cached entry, checking the local LRU first and then S3."""
+        key = self.manifest_key(sha256, engine, options)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                return entry
+
+        uploader = self.uploader
+        try:
+            response = uploader.client.get_object(Bucket=uploader.bucket, Key=key)
+        except uploader.client.exceptions.NoSuchKey:
+            return None
+        entry = json.loads(response["Body"].read())
+        self._remember(key, entry)
+        return entry
+
+    def put(self, sha256, engine, options, entry):
+        """Store an entry locally and persist its manifest to S3 in the background."""
+        key = self.manifest_key(sha256, engine, options)
+        self._remember(key, entry)
+        return self.uploader.submit_bytes(json.dumps(entry, default=str), key, "application/json")
+
+    def engines_for(self, sha256):
+        """Engines with a locally cached result for this PDF (no S3 calls)."""
+        with self._lock:
+            return sorted({key.rsplit("/", 1)[1].rsplit("-", 1)[0]
+                           for key in self._entries if key.startswith(f"{self.prefix}/{sha256}/")})
@@ -0,0 +1,250 @@
+import io
+import os
+import tempfile
+import threading
+import boto3
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# ✅ Upload tuning (override via environment)
+UPLOAD_WORKERS = int(os.getenv("S3_UPLOAD_WORKERS", 16))
+MULTIPART_THRESHOLD_MB = int(os.getenv("S3_MULTIPART_THRESHOLD_MB", 8))
+MULTIPART_CHUNKSIZE_MB = int(os.getenv("S3_MULTIPART_CHUNKSIZE_MB", 8))
+MULTIPART_CONCURRENCY = int(os.getenv("S3_MULTIPART_CONCURRENCY", 4))
+
+# Artifact buffers stay in memory up to this size, then spill to a temp file
+ARTIFACT_SPILL_MB = int(os.getenv("ARTIFACT_SPILL_MB", 32))
+
+# Optional custom endpoint, e.g. a local moto server for testing
+S3_ENDPOINT_URL = os.getenv("S3_ENDPOINT_URL")
+
+MB = 1024 * 1024
+
+
+def new_artifact_buffer():
+    """In-memory buffer for one artifact that spills to disk above ARTIFACT_SPILL_MB."""
+    return tempfile.SpooledTemporaryFile(max_size=ARTIFACT_SPILL_MB * MB)
+
+
+def create_s3_client(max_pool_connections):
+    """Create an S3 client whose connection pool can serve every upload thread."""
+    return boto3.client(
+        "s3",
+        aws_access_key_id=os.getenv("AWS_SERVER_PUBLIC_KEY"),
+        aws_secret_access_key=os.getenv("AWS_SERVER_SECRET_KEY"),
+        region_name=os.getenv("AWS_REGION"),
+        endpoint_url=S3_ENDPOINT_URL,
+        config=Config(
+            max_pool_connections=max_pool_connections,
+            retries={"max_attempts": 5, "mode": "adaptive"},
+            tcp_keepalive=True,
+        ),
+    )
+
+
+class S3Uploader:
+    """
+    Uploads artifacts to S3 from a bounded thread pool over one pooled client.
+
+    Files and buffers above the multipart threshold are sent as parallel
+    multipart uploads; smaller ones go in a single request.
+    """
+
+    def __init__(self, client=None, bucket=None, max_workers=UPLOAD_WORKERS):
+        # Each worker may run a multipart transfer with its own part threads
+        self.client = client or create_s3_client(max_workers * MULTIPART_CONCURRENCY)
+        self.bucket = bucket or os.getenv("AWS_BUCKET_NAME")
+        self.transfer_config = TransferConfig(
+            multipart_threshold=MULTIPART_THRESHOLD_MB * MB,
+            multipart_chunksize=MULTIPART_CHUNKSIZE_MB * MB,
+            max_concurrency=MULTIPART_CONCURRENCY,
+        )
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="s3-upload")
+
+    def _extra_args(self, content_type):
+        return {"ContentType": content_type} if content_type else None
+
+    def upload_file(self, file_path, key, content_type=None):
+        """Upload a local file and return its key."""
+        self.client.upload_file(file_path, self.bucket, key,
+                                ExtraArgs=self._extra_args(content_type), Config=self.transfer_config)
+        return key
+
+    def upload_bytes(self, data, key, content_type=None):
+        """Upload bytes, memoryview or str and return its key."""
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        if len(data) < self.transfer_config.multipart_threshold:
+            kwargs = {"ContentType": content_type} if content_type else {}
+            self.client.put_object(Bucket=self.bucket, Key=key, Body=bytes(data), **kwargs)
+        else:
+            # BytesIO over a memoryview shares the buffer instead of copying it
+            self.upload_fileobj(io.BytesIO(data), key, content_type)
+        return key
+
+    def upload_fileobj(self, fileobj, key, content_type=None):
+        """Upload a readable buffer from its start, then close it; return its key."""
+        try:
+            fileobj.seek(0)
+            self.client.upload_fileobj(fileobj, self.bucket, key,
+                                       ExtraArgs=self._extra_args(content_type), Config=self.transfer_config)
+        finally:
+            fileobj.close()
+        return key
+
+    def submit_file(self, file_path, key, content_type=None):
+        return self.executor.submit(self.upload_file, file_path, key, content_type)
+
+    def submit_bytes(self, data, key, content_type=None):
+        return self.executor.submit(self.upload_bytes, data, key, content_type)
+
+    def submit_fileobj(self, fileobj, key, content_type=None):
+        return self.executor.submit(self.upload_fileobj, fileobj, key, content_type)
+
+    def batch(self):
+        return UploadBatch(self)
+
+    def stream(self, key, content_type=None):
+        return MultipartStream(self, key, content_type)
+
+    def url(self, key):
+        region = os.getenv("AWS_REGION")
+        return f"https://{self.bucket}.s3.{region}.amazonaws.com/{key}"
+
+    def shutdown(self, wait=True):
+        self.executor.shutdown(wait=wait)
+
+
+class UploadBatch:
+    """Collects concurrent uploads and waits for all of them together."""
+
+    def __init__(self, uploader):
+        self.uploader = uploader
+        self._pending = []
+
+    def add_file(self, file_path, key, content_type=None):
+        future = self.uploader.submit_file(file_path, key, content_type)
+        self._pending.append((file_path, key, future))
+        return future
+
+    def add_bytes(self, data, key, content_type=None):
+        future = self.uploader.submit_bytes(data, key, content_type)
+        self._pending.append((key, key, future))
+        return future
+
+    def add_buffer(self, fileobj, key, content_type=None):
+        """Queue an artifact buffer (e.g. from new_artifact_buffer()); it is closed once uploaded."""
+        future = self.uploader.submit_fileobj(fileobj, key, content_type)
+        self._pending.append((key, key, future))
+        return future
+
+    def wait(self):
+        """Wait for every upload; return (source, key, error) tuples in submit order."""
+        results = []
+        for source, key, future in self._pending:
+            try:
+                future.result()
+                results.append((source, key, None))
+            except Exception as e:
+                results.append((source, key, e))
+        self._pending = []
+        return results
+
+    def logs(self):
+        """Wait for every upload and describe each outcome, one line per artifact."""
+        bucket = self.uploader.bucket
+        return [
+            f"Error uploading file {source}: {error}" if error else f"Uploaded {source} to s3://{bucket}/{key}"
+            for source, key, error in self.wait()
+        ]
+
+
+class MultipartStream:
+    """
+    Uploads data as it is written, one multipart part at a time.
+
+    Parts are sent from the uploader's thread pool while the caller keeps
+    writing. Data that never fills a single part is sent with one put_object
+    on complete(). abort() discards everything uploaded so far.
+    """
+
+    def __init__(self, uploader, key, content_type=None):
+        self.uploader = uploader
+        self.key = key
+        self.content_type = content_type
+        # S3 parts must be at least 5 MB (except the last one)
+        self.part_size = max(uploader.transfer_config.multipart_chunksize, 5 * MB)
+        self.upload_id = None
+        self._buffer = bytearray()
+        self._parts = []
+
+    def write(self, data):
+        self._buffer += data
+        while len(self._buffer) >= self.part_size:
+            self._submit_part(bytes(self._buffer[:self.part_size]))
+            del self._buffer[:self.part_size]
+
+    def _submit_part(self, body):
+        client = self.uploader.client
+        if self.upload_id is None:
+            kwargs = {"ContentType": self.content_type} if self.content_type else {}
+            response = client.create_multipart_upload(Bucket=self.uploader.bucket, Key=self.key, **kwargs)
+            self.upload_id = response["UploadId"]
+        part_number = len(self._parts) + 1
+        future = self.uploader.executor.submit(
+            client.upload_part, Bucket=self.uploader.bucket, Key=self.key,
+            UploadId=self.upload_id, PartNumber=part_number, Body=body,
+        )
+        self._parts.append((part_number, future))
+
+    def complete(self):
+        """Flush the remaining data and finish the upload; return the key."""
+        if self.upload_id is None:
+            self.uploader.upload_bytes(bytes(self._buffer), self.key, self.content_type)
+            self._buffer = bytearray()
+            return self.key
+
+        if self._buffer:
+            self._submit_part(bytes(self._buffer))
+            self._buffer = bytearray()
+        try:
+            parts = [{"PartNumber": number, "ETag": future.result()["ETag"]} for number, future in self._parts]
+            self.uploader.client.complete_multipart_upload(
+                Bucket=self.uploader.bucket, Key=self.key, UploadId=self.upload_id,
+                MultipartUpload={"Parts": parts},
+            )
+        except Exception:
+            self.abort()
+            raise
+        return self.key
+
+    def abort(self):
+        """Cancel the upload so no object (and no stored parts) are left behind."""
+        self._buffer = bytearray()
+        if self.upload_id is None:
+            return
+        for _, future in self._parts:
+            future.cancel()
+        self.uploader.client.abort_multipart_upload(Bucket=self.uploader.bucket, Key=self.key, UploadId=self.upload_id)
+        self.upload_id = None
+
+
+_uploader = None
+_uploader_pid = None
+_uploader_lock = threading.Lock()
+
+
+def get_uploader():
+    """Return the shared uploader of this process (worker processes get their own)."""
+    global _uploader, _uploader_pid
+    with _uploader_lock:
+        # Thread pools do not survive fork, so rebuild in each worker process
+        if _uploader is None or _uploader_pid != os.getpid():
+            _uploader = S3Uploader()
+            _uploader_pid = os.getpid()
+        return _uploader